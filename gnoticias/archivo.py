@@ -0,0 +1,366 @@
+"""Archivo de los feeds descargados y reprocesamiento sin descargas (modo `--archivar`).
+
+Cada feed descargado se guarda comprimido con gzip en `data/archivo_feeds/ab/abcd….xml.gz`,
+direccionado por su contenido: la llave es `hash_contenido` de http_feeds (sha1 sin
+<lastBuildDate>), así un mismo feed que vuelve a llegar no ocupa espacio de nuevo. El índice
+por candidato y ventana de la consulta (`when:` del diario o días del histórico) va en
+`data/archivo_feeds/indice.db`, junto a los feeds.
+
+El archivo no va a git. Cada ejecución de los workflows arranca con la carpeta vacía y al
+final la empaqueta (`--empaquetar`: un tar con sus feeds y su índice) como asset nuevo del
+release mensual `archivo-feeds-AAAA-MM`; los paquetes no se modifican después. Para
+reprocesar se descargan e importan los paquetes de los meses que interesen:
+
+    gh release download archivo-feeds-2025-10 -D paquetes
+    python -m gnoticias.archivo --importar paquetes/*.tar
+
+`reprocesar()` vuelve a pasar los feeds archivados por el filtro de keywords (con las
+keywords actuales), la deduplicación y la escritura, sin descargar ningún feed. La URL de cada
+noticia se busca primero en `archivo_urls` (las que se decodificaron al archivar, guardadas en
+el índice junto a los feeds) y después en `gnoticias_url_cache`. Las que no están en ninguno
+(por ejemplo, las que calzan recién con las keywords nuevas) se decodifican como siempre, a
+través de `ritmo_decoder`, salvo con `--sin-red`: `google` guarda el link de Google News y
+`omitir` descarta la noticia.
+
+    python -m gnoticias.archivo --candidatos 12 15 --desde 2025-01-01 --hasta 2025-06-30
+    python -m gnoticias.archivo --sin-red omitir
+"""
+import gzip
+import os
+import re
+import sqlite3
+import tarfile
+import tempfile
+import threading
+from datetime import datetime
+
+import gnoticias.db_gnoticias as db_gnoticias
+from gnoticias.cache_urls import cache_urls
+from gnoticias.db_gnoticias import get_db_connection
+from gnoticias.http_feeds import RespuestaFeed
+
+# Carpeta del archivo, relativa a la carpeta de la base principal
+DIRECTORIO_ARCHIVO = "archivo_feeds"
+# Índice del archivo, dentro de su carpeta
+NOMBRE_INDICE = "indice.db"
+# Nivel de gzip (los feeds RSS comprimen ~8x ya con el nivel por defecto)
+NIVEL_COMPRESION = 6
+# Feeds archivados que se leen en paralelo al reprocesar
+WORKERS_DEFAULT = 4
+
+# Qué hacer al reprocesar con las URLs que no están en el archivo ni en gnoticias_url_cache
+SIN_RED = ("google", "omitir")
+
+# Miembros válidos de un paquete: el índice y los feeds (`ab/abcd….xml.gz`)
+PATRON_FEED_PAQUETE = re.compile(r"^([0-9a-f]{2})/(\1[0-9a-f]+)\.xml\.gz$")
+
+SQL_CREAR_ARCHIVO = """
+    CREATE TABLE IF NOT EXISTS archivo_feeds (
+        id_candidato INTEGER NOT NULL,
+        desde TEXT NOT NULL,
+        hasta TEXT NOT NULL,
+        url TEXT NOT NULL,
+        hash_contenido TEXT NOT NULL,
+        fecha_consulta TEXT,
+        usar_fecha_entrada INTEGER,
+        descargado TEXT,
+        PRIMARY KEY (id_candidato, desde, hasta, url, hash_contenido)
+    ) WITHOUT ROWID
+"""
+
+# URL decodificada de cada noticia de los feeds archivados
+SQL_CREAR_URLS = """
+    CREATE TABLE IF NOT EXISTS archivo_urls (
+        id_gnoticia TEXT PRIMARY KEY,
+        link TEXT NOT NULL
+    ) WITHOUT ROWID
+"""
+
+
+def asegurar_tabla_archivo(db_path=None):
+    """Crea la carpeta del archivo y las tablas de su índice si no existen."""
+    os.makedirs(directorio_archivo(db_path), exist_ok=True)
+    conn = sqlite3.connect(ruta_indice(db_path), timeout=30)
+    try:
+        conn.execute(SQL_CREAR_ARCHIVO)
+        conn.execute(SQL_CREAR_URLS)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def directorio_archivo(db_path=None):
+    return os.path.join(os.path.dirname(db_path or db_gnoticias.DB_PATH), DIRECTORIO_ARCHIVO)
+
+
+def ruta_indice(db_path=None):
+    return os.path.join(directorio_archivo(db_path), NOMBRE_INDICE)
+
+
+def ruta_feed(hash_contenido, db_path=None):
+    return os.path.join(directorio_archivo(db_path), hash_contenido[:2], f"{hash_contenido}.xml.gz")
+
+
+def _fecha(valor):
+    return valor.date().isoformat() if isinstance(valor, datetime) else valor.isoformat()
+
+
+def guardar(trabajo):
+    """Escribe el feed de `trabajo` en el archivo (si no estaba) y lo registra en el índice.
+
+    Se indexa por la ventana que cubre la consulta (`trabajo.ventana`); el feed ya está en
+    disco antes de su fila, así que el índice nunca apunta a un archivo inexistente.
+    """
+    respuesta = trabajo.respuesta
+    if respuesta is None or respuesta.sin_cambios or not respuesta.contenido:
+        return
+    ruta = ruta_feed(respuesta.hash_contenido)
+    if not os.path.exists(ruta):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # Dos hilos pueden archivar el mismo feed: cada uno escribe su temporal y el reemplazo es atómico
+        temporal = f"{ruta}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with gzip.open(temporal, "wb", compresslevel=NIVEL_COMPRESION) as archivo:
+            archivo.write(respuesta.contenido)
+        os.replace(temporal, ruta)
+    ahora = datetime.now()
+    desde, hasta = trabajo.ventana or (ahora, ahora)
+    fecha_consulta = trabajo.fecha_consulta.isoformat() if trabajo.fecha_consulta is not None else None
+    filas = [
+        (candidato_id, _fecha(desde), _fecha(hasta), respuesta.url, respuesta.hash_contenido, fecha_consulta,
+         int(trabajo.usar_fecha_entrada), ahora.isoformat())
+        for candidato_id in sorted(trabajo.candidatos)
+    ]
+    conn = sqlite3.connect(ruta_indice(), timeout=30)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO archivo_feeds (id_candidato, desde, hasta, url, hash_contenido, fecha_consulta, usar_fecha_entrada, descargado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", filas,
+            )
+    finally:
+        conn.close()
+
+
+def guardar_urls(filas, db_path=None):
+    """Registra en el índice las URLs decodificadas [(id_gnoticia, link)] de noticias archivadas."""
+    conn = sqlite3.connect(ruta_indice(db_path), timeout=30)
+    try:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO archivo_urls (id_gnoticia, link) VALUES (?, ?)", filas)
+    finally:
+        conn.close()
+
+
+def url_archivada(id_gnoticia, db_path=None):
+    """URL decodificada guardada con el archivo para `id_gnoticia`, o None."""
+    conn = sqlite3.connect(ruta_indice(db_path), timeout=30)
+    try:
+        fila = conn.execute("SELECT link FROM archivo_urls WHERE id_gnoticia = ?", (id_gnoticia,)).fetchone()
+    finally:
+        conn.close()
+    return fila[0] if fila else None
+
+
+class ResolverArchivo:
+    """Resolver de URLs del Pipeline al reprocesar: archivo, luego gnoticias_url_cache y luego la
+    red; con `sin_red` ('google' u 'omitir') nunca se llama al decodificador."""
+    def __init__(self, sin_red=None):
+        if sin_red is not None and sin_red not in SIN_RED:
+            raise ValueError(f"sin_red inválido: {sin_red}")
+        self.sin_red = sin_red
+        self._lock = threading.Lock()
+        self.archivadas = 0
+        self.sin_resolver = 0
+
+    def __call__(self, id_gnoticia, google_news_url, writer=None):
+        link = url_archivada(id_gnoticia)
+        if link is not None:
+            with self._lock:
+                self.archivadas += 1
+            return link
+        if self.sin_red is None:
+            link = cache_urls.resolver(id_gnoticia, google_news_url, writer)
+            if link and link != google_news_url:
+                guardar_urls([(id_gnoticia, link)])
+            return link
+        link = cache_urls.obtener(id_gnoticia)
+        if link is not None:
+            return link
+        with self._lock:
+            self.sin_resolver += 1
+        return google_news_url if self.sin_red == "google" else ""
+
+    def resumen(self):
+        return f"urls archivadas={self.archivadas};sin resolver={self.sin_resolver}"
+
+
+def leer(url, hash_contenido):
+    """RespuestaFeed con el contenido archivado (como si se acabara de descargar `url`)."""
+    with gzip.open(ruta_feed(hash_contenido), "rb") as archivo:
+        return RespuestaFeed(url, contenido=archivo.read(), hash_contenido=hash_contenido)
+
+
+def feeds_archivados(candidato_ids=None, desde=None, hasta=None):
+    """[(hash, url, fecha_consulta, usar_fecha_entrada, desde, [ids])] de los feeds cuya ventana se cruza con [desde, hasta]."""
+    condiciones, params = [], []
+    if candidato_ids:
+        condiciones.append(f"id_candidato IN ({','.join('?' * len(candidato_ids))})")
+        params.extend(candidato_ids)
+    if desde:
+        condiciones.append("hasta >= ?")
+        params.append(desde)
+    if hasta:
+        condiciones.append("desde <= ?")
+        params.append(hasta)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    conn = sqlite3.connect(ruta_indice(), timeout=30)
+    try:
+        filas = conn.execute(f"""
+            SELECT hash_contenido, url, fecha_consulta, usar_fecha_entrada, MIN(desde), group_concat(id_candidato)
+            FROM archivo_feeds {where}
+            GROUP BY hash_contenido, url, fecha_consulta, usar_fecha_entrada
+            ORDER BY MIN(desde), url
+        """, params).fetchall()
+    finally:
+        conn.close()
+    return [(fila[0], fila[1], fila[2], bool(fila[3]), fila[4], sorted({int(c) for c in fila[5].split(",")})) for fila in filas]
+
+
+def empaquetar(destino, db_path=None):
+    """Guarda el archivo local (feeds e índice) en el tar `destino`; retorna la cantidad de feeds.
+
+    Si no hay feeds archivados no crea el paquete.
+    """
+    directorio = directorio_archivo(db_path)
+    feeds = []
+    for carpeta, _, archivos in os.walk(directorio):
+        for nombre in archivos:
+            relativo = os.path.relpath(os.path.join(carpeta, nombre), directorio).replace(os.sep, "/")
+            if PATRON_FEED_PAQUETE.match(relativo):
+                feeds.append(relativo)
+    if not feeds:
+        print("ℹ️ No hay feeds archivados para empaquetar.")
+        return 0
+    # Los feeds ya están comprimidos: el tar solo los agrupa
+    with tarfile.open(destino, "w") as paquete:
+        paquete.add(os.path.join(directorio, NOMBRE_INDICE), arcname=NOMBRE_INDICE)
+        for relativo in sorted(feeds):
+            paquete.add(os.path.join(directorio, relativo), arcname=relativo)
+    print(f"✅ Paquete {destino}: {len(feeds)} feeds.")
+    return len(feeds)
+
+
+def importar(paquetes, db_path=None):
+    """Agrega al archivo local los feeds y las filas de índice de cada paquete de `empaquetar`.
+
+    Los feeds que ya están no se reescriben y las filas repetidas se ignoran, así que importar
+    dos veces el mismo paquete no cambia nada. Retorna la cantidad de feeds nuevos.
+    """
+    asegurar_tabla_archivo(db_path)
+    nuevos = 0
+    for ruta_paquete in paquetes:
+        with tarfile.open(ruta_paquete, "r") as paquete:
+            for miembro in paquete:
+                if not miembro.isfile():
+                    continue
+                if miembro.name == NOMBRE_INDICE:
+                    _importar_indice(paquete.extractfile(miembro), db_path)
+                    continue
+                encontrado = PATRON_FEED_PAQUETE.match(miembro.name)
+                if encontrado is None:
+                    print(f"⚠️ {ruta_paquete}: se ignora {miembro.name}")
+                    continue
+                ruta = ruta_feed(encontrado.group(2), db_path)
+                if os.path.exists(ruta):
+                    continue
+                os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                temporal = f"{ruta}.{os.getpid()}.tmp"
+                with open(temporal, "wb") as archivo:
+                    archivo.write(paquete.extractfile(miembro).read())
+                os.replace(temporal, ruta)
+                nuevos += 1
+        print(f"✅ {ruta_paquete} importado.")
+    print(f"ℹ️ {nuevos} feeds nuevos en el archivo.")
+    return nuevos
+
+
+def _importar_indice(contenido, db_path=None):
+    """Copia al índice local las filas del índice de un paquete (leído de `contenido`)."""
+    with tempfile.TemporaryDirectory() as carpeta:
+        temporal = os.path.join(carpeta, NOMBRE_INDICE)
+        with open(temporal, "wb") as archivo:
+            archivo.write(contenido.read())
+        conn = sqlite3.connect(ruta_indice(db_path), timeout=30)
+        try:
+            conn.execute("ATTACH DATABASE ? AS paquete", (temporal,))
+            tablas = {fila[0] for fila in conn.execute("SELECT name FROM paquete.sqlite_master WHERE type = 'table'")}
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO archivo_feeds SELECT * FROM paquete.archivo_feeds")
+                # Los paquetes anteriores a archivo_urls no la traen
+                if "archivo_urls" in tablas:
+                    conn.execute("INSERT OR IGNORE INTO archivo_urls SELECT * FROM paquete.archivo_urls")
+            conn.execute("DETACH DATABASE paquete")
+        finally:
+            conn.close()
+
+
+def reprocesar(candidato_ids=None, desde=None, hasta=None, atribucion_cruzada=False, shards=False, workers=WORKERS_DEFAULT,
+               sin_red=None):
+    """Vuelve a filtrar, deduplicar y guardar las noticias de los feeds archivados, sin descargarlos.
+
+    Sirve para aplicar keywords nuevas a noticias pasadas: solo se agregan las noticias que
+    ahora calzan y no estaban; las que dejaron de calzar no se borran. Con `sin_red` (ver
+    SIN_RED) tampoco se decodifica ninguna URL.
+    """
+    from gnoticias.keywords import MatcherKeywords
+    from gnoticias.metricas import metricas
+    from gnoticias.pipeline import Pipeline, Trabajo
+
+    db_gnoticias.asegurar_esquema()
+    asegurar_tabla_archivo()
+    feeds = feeds_archivados(candidato_ids, desde, hasta)
+    with get_db_connection() as conn:
+        keywords = {fila[0]: fila[1] for fila in conn.execute("SELECT id_candidato, keywords FROM candidatos")}
+    matcher = MatcherKeywords(keywords)
+    print(f"ℹ️ {len(feeds)} feeds archivados para reprocesar.")
+
+    def trabajos():
+        for hash_contenido, url, fecha_consulta, usar_fecha_entrada, inicio, ids in feeds:
+            ids = [c for c in ids if not candidato_ids or c in candidato_ids]
+            yield Trabajo(url, ids[0], candidatos=ids, etiqueta=f"archivo {inicio}",
+                          fecha_consulta=datetime.fromisoformat(fecha_consulta) if fecha_consulta else None,
+                          usar_fecha_entrada=usar_fecha_entrada, archivado=hash_contenido)
+
+    metricas.reiniciar()
+    cache_urls.reiniciar_estadisticas()
+    resolver = ResolverArchivo(sin_red)
+    with db_gnoticias.GnoticiasWriter(shards=shards, podar=False) as writer:
+        writer.cargar_indice(list(keywords) if atribucion_cruzada or not candidato_ids else candidato_ids)
+        pipeline = Pipeline(writer, matcher, atribucion_cruzada=atribucion_cruzada, workers_fetch=workers, resolver=resolver)
+        pipeline.ejecutar(trabajos())
+    print(f"✅ Reprocesamiento terminado: {writer.insertadas} noticias nuevas.")
+    print(f"ℹ️ {resolver.resumen()} | {cache_urls.resumen()}")
+    print(f"ℹ️ Etapas: {metricas.resumen()}")
+    return writer.insertadas
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Reprocesar los feeds archivados sin volver a descargarlos.")
+    parser.add_argument("--empaquetar", metavar="TAR", help="Solo guardar el archivo local en un paquete (tar).")
+    parser.add_argument("--importar", metavar="TAR", nargs="+", help="Solo agregar paquetes al archivo local.")
+    parser.add_argument("--candidatos", type=int, nargs="+", help="IDs de candidatos (por defecto, todos los archivados).")
+    parser.add_argument("--desde", help="Primera fecha de las ventanas a reprocesar (YYYY-MM-DD).")
+    parser.add_argument("--hasta", help="Última fecha de las ventanas a reprocesar (YYYY-MM-DD).")
+    parser.add_argument("--atribucion-cruzada", action="store_true", help="Guardar cada noticia también para los otros candidatos que menciona.")
+    parser.add_argument("--shards", action="store_true", help="Escribir las noticias en el shard mensual.")
+    parser.add_argument("--workers", type=int, default=WORKERS_DEFAULT, help="Feeds archivados leídos en paralelo.")
+    parser.add_argument("--sin-red", choices=SIN_RED, help="No decodificar las URLs que falten: guardar el link de Google News u omitir la noticia.")
+    args = parser.parse_args()
+    if args.empaquetar:
+        empaquetar(args.empaquetar)
+    elif args.importar:
+        importar(args.importar)
+    else:
+        reprocesar(args.candidatos, args.desde, args.hasta, atribucion_cruzada=args.atribucion_cruzada, shards=args.shards,
+                   workers=args.workers, sin_red=args.sin_red)
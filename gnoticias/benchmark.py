@@ -0,0 +1,272 @@
+"""Benchmark offline del pipeline de gnoticias.
+
+Levanta un servidor HTTP local que imita la búsqueda RSS de Google News, reemplaza
+`gnewsdecoder` por un stub con latencia configurable y ejecuta `ex_gnoticias.main` y
+`fetch_news_for_candidate_historico` contra una base SQLite temporal. Imprime (y opcionalmente
+agrega a un archivo JSON lines) una fila comparable entre commits:
+
+    python -m gnoticias.benchmark --candidatos 2000 --entradas 40 --salida bench.jsonl
+
+El escenario `parsers` compara los parsers de feeds (http_feeds.PARSERS) sobre feeds
+históricos sintéticos de LIMITE_ITEMS_FEED entradas: tiempo y memoria por entrada.
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import resource
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import gnoticias.cache_urls as cache_urls_mod
+import gnoticias.db_gnoticias as db_gnoticias
+import gnoticias.ex_gnoticias as ex_gnoticias
+import gnoticias.ex_gnoticias_historico as ex_historico
+import gnoticias.http_feeds as http_feeds
+from gnoticias.cache_urls import cache_urls
+from gnoticias.pipeline import LIMITE_ITEMS_FEED
+from gnoticias.ritmo import ritmo_decoder, ritmo_feeds
+
+_RE_NOMBRE = re.compile(r'"([^"]+)"')
+_RE_FECHAS = re.compile(r"after:(\d{4}-\d{2}-\d{2}) before:(\d{4}-\d{2}-\d{2})")
+
+
+def feed_sintetico(query, entradas, fecha_base):
+    """RSS con `entradas` items por cada nombre entre comillas de la query, con el tope de Google News."""
+    nombres = _RE_NOMBRE.findall(query) or ["Sin Nombre"]
+    fechas = _RE_FECHAS.search(query)
+    inicio = datetime.strptime(fechas.group(1), "%Y-%m-%d") if fechas else fecha_base
+    items = []
+    for i in range(min(entradas * len(nombres), LIMITE_ITEMS_FEED)):
+        nombre = nombres[i % len(nombres)]
+        guid = "CBMi" + hashlib.md5(f"{query}|{i}".encode("utf-8")).hexdigest()
+        publicado = format_datetime(inicio + timedelta(minutes=17 * i))
+        items.append(
+            f"<item><title>Titular {i} sobre {nombre} en campaña - Medio {i % 25}</title>"
+            f"<link>https://news.google.com/rss/articles/{guid}?oc=5</link>"
+            f"<guid isPermaLink=\"false\">{guid}</guid><pubDate>{publicado}</pubDate>"
+            f"<source url=\"https://medio{i % 25}.com.co\">Medio {i % 25}</source></item>"
+        )
+    return (
+        "<?xml version=\"1.0\" encoding=\"UTF-8\"?><rss version=\"2.0\"><channel><title>bench</title>"
+        f"<lastBuildDate>{format_datetime(datetime.now())}</lastBuildDate>{''.join(items)}</channel></rss>"
+    ).encode("utf-8")
+
+
+class ServidorRSS:
+    """Servidor HTTP local en un hilo que responde `/rss/search?q=...` con feeds sintéticos."""
+    def __init__(self, entradas):
+        self.entradas = entradas
+        self.servidas = 0
+        self.solicitudes = 0
+        self._lock = threading.Lock()
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query).get("q", [""])[0]
+                cuerpo = feed_sintetico(query, servidor.entradas, datetime(2025, 6, 1))
+                with servidor._lock:
+                    servidor.solicitudes += 1
+                    servidor.servidas += cuerpo.count(b"<item>")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/rss/search"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.httpd.shutdown()
+
+
+def decoder_stub(latencia):
+    """Reemplazo de `gnewsdecoder` que espera `latencia` segundos y retorna una URL ficticia."""
+    def gnewsdecoder(url, *args, **kwargs):
+        time.sleep(latencia)
+        return {"status": True, "decoded_url": url.replace("news.google.com/rss/articles", "medio.example/nota")}
+    return gnewsdecoder
+
+
+def crear_base(ruta, candidatos):
+    with contextlib.redirect_stdout(io.StringIO()):
+        db_gnoticias.migrar(ruta)
+    conn = sqlite3.connect(ruta)
+    conn.executemany(
+        "INSERT INTO candidatos (id_candidato, nombre, id_tema, keywords) VALUES (?, ?, 1, ?)",
+        [(i, f"Candidato Bench {i:05d}", f"Bench {i:05d},Candidato Bench {i:05d}") for i in range(1, candidatos + 1)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def contar_noticias(ruta):
+    conn = sqlite3.connect(ruta)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM gnoticias").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "desconocido"
+
+
+def medir(nombre, funcion, servidor, ruta_db, candidatos, verbose=False):
+    """Ejecuta `funcion` midiendo tiempo, solicitudes, entradas servidas, filas escritas y memoria pico.
+
+    La memoria es el RSS máximo del proceso (ru_maxrss), que no agrega overhead a la medición;
+    al correr varios escenarios seguidos cada uno reporta el máximo acumulado hasta ese punto.
+    """
+    servidas_antes = servidor.servidas
+    solicitudes_antes = servidor.solicitudes
+    filas_antes = contar_noticias(ruta_db)
+    inicio = time.perf_counter()
+    salida = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with salida:
+        funcion()
+    segundos = time.perf_counter() - inicio
+    pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    entradas = servidor.servidas - servidas_antes
+    filas = contar_noticias(ruta_db) - filas_antes
+    return {
+        "escenario": nombre,
+        "segundos": round(segundos, 3),
+        "solicitudes": servidor.solicitudes - solicitudes_antes,
+        "candidatos_por_seg": round(candidatos / segundos, 2),
+        "entradas_por_seg": round(entradas / segundos, 2),
+        "escrituras_por_seg": round(filas / segundos, 2),
+        "filas_escritas": filas,
+        "memoria_pico_mb": round(pico_kb / 1024, 2),
+    }
+
+
+def comparar_parsers(feeds=200, repeticiones=3):
+    """Tiempo (mejor de `repeticiones`) y memoria por entrada de cada parser sobre `feeds` feeds históricos.
+
+    `bytes_por_entrada` es lo que queda retenido mientras el pipeline conserva las entradas
+    (tracemalloc tras parsear todos los feeds); `pico_kb_por_feed` el máximo durante un parseo.
+    """
+    contenidos = [
+        feed_sintetico(f'"Candidato Bench {i:05d}" after:2025-03-01 before:2025-03-31', LIMITE_ITEMS_FEED, datetime(2025, 6, 1))
+        for i in range(feeds)
+    ]
+    resultados = []
+    for nombre, parser in http_feeds.PARSERS.items():
+        mejor = None
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            total = sum(len(parser(contenido).entries) for contenido in contenidos)
+            segundos = time.perf_counter() - inicio
+            mejor = segundos if mejor is None else min(mejor, segundos)
+        tracemalloc.start()
+        parseados = [parser(contenido) for contenido in contenidos]
+        retenidos, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        parser(contenidos[0])
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del parseados
+        resultados.append({
+            "escenario": f"parser_{nombre}",
+            "segundos": round(mejor, 3),
+            "feeds": feeds,
+            "entradas_por_seg": round(total / mejor, 2),
+            "us_por_entrada": round(mejor / total * 1e6, 2),
+            "bytes_por_entrada": round(retenidos / total),
+            "pico_kb_por_feed": round((pico - base) / 1024, 1),
+        })
+    return resultados
+
+
+def ejecutar(candidatos=2000, entradas=40, latencia_decoder=0.002, concurrencia=8, candidatos_historico=20, dias_historico=14,
+             escenarios=("diario", "historico"), verbose=False, lote=1, parser=None):
+    """Corre los escenarios pedidos y retorna la lista de resultados."""
+    parser = parser or http_feeds.PARSER_DEFAULT
+    if not {"diario", "historico"} & set(escenarios):
+        resultados = comparar_parsers() if "parsers" in escenarios else []
+        return [dict(commit=commit_actual(), fecha=datetime.now().isoformat(timespec="seconds"), **resultado) for resultado in resultados]
+    directorio = tempfile.mkdtemp(prefix="gnoticias_bench_")
+    ruta_db = os.path.join(directorio, "gnoticias.db")
+    crear_base(ruta_db, candidatos)
+    servidor = ServidorRSS(entradas)
+    originales = (db_gnoticias.DB_PATH, http_feeds.URL_BUSQUEDA_RSS, cache_urls_mod.gnewsdecoder, ritmo_feeds.activo, ritmo_decoder.activo,
+                  http_feeds.PARSER_DEFAULT)
+    db_gnoticias.DB_PATH = ruta_db
+    http_feeds.URL_BUSQUEDA_RSS = servidor.url
+    cache_urls_mod.gnewsdecoder = decoder_stub(latencia_decoder)
+    # El servidor local no limita solicitudes: se mide el pipeline sin el control de ritmo
+    ritmo_feeds.activo = ritmo_decoder.activo = False
+    http_feeds.PARSER_DEFAULT = parser
+    cache_urls.limpiar()
+    resultados = []
+    try:
+        if "diario" in escenarios:
+            resultados.append(medir("diario", lambda: ex_gnoticias.main(concurrencia=concurrencia, candidatos_por_lote=lote), servidor, ruta_db, candidatos, verbose))
+        if "historico" in escenarios:
+            def historico():
+                inicio = datetime(2025, 3, 1)
+                with db_gnoticias.GnoticiasWriter() as writer:
+                    for candidato_id in range(1, candidatos_historico + 1):
+                        nombre = f"Candidato Bench {candidato_id:05d}"
+                        ex_historico.fetch_news_for_candidate_historico(candidato_id, nombre, f"Bench {candidato_id:05d}", inicio,
+                                                                        inicio + timedelta(days=dias_historico - 1), writer=writer)
+            resultados.append(medir("historico", historico, servidor, ruta_db, candidatos_historico, verbose))
+    finally:
+        db_gnoticias.DB_PATH, http_feeds.URL_BUSQUEDA_RSS, cache_urls_mod.gnewsdecoder, ritmo_feeds.activo, ritmo_decoder.activo, \
+            http_feeds.PARSER_DEFAULT = originales
+        servidor.cerrar()
+    parametros = {"commit": commit_actual(), "fecha": datetime.now().isoformat(timespec="seconds"), "candidatos": candidatos,
+                  "entradas": entradas, "latencia_decoder": latencia_decoder, "concurrencia": concurrencia, "lote": lote,
+                  "parser": parser}
+    if "parsers" in escenarios:
+        resultados.extend(comparar_parsers())
+    return [dict(parametros, **resultado) for resultado in resultados]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark offline de gnoticias con un Google News RSS local.")
+    parser.add_argument("--candidatos", type=int, default=2000, help="Candidatos en la base temporal.")
+    parser.add_argument("--entradas", type=int, default=40, help="Entradas por feed sintético.")
+    parser.add_argument("--latencia-decoder", type=float, default=0.002, help="Segundos por llamada al decoder simulado.")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Concurrencia del escenario diario.")
+    parser.add_argument("--lote", type=int, default=1, help="Candidatos por consulta en el escenario diario.")
+    parser.add_argument("--candidatos-historico", type=int, default=20, help="Candidatos del escenario histórico.")
+    parser.add_argument("--dias-historico", type=int, default=14, help="Días por candidato en el escenario histórico.")
+    parser.add_argument("--escenarios", nargs="+", default=["diario", "historico"], choices=["diario", "historico", "parsers"])
+    parser.add_argument("--parser", choices=sorted(http_feeds.PARSERS), default=http_feeds.PARSER_DEFAULT,
+                        help="Parser de feeds de los escenarios diario e histórico.")
+    parser.add_argument("--salida", help="Archivo JSON lines al que se agregan los resultados.")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar la salida de los scripts.")
+    args = parser.parse_args()
+    filas = ejecutar(args.candidatos, args.entradas, args.latencia_decoder, args.concurrencia, args.candidatos_historico,
+                     args.dias_historico, tuple(args.escenarios), args.verbose, args.lote, args.parser)
+    for fila in filas:
+        print(json.dumps(fila, ensure_ascii=False))
+    if args.salida:
+        with open(args.salida, "a", encoding="utf-8") as f:
+            for fila in filas:
+                f.write(json.dumps(fila, ensure_ascii=False) + "\n")
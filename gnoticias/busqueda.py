@@ -0,0 +1,159 @@
+"""Búsqueda de texto completo (FTS5) sobre los titulares y medios de `gnoticias`.
+
+`gnoticias_fts` es un índice de contenido externo sobre `gnoticias` (`content_rowid` es
+`id_fila`, alias estable del rowid): no guarda otra copia de los titulares, solo el índice,
+mantenido por triggers en la misma transacción que cada escritura. El tokenizador
+`unicode61` con `remove_diacritics 2` ignora mayúsculas, tildes y puntuación, igual que
+`normalize_text`. Cada shard tiene su propio índice; `buscar()` consulta todos.
+
+    python -m gnoticias.busqueda "petro reforma" --candidato 1 --desde 2025-01-01
+    python -m gnoticias.busqueda --reindexar
+"""
+import sqlite3
+from datetime import datetime
+
+# Resultados por defecto de `buscar`
+LIMITE_DEFAULT = 50
+
+SQL_FTS = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS {esquema}.gnoticias_fts USING fts5(
+        noticia, medio,
+        content = 'gnoticias', content_rowid = 'id_fila',
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {esquema}.trg_gnoticias_fts_insert AFTER INSERT ON gnoticias BEGIN
+        INSERT INTO gnoticias_fts (rowid, noticia, medio) VALUES (NEW.id_fila, NEW.noticia, NEW.medio);
+    END
+    """,
+    # Con contenido externo se borra con el comando 'delete' y los valores indexados
+    """
+    CREATE TRIGGER IF NOT EXISTS {esquema}.trg_gnoticias_fts_delete AFTER DELETE ON gnoticias BEGIN
+        INSERT INTO gnoticias_fts (gnoticias_fts, rowid, noticia, medio) VALUES ('delete', OLD.id_fila, OLD.noticia, OLD.medio);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {esquema}.trg_gnoticias_fts_update AFTER UPDATE OF noticia, medio ON gnoticias BEGIN
+        INSERT INTO gnoticias_fts (gnoticias_fts, rowid, noticia, medio) VALUES ('delete', OLD.id_fila, OLD.noticia, OLD.medio);
+        INSERT INTO gnoticias_fts (rowid, noticia, medio) VALUES (NEW.id_fila, NEW.noticia, NEW.medio);
+    END
+    """,
+)
+
+TRIGGERS_FTS = ("trg_gnoticias_fts_insert", "trg_gnoticias_fts_delete", "trg_gnoticias_fts_update")
+
+
+def crear_fts(conn, esquema="main"):
+    """Crea el índice y sus triggers en `esquema`; retorna True si el índice no existía.
+
+    Un índice del formato anterior (con su propia copia de los titulares) se descarta junto con
+    sus triggers y se crea de nuevo.
+    """
+    fila = conn.execute(
+        f"SELECT sql FROM {esquema}.sqlite_master WHERE type = 'table' AND name = 'gnoticias_fts'"
+    ).fetchone()
+    if fila is not None and "content_rowid" not in fila[0]:
+        for trigger in TRIGGERS_FTS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {esquema}.{trigger}")
+        conn.execute(f"DROP TABLE {esquema}.gnoticias_fts")
+        fila = None
+    for sql in SQL_FTS:
+        conn.execute(sql.format(esquema=esquema))
+    return fila is None
+
+
+def indexar(conn, esquema="main"):
+    """Regenera el índice de `esquema` desde su tabla `gnoticias` (sin abrir transacción propia)."""
+    conn.execute(f"INSERT INTO {esquema}.gnoticias_fts (gnoticias_fts) VALUES ('rebuild')")
+    conn.execute(f"INSERT INTO {esquema}.gnoticias_fts (gnoticias_fts) VALUES ('optimize')")
+
+
+def reindexar(db_path=None):
+    """Regenera desde cero el índice de la base principal y de cada shard."""
+    import gnoticias.db_gnoticias as db_gnoticias
+    from gnoticias.shards import listar_shards
+
+    ruta = db_path or db_gnoticias.DB_PATH
+    db_gnoticias.asegurar_esquema(ruta)
+    for archivo in [ruta] + listar_shards(ruta):
+        conn = sqlite3.connect(archivo, timeout=30)
+        try:
+            with conn:
+                crear_fts(conn)
+                indexar(conn)
+            total = conn.execute("SELECT COUNT(*) FROM gnoticias_fts").fetchone()[0]
+            print(f"✅ Índice de búsqueda regenerado en {archivo}: {total} noticias.")
+        finally:
+            conn.close()
+
+
+def consulta_literal(texto):
+    """Convierte texto libre en una consulta FTS5 que exige todos sus términos (sin operadores)."""
+    from gnoticias.keywords import normalize_text
+
+    return " ".join(f'"{termino}"' for termino in normalize_text(texto).split())
+
+
+def buscar(consulta, candidato_id=None, desde=None, hasta=None, limite=LIMITE_DEFAULT, db_path=None):
+    """Noticias que cumplen la consulta FTS5, de más a menos relevante (bm25).
+
+    `desde`/`hasta` son fechas (date/datetime o 'YYYY-MM-DD') inclusivas. Retorna una lista
+    de dicts con id_gnoticia, id_candidato, fecha, noticia, medio, link y rank (menor = mejor).
+    """
+    from gnoticias.shards import conectar
+
+    condiciones, parametros = ["f.gnoticias_fts MATCH ?"], [consulta]
+    if candidato_id is not None:
+        condiciones.append("g.id_candidato = ?")
+        parametros.append(candidato_id)
+    if desde is not None:
+        condiciones.append("g.fecha >= ?")
+        parametros.append(str(desde)[:10])
+    if hasta is not None:
+        # Las fechas guardadas incluyen la hora
+        condiciones.append("g.fecha < date(?, '+1 day')")
+        parametros.append(str(hasta)[:10])
+    resultados = []
+    with conectar(db_path) as conn:
+        esquemas = [fila[1] for fila in conn.execute("PRAGMA database_list") if fila[1] not in ("temp", "estado")]
+        for esquema in esquemas:
+            filas = conn.execute(f"""
+                SELECT g.id_gnoticia, g.id_candidato, g.fecha, g.noticia, g.medio, g.link, f.rank
+                FROM {esquema}.gnoticias_fts AS f
+                JOIN {esquema}.gnoticias AS g ON g.id_fila = f.rowid
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY f.rank LIMIT ?
+            """, parametros + [limite]).fetchall()
+            resultados.extend(dict(fila) for fila in filas)
+    # bm25 de índices distintos no es exactamente comparable, pero alcanza para ordenar
+    resultados.sort(key=lambda fila: fila["rank"])
+    return resultados[:limite]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Búsqueda de texto completo en los titulares de gnoticias.")
+    parser.add_argument("consulta", nargs="?", help="Consulta FTS5 (p. ej. 'petro AND reforma', '\"paz total\"', 'minist*').")
+    parser.add_argument("--literal", action="store_true", help="Tratar la consulta como texto libre (todas las palabras, sin operadores).")
+    parser.add_argument("--candidato", type=int, help="Filtrar por id_candidato.")
+    parser.add_argument("--desde", help="Fecha inicial YYYY-MM-DD.")
+    parser.add_argument("--hasta", help="Fecha final YYYY-MM-DD.")
+    parser.add_argument("--limite", type=int, default=LIMITE_DEFAULT, help="Cantidad máxima de resultados.")
+    parser.add_argument("--reindexar", action="store_true", help="Regenerar el índice desde gnoticias.")
+    args = parser.parse_args()
+    if args.reindexar:
+        reindexar()
+    if args.consulta:
+        desde = datetime.strptime(args.desde, "%Y-%m-%d").date() if args.desde else None
+        hasta = datetime.strptime(args.hasta, "%Y-%m-%d").date() if args.hasta else None
+        consulta = consulta_literal(args.consulta) if args.literal else args.consulta
+        try:
+            resultados = buscar(consulta, args.candidato, desde, hasta, args.limite)
+        except sqlite3.OperationalError as e:
+            print(f"❌ Consulta inválida '{consulta}': {e}")
+            raise SystemExit(1)
+        for fila in resultados:
+            print(f"{str(fila['fecha'])[:10]}  [{fila['id_candidato']}] {fila['noticia']}  ({fila['medio']})")
+        print(f"ℹ️ {len(resultados)} resultados para '{consulta}'.")
@@ -0,0 +1,165 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from googlenewsdecoder import gnewsdecoder
+
+import gnoticias.db_gnoticias as db_gnoticias
+from gnoticias.metricas import metricas
+from gnoticias.ritmo import ritmo_decoder
+
+# Máximo de URLs decodificadas que se mantienen en memoria (LRU)
+LRU_MAX_ITEMS = 20000
+
+SQL_GUARDAR_URL = "INSERT OR REPLACE INTO gnoticias_url_cache (id_gnoticia, link, fecha) VALUES (?, ?, ?)"
+
+
+class CacheUrls:
+    """Caché persistente de URLs decodificadas (tabla `gnoticias_url_cache` + LRU en memoria).
+
+    La llave es el id corto de la entrada de Google News (md5 del `id` del feed), de modo
+    que una noticia que reaparece en otra ejecución no vuelve a pasar por `gnewsdecoder`.
+    Cada hilo lee con su propia conexión, abierta una sola vez y cerrada con `cerrar()` (el
+    Pipeline la llama al terminar); las URLs nuevas se encolan en el escritor y se guardan en
+    el mismo commit que el lote de noticias.
+    """
+    def __init__(self, max_items=LRU_MAX_ITEMS):
+        self.max_items = max_items
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock_conexiones = threading.Lock()
+        self._tabla_lista = False
+        self.reiniciar_estadisticas()
+
+    def reiniciar_estadisticas(self):
+        """Pone en cero los contadores de aciertos y fallos de la ejecución."""
+        self.aciertos_memoria = 0
+        self.aciertos_db = 0
+        self.fallos = 0
+
+    def limpiar(self):
+        """Vacía la LRU y los contadores (p. ej. al cambiar de base de datos)."""
+        with self._lock:
+            self._lru.clear()
+            self._tabla_lista = False
+        self.cerrar()
+        self.reiniciar_estadisticas()
+
+    def cerrar(self):
+        """Cierra las conexiones de lectura de todos los hilos; se vuelven a abrir al usarlas."""
+        with self._lock_conexiones:
+            conexiones, self._conexiones = self._conexiones, []
+            self._local = threading.local()
+        for conn in conexiones:
+            conn.close()
+
+    def resumen(self):
+        """Texto corto con los contadores de la ejecución."""
+        return f"cache_urls aciertos_memoria={self.aciertos_memoria};aciertos_db={self.aciertos_db};fallos={self.fallos}"
+
+    def _conexion(self):
+        """Conexión de este hilo a la base actual (se reabre si cambió `DB_PATH`)."""
+        ruta = db_gnoticias.DB_PATH
+        local = self._local
+        if getattr(local, "ruta", None) != ruta:
+            anterior = getattr(local, "conn", None)
+            # `cerrar()` puede cerrarla desde otro hilo al final de la ejecución
+            conn = sqlite3.connect(ruta, timeout=30, isolation_level=None, check_same_thread=False)
+            db_gnoticias.adjuntar_estado(conn, ruta)
+            with self._lock_conexiones:
+                if anterior is not None and anterior in self._conexiones:
+                    self._conexiones.remove(anterior)
+                self._conexiones.append(conn)
+            if anterior is not None:
+                anterior.close()
+            local.ruta, local.conn = ruta, conn
+        return local.conn
+
+    def _asegurar_tabla(self):
+        if self._tabla_lista:
+            return
+        with self._lock:
+            if self._tabla_lista:
+                return
+            self._conexion().execute("""
+                CREATE TABLE IF NOT EXISTS estado.gnoticias_url_cache (
+                    id_gnoticia TEXT PRIMARY KEY,
+                    link TEXT NOT NULL,
+                    fecha TEXT
+                )
+            """)
+            self._tabla_lista = True
+
+    def _recordar(self, id_gnoticia, link):
+        with self._lock:
+            self._lru[id_gnoticia] = link
+            self._lru.move_to_end(id_gnoticia)
+            while len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+
+    def obtener(self, id_gnoticia):
+        """Retorna la URL decodificada guardada para `id_gnoticia`, o None si no está en caché."""
+        with self._lock:
+            link = self._lru.get(id_gnoticia)
+            if link is not None:
+                self._lru.move_to_end(id_gnoticia)
+                self.aciertos_memoria += 1
+                return link
+        try:
+            self._asegurar_tabla()
+            row = self._conexion().execute("SELECT link FROM gnoticias_url_cache WHERE id_gnoticia = ?", (id_gnoticia,)).fetchone()
+        except Exception as e:
+            print(f"❌ Error al consultar caché de URLs {id_gnoticia}: {e}")
+            row = None
+        if row is None:
+            return None
+        with self._lock:
+            self.aciertos_db += 1
+        self._recordar(id_gnoticia, row[0])
+        return row[0]
+
+    def guardar(self, id_gnoticia, link, writer=None):
+        """Guarda la URL decodificada en memoria y en la tabla `gnoticias_url_cache`.
+
+        Con `writer` (GnoticiasWriter) la fila se escribe en su próximo commit; si no, al instante.
+        """
+        self._recordar(id_gnoticia, link)
+        params = (id_gnoticia, link, datetime.now().isoformat())
+        try:
+            self._asegurar_tabla()
+            if writer is not None:
+                writer.agregar_sentencia(SQL_GUARDAR_URL, params)
+            else:
+                self._conexion().execute(SQL_GUARDAR_URL, params)
+        except Exception as e:
+            print(f"❌ Error al guardar en caché de URLs {id_gnoticia}: {e}")
+
+    def resolver(self, id_gnoticia, google_news_url, writer=None):
+        """Retorna la URL real de la noticia, decodificándola solo si no está en caché."""
+        if not google_news_url:
+            return ""
+        with metricas.etapa("cache_urls"):
+            link = self.obtener(id_gnoticia)
+        if link is not None:
+            return link
+        with self._lock:
+            self.fallos += 1
+        ritmo_decoder.esperar()
+        with metricas.etapa("decode"):
+            resultado = gnewsdecoder(google_news_url)
+        link = resultado.get("decoded_url")
+        if resultado.get("status") and link:
+            ritmo_decoder.exito()
+            with metricas.etapa("cache_urls"):
+                self.guardar(id_gnoticia, link, writer)
+            return link
+        ritmo_decoder.penalizar(f"decoder sin resultado ({resultado.get('message', 'sin mensaje')})")
+        # Sin decodificar: se conserva la URL de Google News, pero no se cachea
+        return link or google_news_url
+
+
+# Instancia compartida por los scripts diario e histórico
+cache_urls = CacheUrls()
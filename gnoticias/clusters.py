@@ -0,0 +1,256 @@
+"""Agrupación de noticias casi duplicadas (la misma historia en varios medios).
+
+Cada titular normalizado (sin el sufijo " - Medio" de Google News) se resume con MinHash sobre
+shingles de caracteres y la firma se parte en bandas (LSH). Dos titulares de fechas cercanas
+(±DIAS_CANDIDATOS) que comparten una banda son candidatos; se confirman comparando sus
+palabras (`similitud_tokens`) y la noticia nueva hereda el `id_cluster` del candidato, o abre
+un cluster propio (su `id_gnoticia`). Las bandas de los últimos VENTANA_DIAS días quedan en la tabla
+`clusters_lsh`, así que cada fila nueva cuesta una consulta indexada sin importar el tamaño
+del histórico. Para agrupar las noticias que ya están en la base:
+
+    python -m gnoticias.clusters
+"""
+import hashlib
+import struct
+from datetime import datetime, timedelta
+
+from gnoticias.keywords import normalize_text
+
+# Largo de los shingles de caracteres
+LARGO_SHINGLE = 5
+# Casilleros del MinHash = BANDAS * FILAS_POR_BANDA (umbral LSH ~ (1/8)^(1/4) = 0.6 de Jaccard)
+BANDAS = 8
+FILAS_POR_BANDA = 4
+# Similitud mínima (0-100, `similitud_tokens`) para confirmar que dos titulares son la misma
+# historia; titulares de plantilla que solo cambian en una palabra quedan por debajo
+UMBRAL_SIMILITUD = 75
+# Días antes y después de la fecha de una noticia en que se buscan candidatos
+DIAS_CANDIDATOS = 3
+# Palabras que no cuentan al comparar titulares
+STOPWORDS = {"a", "al", "ante", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los", "o",
+             "para", "por", "que", "se", "sobre", "su", "sus", "tras", "un", "una", "y"}
+# Candidatos LSH que se confirman como máximo por noticia
+MAX_CANDIDATOS = 20
+# Días de bandas que se conservan en `clusters_lsh`
+VENTANA_DIAS = 30
+# Filas por commit en el modo por lotes
+TAMANO_LOTE_HISTORICO = 2000
+
+_CASILLEROS = BANDAS * FILAS_POR_BANDA
+# Los valores de un casillero ocupan 58 bits; el relleno de los vacíos se suma por encima
+_DESPLAZAMIENTO = 1 << 58
+
+SQL_CREAR_CLUSTERS_LSH = """
+    CREATE TABLE IF NOT EXISTS estado.clusters_lsh (
+        banda INTEGER NOT NULL,
+        firma INTEGER NOT NULL,
+        id_gnoticia TEXT NOT NULL,
+        id_cluster TEXT NOT NULL,
+        fecha TEXT NOT NULL,
+        PRIMARY KEY (banda, firma, id_gnoticia)
+    ) WITHOUT ROWID
+"""
+SQL_INDICE_CLUSTERS_FECHA = "CREATE INDEX IF NOT EXISTS estado.idx_clusters_lsh_fecha ON clusters_lsh (fecha)"
+
+
+def texto_comparable(noticia):
+    """Titular normalizado; `noticia` ya llega sin el medio (ver pipeline.process_feed_entry)."""
+    return normalize_text(noticia or "")
+
+
+def similitud_tokens(a, b):
+    """Jaccard (0-100) de las palabras de dos titulares normalizados, sin STOPWORDS."""
+    palabras_a = set(a.split()) - STOPWORDS
+    palabras_b = set(b.split()) - STOPWORDS
+    if not palabras_a or not palabras_b:
+        return 0.0
+    return len(palabras_a & palabras_b) / len(palabras_a | palabras_b) * 100
+
+
+def _hash64(datos):
+    return struct.unpack(">q", hashlib.blake2b(datos, digest_size=8).digest())[0]
+
+
+def firmas_lsh(texto_normalizado):
+    """Firma de cada banda (entero de 64 bits) del MinHash del texto; vacía si el texto es muy corto.
+
+    Es un MinHash de una sola permutación: cada shingle se hashea una vez y cae en uno de
+    _CASILLEROS casilleros, de los que se guarda el mínimo. Los casilleros vacíos (titulares
+    cortos) toman el valor del siguiente ocupado más un desplazamiento por la distancia, para
+    que la firma siga siendo comparable.
+    """
+    texto = texto_normalizado
+    if len(texto) < LARGO_SHINGLE:
+        return []
+    minimos = [None] * _CASILLEROS
+    for i in range(len(texto) - LARGO_SHINGLE + 1):
+        valor = _hash64(texto[i:i + LARGO_SHINGLE].encode("utf-8")) & 0xFFFFFFFFFFFFFFFF
+        casillero, valor = valor % _CASILLEROS, valor >> 6
+        if minimos[casillero] is None or valor < minimos[casillero]:
+            minimos[casillero] = valor
+    ocupados = list(minimos)
+    for casillero in range(_CASILLEROS):
+        salto = 0
+        while ocupados[(casillero + salto) % _CASILLEROS] is None:
+            salto += 1
+        if salto:
+            minimos[casillero] = ocupados[(casillero + salto) % _CASILLEROS] + salto * _DESPLAZAMIENTO
+    return [
+        _hash64(struct.pack(f">{FILAS_POR_BANDA}Q", *minimos[banda * FILAS_POR_BANDA:(banda + 1) * FILAS_POR_BANDA]))
+        for banda in range(BANDAS)
+    ]
+
+
+def _fecha_texto(fecha):
+    return fecha.strftime("%Y-%m-%d") if hasattr(fecha, "strftime") else str(fecha)[:10]
+
+
+def _ventana(dia):
+    """(desde, hasta) 'YYYY-MM-DD' de DIAS_CANDIDATOS alrededor de `dia`, o None si no es una fecha."""
+    try:
+        centro = datetime.strptime(dia, "%Y-%m-%d")
+    except ValueError:
+        return None
+    margen = timedelta(days=DIAS_CANDIDATOS)
+    return (centro - margen).strftime("%Y-%m-%d"), (centro + margen).strftime("%Y-%m-%d")
+
+
+class AgrupadorHistorias:
+    """Asigna `id_cluster` a noticias nuevas usando las bandas guardadas en `clusters_lsh`.
+
+    Trabaja sobre la conexión del escritor: las bandas de las noticias asignadas quedan
+    pendientes hasta `filas_pendientes()` y se guardan en la misma transacción que las noticias.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.asignadas = 0
+        self.agrupadas = 0
+        self._pendientes = {}
+        self._filas = []
+        conn.execute(SQL_CREAR_CLUSTERS_LSH)
+        conn.execute(SQL_INDICE_CLUSTERS_FECHA)
+        conn.commit()
+
+    def _candidatos(self, firmas, dia):
+        """[(id_gnoticia, id_cluster, texto_normalizado o None)] de fechas cercanas a `dia` que comparten alguna banda."""
+        desde, hasta = _ventana(dia) or ("", "9999-12-31")
+        encontrados = {}
+        for banda, firma in enumerate(firmas):
+            for id_gnoticia, id_cluster, texto, dia_candidato in self._pendientes.get((banda, firma), ()):
+                if desde <= dia_candidato <= hasta:
+                    encontrados.setdefault(id_gnoticia, (id_cluster, texto))
+        # Una banda muy repetida (la misma historia en muchos medios) no debe recorrerse completa
+        for banda, firma in enumerate(firmas):
+            if len(encontrados) >= MAX_CANDIDATOS:
+                break
+            for id_gnoticia, id_cluster in self.conn.execute(
+                "SELECT id_gnoticia, id_cluster FROM clusters_lsh WHERE banda = ? AND firma = ? AND fecha BETWEEN ? AND ? LIMIT ?",
+                (banda, firma, desde, hasta, MAX_CANDIDATOS),
+            ):
+                encontrados.setdefault(id_gnoticia, (id_cluster, None))
+        return [(id_gnoticia, id_cluster, texto) for id_gnoticia, (id_cluster, texto) in encontrados.items()][:MAX_CANDIDATOS]
+
+    def _texto(self, id_gnoticia):
+        fila = self.conn.execute("SELECT noticia FROM gnoticias WHERE id_gnoticia = ? LIMIT 1", (id_gnoticia,)).fetchone()
+        return texto_comparable(fila[0]) if fila else ""
+
+    def asignar(self, id_gnoticia, noticia, fecha):
+        """Retorna el `id_cluster` de la noticia y deja sus bandas pendientes de guardar."""
+        texto = texto_comparable(noticia)
+        firmas = firmas_lsh(texto)
+        dia = _fecha_texto(fecha)
+        id_cluster = None
+        for candidato_id, candidato_cluster, candidato_texto in self._candidatos(firmas, dia) if firmas else ():
+            if candidato_id == id_gnoticia:
+                id_cluster = candidato_cluster
+                break
+            if candidato_texto is None:
+                candidato_texto = self._texto(candidato_id)
+            if similitud_tokens(texto, candidato_texto) >= UMBRAL_SIMILITUD:
+                id_cluster = candidato_cluster
+                break
+        self.asignadas += 1
+        if id_cluster is None:
+            id_cluster = id_gnoticia
+        else:
+            self.agrupadas += 1
+        for banda, firma in enumerate(firmas):
+            self._pendientes.setdefault((banda, firma), []).append((id_gnoticia, id_cluster, texto, dia))
+            self._filas.append((banda, firma, id_gnoticia, id_cluster, dia))
+        return id_cluster
+
+    def filas_pendientes(self):
+        """Retorna y descarta las bandas pendientes, para insertarlas con SQL_INSERT_LSH."""
+        filas = self._filas
+        self._filas = []
+        self._pendientes = {}
+        return filas
+
+    def podar(self, dias=VENTANA_DIAS):
+        """Borra las bandas con más de `dias` días de antigüedad respecto de la más reciente.
+
+        El corte se toma de los datos y no del reloj, para no borrar las bandas de un backfill
+        de fechas pasadas apenas se calculan.
+        """
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM clusters_lsh WHERE fecha < (SELECT date(MAX(fecha), ?) FROM clusters_lsh)", (f"-{dias} days",)
+            )
+
+    def resumen(self):
+        return f"Clusters: {self.agrupadas} de {self.asignadas} noticias se sumaron a una historia existente"
+
+
+SQL_INSERT_LSH = "INSERT OR IGNORE INTO clusters_lsh (banda, firma, id_gnoticia, id_cluster, fecha) VALUES (?, ?, ?, ?, ?)"
+
+
+def agrupar_historico(db_path=None, dias=VENTANA_DIAS):
+    """Asigna `id_cluster` a las noticias existentes que no lo tienen (base y shards), en orden de fecha.
+
+    Mientras avanza solo compara contra las bandas de los `dias` anteriores a cada noticia;
+    al terminar deja en `clusters_lsh` las de los últimos `dias`, para el modo incremental.
+    """
+    from gnoticias.db_gnoticias import asegurar_esquema
+    from gnoticias.shards import conectar
+
+    asegurar_esquema(db_path)
+    with conectar(db_path) as conn:
+        agrupador = AgrupadorHistorias(conn)
+        esquemas = [fila[1] for fila in conn.execute("PRAGMA database_list") if fila[1] not in ("temp", "estado")]
+        filas = conn.execute(
+            "SELECT id_gnoticia, MIN(noticia), MIN(fecha) FROM gnoticias WHERE id_cluster IS NULL GROUP BY id_gnoticia ORDER BY MIN(fecha)"
+        )
+        actualizaciones = []
+        ultimo_dia = None
+
+        def guardar():
+            with conn:
+                conn.executemany(SQL_INSERT_LSH, agrupador.filas_pendientes())
+                for esquema in esquemas:
+                    conn.executemany(f"UPDATE {esquema}.gnoticias SET id_cluster = ? WHERE id_gnoticia = ?", actualizaciones)
+            actualizaciones.clear()
+
+        for id_gnoticia, noticia, fecha in filas.fetchall():
+            dia = _fecha_texto(fecha)
+            if dia != ultimo_dia and ultimo_dia is not None:
+                # Ventana deslizante relativa a la fecha de la noticia
+                limite = (datetime.strptime(dia, "%Y-%m-%d") - timedelta(days=dias)).strftime("%Y-%m-%d")
+                guardar()
+                with conn:
+                    conn.execute("DELETE FROM clusters_lsh WHERE fecha < ?", (limite,))
+            ultimo_dia = dia
+            actualizaciones.append((agrupador.asignar(id_gnoticia, noticia or "", fecha), id_gnoticia))
+            if len(actualizaciones) >= TAMANO_LOTE_HISTORICO:
+                guardar()
+        guardar()
+        agrupador.podar(dias)
+    print(f"✅ {agrupador.resumen()}.")
+    return agrupador.asignadas, agrupador.agrupadas
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Agrupa en historias las noticias existentes sin id_cluster.")
+    parser.add_argument("--dias", type=int, default=VENTANA_DIAS, help="Días hacia atrás contra los que se compara cada noticia.")
+    args = parser.parse_args()
+    agrupar_historico(dias=args.dias)
@@ -0,0 +1,137 @@
+"""Cola de trabajo con leases sobre `candidatos_estado` (extractor diario).
+
+Varios procesos (o runners que comparten la base) pueden repartirse los candidatos
+pendientes: cada uno reclama unos pocos con un solo `INSERT ... ON CONFLICT ... RETURNING`
+en una transacción inmediata, que les pone `lease_worker` y `lease_expira`. Mientras trabaja, un hilo renueva el lease de los que
+aún no marcó con ex=1; si el proceso muere, el lease vence y otro worker los reclama. La
+marca ex=1 (GnoticiasWriter.marcar_procesados) libera el lease en el mismo commit.
+
+    python -m gnoticias.ex_gnoticias --cola            # coordinador: resetea y trabaja
+    python -m gnoticias.ex_gnoticias --cola --reanudar # workers adicionales
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+import gnoticias.db_gnoticias as db_gnoticias
+
+# Segundos que dura un lease sin renovar
+DURACION_LEASE = 300
+# Cada cuántos segundos se renuevan los leases vigentes
+INTERVALO_HEARTBEAT = 60
+
+SQL_RECLAMAR = """
+    INSERT INTO candidatos_estado (id_candidato, lease_worker, lease_expira)
+    SELECT c.id_candidato, ?, ? FROM candidatos c LEFT JOIN candidatos_estado e ON e.id_candidato = c.id_candidato
+    WHERE e.ex IS NOT 1 AND c.id_tema IS NOT NULL AND (e.lease_expira IS NULL OR e.lease_expira < ?)
+    ORDER BY c.id_candidato LIMIT ?
+    ON CONFLICT (id_candidato) DO UPDATE SET lease_worker = excluded.lease_worker, lease_expira = excluded.lease_expira
+    RETURNING id_candidato
+"""
+
+
+def id_worker():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class ColaCandidatos:
+    """Reclama candidatos pendientes con lease y mantiene vivos los leases con un heartbeat."""
+    def __init__(self, db_path=None, worker=None, duracion=DURACION_LEASE, intervalo=INTERVALO_HEARTBEAT):
+        self.db_path = db_path or db_gnoticias.DB_PATH
+        self.worker = worker or id_worker()
+        self.duracion = duracion
+        self.intervalo = intervalo
+        self.reclamados = 0
+        self.recuperados = 0
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db_gnoticias.adjuntar_estado(conn, self.db_path)
+        return conn
+
+    def reclamar(self, cantidad):
+        """[(id, nombre, id_tema, keywords)] de hasta `cantidad` candidatos libres o con lease vencido."""
+        ahora = time.time()
+        conn = self._conectar()
+        try:
+            # IMMEDIATE toma el lock de escritura antes de leer qué candidatos están libres
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [fila[0] for fila in conn.execute(SQL_RECLAMAR, (self.worker, ahora + self.duracion, ahora, cantidad)).fetchall()]
+                filas = conn.execute(
+                    f"SELECT id_candidato, nombre, id_tema, keywords FROM candidatos WHERE id_candidato IN ({','.join('?' * len(ids))})", ids
+                ).fetchall() if ids else []
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        filas.sort()
+        self.reclamados += len(filas)
+        if filas:
+            print(f"🟢 Worker {self.worker} reclamó {len(filas)} candidatos ({filas[0][0]}–{filas[-1][0]}).")
+        return filas
+
+    def vencidos(self):
+        """Cantidad de candidatos pendientes con un lease vencido (p. ej. de un worker caído)."""
+        conn = self._conectar()
+        try:
+            return conn.execute(
+                "SELECT COUNT(*) FROM candidatos_estado e JOIN candidatos c ON c.id_candidato = e.id_candidato "
+                "WHERE e.ex IS NOT 1 AND c.id_tema IS NOT NULL AND e.lease_expira < ?", (time.time(),)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+    def renovar(self):
+        """Extiende el lease de los candidatos de este worker que siguen pendientes."""
+        conn = self._conectar()
+        try:
+            return conn.execute(
+                "UPDATE candidatos_estado SET lease_expira = ? WHERE lease_worker = ? AND ex IS NOT 1",
+                (time.time() + self.duracion, self.worker),
+            ).rowcount
+        finally:
+            conn.close()
+
+    def _heartbeat(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.renovar()
+            except Exception as e:
+                print(f"⚠️ No se pudo renovar el lease de {self.worker}: {e}")
+
+    def liberar(self):
+        """Suelta los leases pendientes de este worker para que otro los tome de inmediato."""
+        conn = self._conectar()
+        try:
+            return conn.execute(
+                "UPDATE candidatos_estado SET lease_worker = NULL, lease_expira = NULL WHERE lease_worker = ? AND ex IS NOT 1", (self.worker,)
+            ).rowcount
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self.recuperados = self.vencidos()
+        if self.recuperados:
+            print(f"ℹ️ {self.recuperados} candidatos con lease vencido se vuelven a reclamar.")
+        self._hilo = threading.Thread(target=self._heartbeat, name="gnoticias-heartbeat", daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._detener.set()
+        self._hilo.join()
+        liberados = self.liberar()
+        if liberados:
+            print(f"⚠️ {liberados} candidatos reclamados por {self.worker} quedaron sin procesar y se liberan.")
+        return False
+
+    def resumen(self):
+        return f"Cola: worker {self.worker} reclamó {self.reclamados} candidatos"
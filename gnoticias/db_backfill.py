@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from gnoticias.db_gnoticias import get_db_connection
+
+SQL_CREAR_PROGRESO = """
+    CREATE TABLE IF NOT EXISTS estado.backfill_progreso (
+        id_candidato INTEGER NOT NULL,
+        fecha TEXT NOT NULL,
+        id_log TEXT,
+        fecha_registro TEXT,
+        PRIMARY KEY (id_candidato, fecha)
+    ) WITHOUT ROWID
+"""
+
+
+def asegurar_tabla_progreso():
+    """Crea la tabla `backfill_progreso` si no existe."""
+    with get_db_connection() as conn:
+        conn.execute(SQL_CREAR_PROGRESO)
+        conn.commit()
+
+
+def registrar_dias(writer, candidato_id, desde, hasta, log_id=None):
+    """Encola en el writer el checkpoint de los días `desde`..`hasta` (incluidos).
+
+    Se escribe en la misma transacción que las noticias de esos días, así que un día
+    marcado como procesado nunca queda sin sus noticias.
+    """
+    ahora = datetime.now().isoformat()
+    dia = desde
+    while dia <= hasta:
+        writer.agregar_sentencia(
+            "INSERT OR REPLACE INTO backfill_progreso (id_candidato, fecha, id_log, fecha_registro) VALUES (?, ?, ?, ?)",
+            (candidato_id, dia.strftime("%Y-%m-%d"), log_id, ahora),
+        )
+        dia += timedelta(days=1)
+
+
+def dias_procesados(candidato_id, desde, hasta):
+    """Conjunto de fechas (YYYY-MM-DD) ya procesadas para el candidato en el rango."""
+    with get_db_connection() as conn:
+        cur = conn.execute(
+            "SELECT fecha FROM backfill_progreso WHERE id_candidato = ? AND fecha BETWEEN ? AND ?",
+            (candidato_id, desde.strftime("%Y-%m-%d"), hasta.strftime("%Y-%m-%d")),
+        )
+        return {row[0] for row in cur.fetchall()}
+
+
+def rangos_pendientes(candidato_id, desde, hasta, max_dias=None):
+    """Lista de rangos contiguos (desde, hasta) sin checkpoint, limitada a `max_dias` días en total."""
+    hechos = dias_procesados(candidato_id, desde, hasta)
+    rangos = []
+    total = 0
+    dia = desde
+    while dia <= hasta and (max_dias is None or total < max_dias):
+        if dia.strftime("%Y-%m-%d") not in hechos:
+            if rangos and rangos[-1][1] == dia - timedelta(days=1):
+                rangos[-1] = (rangos[-1][0], dia)
+            else:
+                rangos.append((dia, dia))
+            total += 1
+        dia += timedelta(days=1)
+    return rangos
+
+
+def tiene_progreso(candidato_id):
+    """True si el candidato ya tiene algún checkpoint en `backfill_progreso`."""
+    with get_db_connection() as conn:
+        return conn.execute("SELECT 1 FROM backfill_progreso WHERE id_candidato = ? LIMIT 1", (candidato_id,)).fetchone() is not None
+
+
+def sembrar_desde_log(candidato_id, desde, ultima_fecha):
+    """Carga como procesados los días `desde`..`ultima_fecha` registrados por el log antiguo."""
+    if ultima_fecha < desde:
+        return 0
+    with get_db_connection() as conn:
+        dias = []
+        dia = desde
+        while dia <= ultima_fecha:
+            dias.append((candidato_id, dia.strftime("%Y-%m-%d"), None, datetime.now().isoformat()))
+            dia += timedelta(days=1)
+        conn.executemany(
+            "INSERT OR IGNORE INTO backfill_progreso (id_candidato, fecha, id_log, fecha_registro) VALUES (?, ?, ?, ?)", dias
+        )
+        conn.commit()
+    print(f"ℹ️ Candidato {candidato_id}: {len(dias)} días importados desde log_ejecucion.")
+    return len(dias)
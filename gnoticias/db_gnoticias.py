@@ -1,11 +1,149 @@
+import os
+import re
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
+
+from gnoticias.busqueda import TRIGGERS_FTS, crear_fts, indexar
+from gnoticias.clusters import SQL_CREAR_CLUSTERS_LSH, SQL_INDICE_CLUSTERS_FECHA, SQL_INSERT_LSH, AgrupadorHistorias
+from gnoticias.dedupe import IndiceDedupe
+from gnoticias.metricas import metricas, podar as podar_metricas
+from gnoticias.rollups import crear_rollups, recalcular
 
 DB_PATH = "data/gnoticias.db"  # Ruta a la base de datos SQLite
 
+# La base de estado (`data/gnoticias_estado.db`) guarda lo que cambia en cada ejecución: marcas
+# y leases de candidatos, logs, métricas, cachés y checkpoints. Toda conexión la adjunta como
+# `estado`; sus tablas no existen en la base principal, así que las consultas sin esquema las
+# encuentran ahí. Con shards, la base principal solo cambia al compactar. No va a git: los
+# workflows la guardan como asset del release `estado` y `mantenimiento` le aplica la retención.
+SUFIJO_ESTADO = "_estado.db"
+
+# Filas acumuladas por el escritor antes de forzar un commit
+TAMANO_LOTE_DEFAULT = 200
+
+# Pragmas del escritor: WAL + synchronous=NORMAL evita un fsync por noticia
+PRAGMAS_ESCRITOR = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA busy_timeout = 30000",
+)
+
+SQL_INSERT_GNOTICIA = """
+    INSERT INTO gnoticias (
+        id_candidato, id_gnoticia, noticia, medio, fecha, source_href,
+        link, id_original, id_log, id_cluster
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# ano/mes/dia/... se derivan de `fecha` (hora de Colombia, "YYYY-MM-DD HH:MM:SS-05:00") como
+# columnas generadas VIRTUAL: no ocupan espacio en cada fila y no se insertan.
+COLUMNAS_FECHA_GENERADAS = {
+    "ano": "CAST(substr(fecha, 1, 4) AS INTEGER)",
+    "mes": "CAST(substr(fecha, 6, 2) AS INTEGER)",
+    "dia": "CAST(substr(fecha, 9, 2) AS INTEGER)",
+    "hora": "CAST(substr(fecha, 12, 2) AS INTEGER)",
+    "minuto": "CAST(substr(fecha, 15, 2) AS INTEGER)",
+    # strftime('%w') cuenta desde el domingo; Python weekday() desde el lunes
+    "dia_sem": "(CAST(strftime('%w', substr(fecha, 1, 19)) AS INTEGER) + 6) % 7",
+    "dia_ano": "CAST(strftime('%j', substr(fecha, 1, 19)) AS INTEGER)",
+}
+
+COLUMNAS_GNOTICIAS = (
+    ("id_candidato", "INTEGER NOT NULL"),
+    ("id_gnoticia", "TEXT NOT NULL"),
+    ("noticia", "TEXT"),
+    ("medio", "TEXT"),
+    ("fecha", "TEXT"),
+    ("source_href", "TEXT"),
+    ("link", "TEXT"),
+    ("id_original", "TEXT"),
+    ("id_log", "TEXT"),
+    ("id_cluster", "TEXT"),
+)
+
+
+# Alias estable del rowid (VACUUM no lo renumera); es el `content_rowid` de gnoticias_fts
+COLUMNA_ID_FILA = "id_fila"
+
+
+def sql_crear_gnoticias(nombre="gnoticias", extras=()):
+    """CREATE TABLE de `gnoticias` con las columnas de fecha generadas y `extras` [(columna, tipo)]."""
+    columnas = [f"{COLUMNA_ID_FILA} INTEGER PRIMARY KEY"]
+    columnas += [f"{columna} {tipo}" for columna, tipo in list(COLUMNAS_GNOTICIAS) + list(extras)]
+    columnas += [f"{columna} INTEGER GENERATED ALWAYS AS ({expresion}) VIRTUAL" for columna, expresion in COLUMNAS_FECHA_GENERADAS.items()]
+    columnas.append("UNIQUE (id_gnoticia, id_candidato)")
+    return f"CREATE TABLE IF NOT EXISTS {nombre} (\n    " + ",\n    ".join(columnas) + "\n)"
+
+
+SQL_CREAR_CANDIDATOS = """
+    CREATE TABLE IF NOT EXISTS candidatos (
+        id_candidato INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        id_tema INTEGER,
+        keywords TEXT,
+        ex INTEGER,
+        his INTEGER
+    )
+"""
+
+# Marcas de procesado y lease de la cola (ver gnoticias.cola) de cada candidato
+SQL_CREAR_CANDIDATOS_ESTADO = """
+    CREATE TABLE IF NOT EXISTS estado.candidatos_estado (
+        id_candidato INTEGER PRIMARY KEY,
+        ex INTEGER,
+        his INTEGER,
+        lease_worker TEXT,
+        lease_expira REAL
+    )
+"""
+
+SQL_CREAR_LOG_EJECUCION = """
+    CREATE TABLE IF NOT EXISTS estado.log_ejecucion (
+        id TEXT PRIMARY KEY,
+        proceso TEXT,
+        estado TEXT,
+        mensaje TEXT,
+        fecha_inicio TEXT,
+        fecha_fin TEXT
+    )
+"""
+
+SQL_CREAR_MANTENIMIENTO = """
+    CREATE TABLE IF NOT EXISTS mantenimiento_db (
+        tarea TEXT PRIMARY KEY,
+        fecha TEXT NOT NULL
+    )
+"""
+
+# Índices de las consultas frecuentes; el de duplicados (id_gnoticia, id_candidato) es la PK
+INDICES = {
+    "idx_gnoticias_candidato_fecha": "CREATE INDEX IF NOT EXISTS idx_gnoticias_candidato_fecha ON gnoticias (id_candidato, fecha)",
+    # Progreso del histórico en formato antiguo y reporte de métricas
+    "idx_log_proceso": "CREATE INDEX IF NOT EXISTS estado.idx_log_proceso ON log_ejecucion (proceso, estado, fecha_fin)",
+    # Noticias de una misma historia (ver gnoticias.clusters)
+    "idx_gnoticias_cluster": "CREATE INDEX IF NOT EXISTS idx_gnoticias_cluster ON gnoticias (id_cluster)",
+}
+
+# Días entre ejecuciones de cada tarea de mantenimiento
+DIAS_ANALYZE = 1
+DIAS_VACUUM = 7
+
+def ruta_estado(db_path=None):
+    """Ruta de la base de estado que acompaña a `db_path`."""
+    return os.path.splitext(db_path or DB_PATH)[0] + SUFIJO_ESTADO
+
+
+def adjuntar_estado(conn, db_path=None):
+    """Adjunta a `conn` la base de estado de `db_path` como `estado`."""
+    conn.execute("ATTACH DATABASE ? AS estado", (ruta_estado(db_path),))
+
 
 class DatabaseConnection:
-    """Gestor de contexto para la conexión a la base de datos."""
+    """Gestor de contexto para la conexión a la base de datos (con la base de estado adjunta)."""
     def __init__(self, db_path):
         self.db_path = db_path
         self.conn = None
@@ -13,6 +151,7 @@ class DatabaseConnection:
     def __enter__(self):
         try:
             self.conn = sqlite3.connect(self.db_path)
+            adjuntar_estado(self.conn, self.db_path)
             self.conn.row_factory = sqlite3.Row
             return self.conn
         except sqlite3.Error as e:
@@ -30,78 +169,542 @@ def get_db_connection():
     """Retorna un gestor de contexto DatabaseConnection."""
     return DatabaseConnection(DB_PATH)
 
-  
-def marcar_candidato_como_procesado(candidato_id, campo="ex"):
-    """Marca un candidato como procesado en la tabla `candidatos` usando el campo especificado ('ex' o 'his')."""
+
+# ================= MIGRACIONES =================
+# Worker que reclamó el candidato y vencimiento del lease (epoch), ver gnoticias.cola
+COLUMNAS_LEASE = (("lease_worker", "TEXT"), ("lease_expira", "REAL"))
+
+# Columnas de `candidatos` que la migración 8 copia a `estado.candidatos_estado`. `ex` y `his`
+# quedan en `candidatos` (la tabla se llena desde fuera de estos scripts) pero ya no se escriben
+COLUMNAS_ESTADO_CANDIDATOS = ("ex", "his") + tuple(columna for columna, _ in COLUMNAS_LEASE)
+
+# Días que se conservan los logs de ejecución (los del histórico no se borran: de ellos sale el
+# progreso de las versiones anteriores a `backfill_progreso`)
+DIAS_LOG_EJECUCION = 180
+# Días que se conserva una URL decodificada; una noticia rara vez reaparece en los feeds después
+DIAS_CACHE_URLS = 60
+# Días que se conservan los validadores de un feed que no se volvió a consultar
+DIAS_FEED_CACHE = 30
+
+
+def _podar_por_fecha(tabla, columna, dias, condicion="1"):
+    """Función de retención que borra las filas de `tabla` con `columna` de hace más de `dias`."""
+    def podar(conn):
+        limite = (datetime.now() - timedelta(days=dias)).isoformat()
+        return conn.execute(f"DELETE FROM {tabla} WHERE {columna} < ? AND {condicion}", (limite,)).rowcount
+    return podar
+
+
+# Retención de las tablas de estado que crecen con cada ejecución: (tabla, función(conn) ->
+# filas eliminadas), aplicada por `mantenimiento` sobre el archivo que las tenga. clusters_lsh
+# se poda al cerrar cada escritor; candidatos_estado, planificacion_candidatos y
+# backfill_progreso tienen a lo sumo una fila por candidato (y día, en el histórico)
+RETENCION_ESTADO = (
+    ("metricas_ejecucion", podar_metricas),
+    ("log_ejecucion", _podar_por_fecha("log_ejecucion", "fecha_inicio", DIAS_LOG_EJECUCION, "proceso <> 'ex_gnoticias_historico'")),
+    ("gnoticias_url_cache", _podar_por_fecha("gnoticias_url_cache", "fecha", DIAS_CACHE_URLS)),
+    ("feed_cache", _podar_por_fecha("feed_cache", "fecha", DIAS_FEED_CACHE)),
+)
+
+# Tablas que cambian en cada ejecución y que la migración 8 mueve a la base de estado
+TABLAS_ESTADO = ("log_ejecucion", "feed_cache", "gnoticias_url_cache", "metricas_ejecucion", "clusters_lsh",
+                 "planificacion_candidatos", "backfill_progreso")
+
+
+def _columnas(conn, tabla, esquema="main"):
+    """{columna: (tipo, oculta)} de `tabla`; oculta es 2 o 3 para columnas generadas."""
+    return {fila[1]: (fila[2], fila[6]) for fila in conn.execute(f"PRAGMA {esquema}.table_xinfo({tabla})")}
+
+
+def _crear_estado(conn):
+    """Crea las tablas propias de la base de estado (las de otros módulos las crea cada uno)."""
+    conn.execute(SQL_CREAR_CANDIDATOS_ESTADO)
+    conn.execute(SQL_CREAR_LOG_EJECUCION)
+    conn.execute(INDICES["idx_log_proceso"])
+
+
+def _migracion_tablas_base(conn):
+    conn.execute(sql_crear_gnoticias())
+    conn.execute(SQL_CREAR_CANDIDATOS)
+    conn.execute(SQL_CREAR_LOG_EJECUCION)
+    conn.execute(SQL_CREAR_MANTENIMIENTO)
+
+
+def reconstruir_gnoticias(conn, esquema="main"):
+    """Reconstruye `gnoticias` de `esquema` con `id_fila`, las columnas de fecha generadas y la
+    llave única (id_gnoticia, id_candidato); retorna True si tuvo que reconstruirla.
+
+    Las columnas que no conoce este módulo se conservan tal cual; las filas duplicadas se
+    descartan. Los índices y triggers de la tabla se pierden: el llamador los vuelve a crear.
+    """
+    columnas = _columnas(conn, "gnoticias", esquema)
+    if COLUMNA_ID_FILA in columnas and all(columnas.get(columna, (None, 0))[1] in (2, 3) for columna in COLUMNAS_FECHA_GENERADAS):
+        return False
+    base = [COLUMNA_ID_FILA] + [columna for columna, _ in COLUMNAS_GNOTICIAS]
+    extras = [(columna, tipo) for columna, (tipo, oculta) in columnas.items()
+              if columna not in base and columna not in COLUMNAS_FECHA_GENERADAS and oculta == 0]
+    copiadas = ", ".join([columna for columna in base if columna in columnas] + [columna for columna, _ in extras])
+    conn.execute(f"DROP TABLE IF EXISTS {esquema}.gnoticias_migracion")
+    conn.execute(sql_crear_gnoticias(f"{esquema}.gnoticias_migracion", extras))
+    total = conn.execute(f"SELECT COUNT(*) FROM {esquema}.gnoticias").fetchone()[0]
+    conn.execute(f"INSERT OR IGNORE INTO {esquema}.gnoticias_migracion ({copiadas}) SELECT {copiadas} FROM {esquema}.gnoticias ORDER BY rowid")
+    conservadas = conn.execute(f"SELECT COUNT(*) FROM {esquema}.gnoticias_migracion").fetchone()[0]
+    conn.execute(f"DROP TABLE {esquema}.gnoticias")
+    conn.execute(f"ALTER TABLE {esquema}.gnoticias_migracion RENAME TO gnoticias")
+    print(f"ℹ️ gnoticias ({esquema}) reconstruida: {conservadas} filas ({total - conservadas} duplicadas o inválidas descartadas).")
+    return True
+
+
+def _migracion_fechas_generadas(conn):
+    reconstruir_gnoticias(conn)
+
+
+def _migracion_indices(conn):
+    for nombre, sql in INDICES.items():
+        if nombre != "idx_gnoticias_cluster":
+            conn.execute(sql)
+
+
+def _migracion_clusters(conn):
+    if "id_cluster" not in _columnas(conn, "gnoticias"):
+        conn.execute("ALTER TABLE gnoticias ADD COLUMN id_cluster TEXT")
+    conn.execute(INDICES["idx_gnoticias_cluster"])
+    conn.execute(SQL_CREAR_CLUSTERS_LSH)
+    conn.execute(SQL_INDICE_CLUSTERS_FECHA)
+
+
+def _migracion_rollups(conn):
+    crear_rollups(conn)
+    recalcular(conn)
+
+
+def _migracion_busqueda(conn):
+    crear_fts(conn)
+    indexar(conn)
+
+
+def _migracion_leases(conn):
+    columnas = _columnas(conn, "candidatos")
+    for columna, tipo in COLUMNAS_LEASE:
+        if columna not in columnas:
+            conn.execute(f"ALTER TABLE candidatos ADD COLUMN {columna} {tipo}")
+
+
+def _migracion_fts_externo(conn):
+    """Agrega `id_fila` a `gnoticias` y pasa gnoticias_fts a contenido externo (sin copia de los titulares)."""
+    if reconstruir_gnoticias(conn):
+        for nombre, sql in INDICES.items():
+            if nombre != "idx_log_proceso":
+                conn.execute(sql)
+        crear_rollups(conn)
+    if crear_fts(conn):
+        indexar(conn)
+
+
+def _migracion_estado(conn):
+    """Pasa a la base de estado las marcas y leases de `candidatos` y las tablas de TABLAS_ESTADO.
+
+    Las columnas `ex`/`his` de `candidatos` se dejan como estaban; solo se quitan las del lease,
+    que agregó la migración 7. Cada tabla se recrea en `estado` con su DDL e índices originales,
+    se copian las filas y se borra de la base principal.
+    """
+    marcas = [columna for columna in COLUMNAS_ESTADO_CANDIDATOS if columna in _columnas(conn, "candidatos")]
+    if marcas:
+        lista = ", ".join(marcas)
+        conn.execute(f"INSERT OR REPLACE INTO estado.candidatos_estado (id_candidato, {lista}) "
+                     f"SELECT id_candidato, {lista} FROM main.candidatos WHERE {' OR '.join(f'{c} IS NOT NULL' for c in marcas)}")
+        conn.execute("DROP INDEX IF EXISTS main.idx_candidatos_pendientes")
+        for columna, _ in COLUMNAS_LEASE:
+            if columna in marcas:
+                conn.execute(f"ALTER TABLE main.candidatos DROP COLUMN {columna}")
+    for tabla in TABLAS_ESTADO:
+        fila = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone()
+        if fila is None:
+            continue
+        conn.execute(re.sub(rf'^CREATE TABLE "?{tabla}"?', f"CREATE TABLE IF NOT EXISTS estado.{tabla}", fila[0]))
+        destino = _columnas(conn, tabla, "estado")
+        comunes = ", ".join(columna for columna in _columnas(conn, tabla) if columna in destino)
+        copiadas = conn.execute(f"INSERT OR IGNORE INTO estado.{tabla} ({comunes}) SELECT {comunes} FROM main.{tabla}").rowcount
+        indices = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (tabla,)).fetchall()
+        for (sql,) in indices:
+            conn.execute(re.sub(r'^CREATE (UNIQUE )?INDEX "?(\w+)"?', r"CREATE \1INDEX IF NOT EXISTS estado.\2", sql))
+        conn.execute(f"DROP TABLE main.{tabla}")
+        print(f"ℹ️ {tabla}: {copiadas} filas movidas a la base de estado.")
+
+
+# (versión, descripción, función); la versión aplicada se guarda en PRAGMA user_version
+MIGRACIONES = (
+    (1, "tablas base", _migracion_tablas_base),
+    (2, "columnas de fecha generadas en gnoticias", _migracion_fechas_generadas),
+    (3, "índices de consultas frecuentes", _migracion_indices),
+    (4, "id_cluster de historias en gnoticias", _migracion_clusters),
+    (5, "rollups por candidato/día y candidato/medio", _migracion_rollups),
+    (6, "índice de texto completo gnoticias_fts", _migracion_busqueda),
+    (7, "leases de la cola de candidatos", _migracion_leases),
+    (8, "estado por ejecución en la base de estado", _migracion_estado),
+    (9, "gnoticias_fts con contenido externo sobre id_fila", _migracion_fts_externo),
+)
+
+# Columnas que los scripts leen o escriben, por tabla
+COLUMNAS_REQUERIDAS = {
+    "gnoticias": [COLUMNA_ID_FILA] + [columna for columna, _ in COLUMNAS_GNOTICIAS] + list(COLUMNAS_FECHA_GENERADAS),
+    "candidatos": ["id_candidato", "nombre", "id_tema", "keywords"],
+    "candidatos_estado": ["id_candidato"] + list(COLUMNAS_ESTADO_CANDIDATOS),
+    "log_ejecucion": ["id", "proceso", "estado", "mensaje", "fecha_inicio", "fecha_fin"],
+}
+
+_esquemas_listos = set()
+_lock_esquema = threading.Lock()
+
+
+def migrar(db_path=None):
+    """Aplica las migraciones pendientes, cada una en su propia transacción, y retorna la versión final.
+
+    Las tablas propias de la base de estado se crean siempre (el archivo puede no existir aún).
+    """
+    conn = sqlite3.connect(db_path or DB_PATH, timeout=30, isolation_level=None)
     try:
-        with get_db_connection() as conn:
-            cur = conn.cursor()
-            if campo not in ("ex", "his"):
-                raise ValueError(f"Campo inválido para marcar como procesado: {campo}")
-            cur.execute(f"UPDATE candidatos SET {campo} = 1 WHERE id_candidato = ?", (candidato_id,))
-            conn.commit()
-        print(f"🟢 Candidato {candidato_id} marcado como procesado ({campo}=1).")
-    except Exception as e:
-        print(f"❌ Error al marcar candidato {candidato_id} como procesado: {e}")
+        adjuntar_estado(conn, db_path)
+        _crear_estado(conn)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for numero, descripcion, funcion in MIGRACIONES:
+            if numero <= version:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Otro proceso pudo haberla aplicado mientras se esperaba el lock
+                if conn.execute("PRAGMA user_version").fetchone()[0] < numero:
+                    funcion(conn)
+                    conn.execute(f"PRAGMA user_version = {numero}")
+                    print(f"ℹ️ Migración {numero} aplicada: {descripcion}")
+                conn.execute("COMMIT")
+            except Exception as e:
+                conn.execute("ROLLBACK")
+                print(f"❌ Error en la migración {numero} ({descripcion}): {e}")
+                raise
+            version = numero
+    finally:
+        conn.close()
+    # Los shards de gnoticias.shards llevan su propia tabla `gnoticias`
+    from gnoticias.shards import migrar_shards
+    migrar_shards(db_path)
+    return version
+
+
+def verificar_esquema(db_path=None):
+    """Recrea los índices que falten y retorna la lista de problemas del esquema (vacía si está bien)."""
+    problemas = []
+    conn = sqlite3.connect(db_path or DB_PATH, timeout=30)
+    try:
+        adjuntar_estado(conn, db_path)
+        for tabla, requeridas in COLUMNAS_REQUERIDAS.items():
+            columnas = _columnas(conn, tabla, "estado" if tabla in ("candidatos_estado", "log_ejecucion") else "main")
+            if not columnas:
+                problemas.append(f"falta la tabla {tabla}")
+                continue
+            faltantes = [columna for columna in requeridas if columna not in columnas]
+            if faltantes:
+                problemas.append(f"faltan columnas en {tabla}: {', '.join(faltantes)}")
+        if problemas:
+            return problemas
+        existentes = {fila[0] for fila in conn.execute(
+            "SELECT name FROM main.sqlite_master WHERE type = 'index' UNION SELECT name FROM estado.sqlite_master WHERE type = 'index'"
+        )}
+        for nombre, sql in INDICES.items():
+            if nombre not in existentes:
+                print(f"⚠️ Índice {nombre} no encontrado, se vuelve a crear.")
+                conn.execute(sql)
+        triggers = {fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        if not {"trg_gnoticias_rollup_insert", "trg_gnoticias_rollup_delete", "trg_gnoticias_rollup_update"} <= triggers:
+            print("⚠️ Triggers de rollups no encontrados, se vuelven a crear y se recalculan los rollups.")
+            crear_rollups(conn)
+            recalcular(conn)
+        if not set(TRIGGERS_FTS) <= triggers:
+            print("⚠️ Triggers del índice de búsqueda no encontrados, se vuelven a crear y se regenera el índice.")
+            crear_fts(conn)
+            indexar(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return problemas
+
+
+def asegurar_esquema(db_path=None):
+    """Migra y verifica la base una sola vez por proceso (y por ruta)."""
+    ruta = db_path or DB_PATH
+    with _lock_esquema:
+        if ruta in _esquemas_listos:
+            return
+        migrar(ruta)
+        for problema in verificar_esquema(ruta):
+            print(f"❌ Esquema de {ruta}: {problema}")
+        _esquemas_listos.add(ruta)
+
+
+def podar_estado(conn):
+    """Aplica la retención de RETENCION_ESTADO a las tablas que existan en `conn`."""
+    tablas = {fila[0] for fila in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")}
+    for tabla, podar in RETENCION_ESTADO:
+        if tabla not in tablas:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            borradas = podar(conn)
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            print(f"❌ Error al podar {tabla}: {e}")
+            continue
+        if borradas:
+            print(f"ℹ️ {tabla}: {borradas} filas eliminadas por retención.")
+
+
+def mantenimiento(db_path=None, forzar=False):
+    """Aplica la retención de las tablas de estado, ANALYZE cada DIAS_ANALYZE días y VACUUM cada
+    DIAS_VACUUM días (o ambos con `forzar`).
+
+    Trabaja sobre un solo archivo (la base principal o `ruta_estado()`); la fecha de la última
+    ejecución de cada tarea queda en su `mantenimiento_db`. Al final integra el WAL al archivo,
+    que es el que guardan los workflows. Con shards, la base principal solo se mantiene al
+    compactar.
+    """
+    conn = sqlite3.connect(db_path or DB_PATH, timeout=30, isolation_level=None)
+    try:
+        podar_estado(conn)
+        conn.execute(SQL_CREAR_MANTENIMIENTO)
+        ultimas = {tarea: datetime.fromisoformat(fecha) for tarea, fecha in conn.execute("SELECT tarea, fecha FROM mantenimiento_db")}
+        for tarea, dias in (("ANALYZE", DIAS_ANALYZE), ("VACUUM", DIAS_VACUUM)):
+            ultima = ultimas.get(tarea)
+            if not forzar and ultima is not None and datetime.now() - ultima < timedelta(days=dias):
+                continue
+            try:
+                inicio = time.perf_counter()
+                conn.execute(tarea)
+                conn.execute("INSERT OR REPLACE INTO mantenimiento_db (tarea, fecha) VALUES (?, ?)", (tarea, datetime.now().isoformat()))
+                print(f"ℹ️ {tarea} completado en {time.perf_counter() - inicio:.2f}s.")
+            except Exception as e:
+                print(f"❌ Error al ejecutar {tarea}: {e}")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+  
+def sql_marcar(campo):
+    """UPSERT que marca un candidato con `campo` = 1; la marca ex=1 además libera el lease de la cola."""
+    if campo not in ("ex", "his"):
+        raise ValueError(f"Campo inválido para marcar como procesado: {campo}")
+    liberar = ", lease_worker = NULL, lease_expira = NULL" if campo == "ex" else ""
+    return (f"INSERT INTO candidatos_estado (id_candidato, {campo}) VALUES (?, 1) "
+            f"ON CONFLICT (id_candidato) DO UPDATE SET {campo} = 1{liberar}")
 
 
 def reset_candidatos_news():
-    """Resetea el campo 'ex' a NULL para todos los registros de candidatos."""
+    """Resetea el campo 'ex' a NULL (y los leases de la cola) para todos los candidatos."""
     try:
         with get_db_connection() as conn:
             cur = conn.cursor()
-            cur.execute("UPDATE candidatos SET ex = NULL")
+            cur.execute("UPDATE candidatos_estado SET ex = NULL, lease_worker = NULL, lease_expira = NULL")
             conn.commit()
         print("ℹ️ Campo 'ex' de 'candidatos' reseteado a NULL (función).")
     except Exception as e:
         print(f"❌ Error al resetear 'news' en candidatos: {e}")
 
-def save_news_to_gnoticias(news_data):
-    """Inserta una nueva noticia en la tabla `gnoticias`."""
-    try:
-        with get_db_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                INSERT INTO gnoticias (
-                    id_candidato, id_gnoticia, noticia, medio, fecha, source_href,
-                    link, ano, mes, dia, hora, minuto, dia_sem, dia_ano, id_original,
-                    id_log
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                news_data["candidato_id"],
-                news_data["id"],
-                news_data["noticia"],
-                news_data["medio"],
-                news_data["fecha"],
-                news_data["source_href"],
-                news_data["link"],
-                news_data["ano"],
-                news_data["mes"],
-                news_data["dia"],
-                news_data["hora"],
-                news_data["minuto"],
-                news_data["dia_sem"],
-                news_data["dia_ano"],
-                news_data["id_largo"],
-                news_data.get("id_log")
-            ))
-            conn.commit()
-            print(f"✅ (gnoticias) Guardada: {news_data['noticia']}")
-    except sqlite3.IntegrityError:
-        # This is expected if the news already exists, so we can ignore it or log it quietly.
-        pass
-    except Exception as err:
-        print(f"❌ Error al guardar noticia en gnoticias '{news_data['noticia']}': {err}")
+def _fila_gnoticia(news_data):
+    """Convierte el dict de una noticia en la tupla de parámetros de SQL_INSERT_GNOTICIA."""
+    return (
+        news_data["candidato_id"],
+        news_data["id"],
+        news_data["noticia"],
+        news_data["medio"],
+        news_data["fecha"],
+        news_data["source_href"],
+        news_data["link"],
+        news_data["id_largo"],
+        news_data.get("id_log"),
+        news_data.get("id_cluster"),
+    )
 
 
-def news_exists_in_gnoticias(news_id, candidato_id):
-    """Verifica si una noticia ya existe en la tabla `gnoticias`."""
-    try:
-        with get_db_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT 1 FROM gnoticias WHERE id_gnoticia = ? AND id_candidato = ?", (news_id, candidato_id))
-            exists = cur.fetchone() is not None
-        return exists
-    except Exception as e:
-        print(f"❌ Error al verificar existencia de noticia en gnoticias {news_id}: {e}")
-        return False
\ No newline at end of file
+class GnoticiasWriter:
+    """Escritor de `gnoticias` con una sola conexión por ejecución.
+
+    Acumula las noticias en memoria y las inserta con `executemany` + `INSERT OR IGNORE`
+    en una sola transacción, junto con las marcas de candidato procesado. Es seguro
+    compartirlo entre hilos. Se usa como gestor de contexto:
+
+        with GnoticiasWriter() as writer:
+            writer.agregar(noticia)
+            writer.marcar_procesado(candidato_id)   # commit de las filas + la marca
+
+    Con `shards=True` las noticias se escriben en el shard mensual (ver `gnoticias.shards`).
+    Con `podar=False` (histórico, reprocesamiento) las bandas de clusters no se podan al cerrar.
+    Con la base en WAL el commit no es atómico entre archivos: ante una caída justo en el
+    commit, una marca puede quedar sin sus noticias hasta la siguiente ejecución.
+    """
+    def __init__(self, db_path=None, tamano_lote=TAMANO_LOTE_DEFAULT, shards=False, agrupar=True, podar=True):
+        self.db_path = db_path or DB_PATH
+        self.podar = podar
+        self.tamano_lote = tamano_lote
+        self.insertadas = 0
+        self.commits = 0
+        self._filas = []
+        self._pendientes = set()
+        self._marcas = []
+        self._sentencias = []
+        self._lock = threading.RLock()
+        self.indice = None
+        asegurar_esquema(self.db_path)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        # Marcas, bandas LSH y sentencias encoladas van a la base de estado
+        adjuntar_estado(self.conn, self.db_path)
+        for pragma in PRAGMAS_ESCRITOR:
+            self.conn.execute(pragma)
+        # Con `shards` las noticias van al shard del mes y `gnoticias` pasa a ser la vista base + shards
+        self.shard = None
+        self._sql_insert = SQL_INSERT_GNOTICIA.replace("INSERT", "INSERT OR IGNORE", 1)
+        if shards:
+            from gnoticias.shards import adjuntar_shards
+            self.shard = adjuntar_shards(self.conn, self.db_path, escritura=True)
+            self._sql_insert = self._sql_insert.replace("INTO gnoticias", "INTO delta.gnoticias", 1)
+        # Cada noticia nueva recibe el id_cluster de su historia al agregarse
+        self.agrupador = AgrupadorHistorias(self.conn) if agrupar else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cerrar()
+
+    def agregar(self, news_data):
+        """Agrega una noticia al lote; hace commit si el lote llega a `tamano_lote`."""
+        with self._lock:
+            if self.agrupador is not None:
+                with metricas.etapa("clusters"):
+                    id_cluster = self.agrupador.asignar(news_data["id"], news_data["noticia"], news_data["fecha"])
+                news_data = dict(news_data, id_cluster=id_cluster)
+            self._filas.append(_fila_gnoticia(news_data))
+            self._pendientes.add((news_data["id"], news_data["candidato_id"]))
+            if len(self._filas) >= self.tamano_lote:
+                self.flush()
+
+    def cargar_indice(self, candidato_ids, modo="auto"):
+        """Precarga el índice de duplicados en memoria para los candidatos de la ejecución."""
+        with self._lock:
+            self.flush()
+            self.indice = IndiceDedupe.cargar(self.conn, candidato_ids, modo=modo)
+        return self.indice
+
+    def existe(self, news_id, candidato_id):
+        with metricas.etapa("dedupe"):
+            return self._existe(news_id, candidato_id)
+
+    def _existe(self, news_id, candidato_id):
+        """Verifica si la noticia ya está en `gnoticias` o en el lote pendiente.
+
+        Con índice cargado la consulta es en memoria; solo se va a la base cuando el
+        índice no puede responder con certeza (positivo de Bloom o candidato fuera del índice).
+        """
+        with self._lock:
+            if (news_id, candidato_id) in self._pendientes:
+                return True
+            if self.indice is not None:
+                presente = self.indice.contiene(news_id, candidato_id)
+                if presente is not None:
+                    return presente
+            try:
+                cur = self.conn.execute(
+                    "SELECT 1 FROM gnoticias WHERE id_gnoticia = ? AND id_candidato = ?", (news_id, candidato_id)
+                )
+                return cur.fetchone() is not None
+            except Exception as e:
+                print(f"❌ Error al verificar existencia de noticia en gnoticias {news_id}: {e}")
+                return False
+
+    def marcar_procesado(self, candidato_id, campo="ex"):
+        """Marca el candidato como procesado en la misma transacción que sus noticias."""
+        self.marcar_procesados([candidato_id], campo)
+
+    def marcar_procesados(self, candidato_ids, campo="ex"):
+        """Marca varios candidatos (p. ej. los de una consulta en lote) en una sola transacción."""
+        sql_marcar(campo)
+        with self._lock:
+            self._marcas.extend((campo, candidato_id) for candidato_id in candidato_ids)
+            self.flush()
+
+    def agregar_sentencia(self, sql, params=()):
+        """Encola una sentencia que se ejecuta en la próxima transacción, después de las noticias."""
+        with self._lock:
+            self._sentencias.append((sql, params))
+
+    def flush(self):
+        """Escribe el lote pendiente (noticias + marcas + sentencias) en una sola transacción."""
+        with self._lock:
+            if not self._filas and not self._marcas and not self._sentencias:
+                return 0
+            filas, marcas, sentencias = self._filas, self._marcas, self._sentencias
+            bandas = self.agrupador.filas_pendientes() if self.agrupador is not None else []
+            try:
+                with metricas.etapa("commit"), self.conn:
+                    # rowcount no incluye las filas que escriben los triggers de rollups
+                    nuevas = self.conn.executemany(self._sql_insert, filas).rowcount if filas else 0
+                    self.conn.executemany(SQL_INSERT_LSH, bandas)
+                    for campo, candidato_id in marcas:
+                        self.conn.execute(sql_marcar(campo), (candidato_id,))
+                    for sql, params in sentencias:
+                        self.conn.execute(sql, params)
+            except Exception as e:
+                print(f"❌ Error al guardar lote de {len(filas)} noticias en gnoticias: {e}")
+                raise
+            finally:
+                self._filas, self._pendientes, self._marcas, self._sentencias = [], set(), [], []
+            if self.indice is not None:
+                for fila in filas:
+                    self.indice.agregar(fila[1], fila[0])
+            self.insertadas += nuevas
+            metricas.contar("guardadas", nuevas)
+            self.commits += 1
+            if filas:
+                print(f"✅ (gnoticias) Lote guardado: {nuevas} nuevas de {len(filas)}.")
+            for campo, candidato_id in marcas:
+                print(f"🟢 Candidato {candidato_id} marcado como procesado ({campo}=1).")
+            return nuevas
+
+    def cerrar(self):
+        """Escribe lo pendiente, integra el WAL al archivo principal y cierra la conexión."""
+        with self._lock:
+            if self.conn is None:
+                return
+            try:
+                self.flush()
+                if self.agrupador is not None and self.podar:
+                    self.agrupador.podar()
+                # Solo la base y la de estado están en WAL; el checkpoint de todas las bases
+                # falla con "database table is locked" si el shard del mes se acaba de crear
+                for esquema in ("main", "estado"):
+                    self.conn.execute(f"PRAGMA {esquema}.wal_checkpoint(TRUNCATE)")
+            finally:
+                self.conn.close()
+                self.conn = None
+            destino = f" (shard {self.shard})" if self.shard else ""
+            print(f"ℹ️ Escritor gnoticias: {self.insertadas} noticias en {self.commits} commits{destino}.")
+            if self.indice is not None:
+                print(f"ℹ️ {self.indice.resumen()}")
+            if self.agrupador is not None:
+                print(f"ℹ️ {self.agrupador.resumen()}.")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Migraciones y mantenimiento de gnoticias.db.")
+    parser.add_argument("--mantenimiento", action="store_true", help="Ejecutar ANALYZE/VACUUM si corresponde.")
+    parser.add_argument("--forzar", action="store_true", help="Con --mantenimiento, ejecutar ambas tareas ya.")
+    args = parser.parse_args()
+    version = migrar()
+    problemas = verificar_esquema()
+    for problema in problemas:
+        print(f"❌ {problema}")
+    if not problemas:
+        print(f"✅ Esquema en la versión {version}.")
+    if args.mantenimiento:
+        mantenimiento(forzar=args.forzar)
+        mantenimiento(ruta_estado(), forzar=args.forzar)
@@ -0,0 +1,113 @@
+import hashlib
+import math
+import struct
+import sys
+import threading
+
+# Por encima de este tamaño estimado el índice exacto se reemplaza por un filtro de Bloom
+MEMORIA_MAX_SET_BYTES = 64 * 1024 * 1024
+# Bytes aproximados por clave en el set exacto (objeto bytes de 20 + slot del set)
+BYTES_POR_CLAVE_SET = 80
+# Tasa de falsos positivos objetivo del filtro de Bloom
+TASA_FALSOS_BLOOM = 0.001
+# Tamaño de los bloques del IN (...) al cargar el índice
+TAMANO_BLOQUE_IN = 500
+
+
+def _clave(id_gnoticia, id_candidato):
+    """Clave compacta (20 bytes) para el par (id_gnoticia, id_candidato)."""
+    try:
+        base = bytes.fromhex(id_gnoticia)
+    except (TypeError, ValueError):
+        base = hashlib.md5(str(id_gnoticia).encode("utf-8")).digest()
+    return base + struct.pack(">i", int(id_candidato))
+
+
+class FiltroBloom:
+    """Filtro de Bloom sobre un bytearray con doble hashing (blake2b)."""
+    def __init__(self, capacidad, tasa_falsos=TASA_FALSOS_BLOOM):
+        capacidad = max(int(capacidad), 1000)
+        self.num_bits = int(-capacidad * math.log(tasa_falsos) / (math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacidad * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _posiciones(self, clave):
+        digest = hashlib.blake2b(clave, digest_size=16).digest()
+        h1, h2 = struct.unpack(">QQ", digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def agregar(self, clave):
+        for pos in self._posiciones(clave):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, clave):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._posiciones(clave))
+
+    def memoria_bytes(self):
+        return sys.getsizeof(self.bits)
+
+
+class IndiceDedupe:
+    """Índice en memoria de las noticias ya guardadas para un conjunto de candidatos.
+
+    `contiene()` retorna True/False cuando la respuesta es segura y None cuando hace falta
+    confirmar contra la base (positivo del filtro de Bloom o candidato fuera del alcance).
+    """
+    def __init__(self, candidato_ids, capacidad, modo="auto"):
+        self.candidatos = {int(c) for c in candidato_ids}
+        if modo == "auto":
+            modo = "set" if capacidad * BYTES_POR_CLAVE_SET <= MEMORIA_MAX_SET_BYTES else "bloom"
+        if modo not in ("set", "bloom"):
+            raise ValueError(f"Modo de índice de duplicados inválido: {modo}")
+        self.modo = modo
+        self.claves = set() if modo == "set" else FiltroBloom(capacidad * 2)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def cargar(cls, conn, candidato_ids, modo="auto"):
+        """Construye el índice leyendo una sola vez `gnoticias` para los candidatos dados."""
+        candidato_ids = sorted({int(c) for c in candidato_ids})
+        bloques = [candidato_ids[i:i + TAMANO_BLOQUE_IN] for i in range(0, len(candidato_ids), TAMANO_BLOQUE_IN)]
+        capacidad = 0
+        for bloque in bloques:
+            marcas = ",".join("?" * len(bloque))
+            capacidad += conn.execute(f"SELECT COUNT(*) FROM gnoticias WHERE id_candidato IN ({marcas})", bloque).fetchone()[0]
+        indice = cls(candidato_ids, capacidad, modo=modo)
+        for bloque in bloques:
+            marcas = ",".join("?" * len(bloque))
+            cur = conn.execute(f"SELECT id_gnoticia, id_candidato FROM gnoticias WHERE id_candidato IN ({marcas})", bloque)
+            for id_gnoticia, id_candidato in cur:
+                indice.agregar(id_gnoticia, id_candidato)
+        print(f"ℹ️ {indice.resumen()}")
+        return indice
+
+    def agregar(self, id_gnoticia, id_candidato):
+        clave = _clave(id_gnoticia, id_candidato)
+        with self._lock:
+            if self.modo == "set":
+                if clave in self.claves:
+                    return
+                self.claves.add(clave)
+            else:
+                self.claves.agregar(clave)
+            self.total += 1
+
+    def contiene(self, id_gnoticia, id_candidato):
+        if int(id_candidato) not in self.candidatos:
+            return None
+        presente = _clave(id_gnoticia, id_candidato) in self.claves
+        if self.modo == "set" or not presente:
+            return presente
+        return None
+
+    def memoria_bytes(self):
+        if self.modo == "bloom":
+            return self.claves.memoria_bytes()
+        # Todas las claves miden lo mismo, basta con una de muestra
+        return sys.getsizeof(self.claves) + self.total * sys.getsizeof(bytes(20))
+
+    def resumen(self):
+        return (f"Índice de duplicados ({self.modo}): {self.total} claves, {len(self.candidatos)} candidatos, "
+                f"{self.memoria_bytes() / 1024 / 1024:.1f} MB")
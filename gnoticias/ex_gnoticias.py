@@ -1,186 +1,264 @@
-import re
-import unicodedata
-from difflib import SequenceMatcher
-import sqlite3
-import feedparser
-import hashlib
-import time
-import urllib.parse
-from datetime import datetime, timedelta, timezone
-from googlenewsdecoder import gnewsdecoder
-import requests
+from datetime import datetime, timedelta
 
 # Funciones de DB
 from gnoticias.db_gnoticias import (
+    GnoticiasWriter,
+    asegurar_esquema,
     get_db_connection,
-    news_exists_in_gnoticias,
-    save_news_to_gnoticias,
-    marcar_candidato_como_procesado,
+    mantenimiento,
     reset_candidatos_news,
+    ruta_estado,
 )
-from gnoticias.db_log_ejecucion import log_start, log_end, log_error_update, log_error_new
+from gnoticias.archivo import asegurar_tabla_archivo
+from gnoticias.cache_urls import cache_urls
+from gnoticias.cola import ColaCandidatos
+from gnoticias.http_feeds import asegurar_tabla_feeds, estadisticas as estadisticas_http, registrar_feed, url_busqueda
+from gnoticias.keywords import MatcherKeywords
+from gnoticias.metricas import metricas
+from gnoticias.planificador import VENTANA_DEFAULT, Planificador, horas_ventana
+from gnoticias.ritmo import ritmo_decoder, ritmo_feeds
+from gnoticias.pipeline import LIMITE_ITEMS_FEED, UMBRAL_BISECCION, Pipeline, Trabajo
+from gnoticias.db_log_ejecucion import log_start, log_end, log_error_update
 
 # ================= CONSTANTES =================
 STOPWORDS_APELLIDO = {"de", "del", "la", "las", "los", "y", "san", "santa"}
 
-# Zona horaria de Colombia
-COL_TZ = timezone(timedelta(hours=-5))
+# Candidatos cuyo feed se descarga en paralelo por defecto (1 = secuencial)
+CONCURRENCIA_DEFAULT = 1
+
+# Candidatos combinados en una misma consulta "A" OR "B" OR ... (1 = una consulta por candidato)
+CANDIDATOS_POR_LOTE_DEFAULT = 1
+# Largo máximo (caracteres, sin codificar) de la consulta de un lote
+MAX_LARGO_QUERY = 400
+
+# Escribir las noticias nuevas en el shard mensual en vez de la base principal
+SHARDS_DEFAULT = False
+
+# Consultar solo los candidatos que tocan según su actividad, con la ventana `when:` justa
+PLANIFICAR_DEFAULT = False
+
+# Repartir los candidatos entre varios procesos reclamándolos con lease (ver gnoticias.cola)
+COLA_DEFAULT = False
+
+# Guardar cada feed descargado en el archivo comprimido (ver gnoticias.archivo)
+ARCHIVAR_DEFAULT = False
 
 # ================= FUNCIONES =================
-def similarity(a, b):
-    """Similitud usando SequenceMatcher (0-100)."""
-    return SequenceMatcher(None, a, b).ratio() * 100
-
-def normalize_text(text):
-    """Normaliza el texto: minúsculas, sin tildes, puntuación como espacios."""
-    if not text:
-        return ""
-    text = unicodedata.normalize('NFD', text.lower()).encode('ascii', 'ignore').decode('utf-8')
-    text = re.sub(r'[^a-z0-9ñ\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-def normalize_to_colombia_time(fecha_dt):
-    # Si fecha_dt NO tiene tzinfo, asumimos que viene en UTC (caso Google News)
-    if fecha_dt.tzinfo is None:
-        fecha_dt = fecha_dt.replace(tzinfo=timezone.utc)
-    # Convertimos a UTC-5
-    return fecha_dt.astimezone(COL_TZ)
-
-def process_feed_entry(entry, candidato_id):
-    titulo = entry.get("title", "")
-    published_parsed = entry.get("published_parsed")
-    if not published_parsed:
-        print(f"⚠️ Entrada sin fecha publicada, omitiendo: {titulo}")
-        return None
-    try:
-        fecha_dt = datetime(*published_parsed[:6])
-        published_year, published_month, published_day = fecha_dt.year, fecha_dt.month, fecha_dt.day
-        published_hour, published_minute = fecha_dt.hour, fecha_dt.minute
-        published_wday, published_yday = fecha_dt.weekday(), fecha_dt.timetuple().tm_yday
-    except Exception as e:
-        print(f"⚠️ Error al parsear fecha de entrada '{titulo}': {e}, omitiendo.")
-        return None
-    if " - " in titulo:
-        parts = titulo.rsplit(" - ", 1)
-        noticia = parts[0].strip()
-        medio = parts[1].strip()
-    else:
-        noticia = titulo.strip()
-        medio = "Desconocido"
-
-    # Normalizar timezone
-    fecha_local = normalize_to_colombia_time(fecha_dt)
-
-    google_news_url = entry.get("link", "")
-    link = gnewsdecoder(google_news_url).get("decoded_url", google_news_url) if google_news_url else ""
-    if not link:
-        return None
-
-    entry_id = entry.get("id", google_news_url)
-    id_corto = hashlib.md5(entry_id.encode("utf-8")).hexdigest()
-    return {
-        "candidato_id": candidato_id, "id": id_corto, "noticia": noticia, "medio": medio,
-        "fecha": fecha_local,   # <-- fecha final en Colombia
-        "source_href": entry.source.get("href", "") if hasattr(entry, "source") else "",
-        "ano": fecha_local.year,
-        "mes": fecha_local.month,
-        "dia": fecha_local.day,
-        "hora": fecha_local.hour,
-        "minuto": fecha_local.minute,
-        "dia_sem": fecha_local.weekday(),
-        "dia_ano": fecha_local.timetuple().tm_yday,
-        "link": link, "id_largo": entry_id,
-    }
-
-
-
-def fetch_news_for_candidate(candidato_id, candidato_nombre, start_date, end_date, id_tema=None, keywords=None, log_id=None):
-    """Obtiene noticias, las analiza y las guarda directamente en la tabla gnoticias."""
-    safe_name = " ".join(str(candidato_nombre).split())
-    query = f'"{safe_name}" when:1d'
-    url = "https://news.google.com/rss/search?" + urllib.parse.urlencode({"q": query, "hl": "es-419", "gl": "CO", "ceid": "CO:es-419"})
-    print(f"\n📅 hoy | URL: {url}")
-    try:
-        feed = feedparser.parse(url)
-        if feed.bozo:
-            print(f"⚠️ Error al parsear el feed: {feed.bozo_exception}")
-
-        for entry in feed.entries:
-            prelim = process_feed_entry(entry, candidato_id)
-            if not prelim:
-                continue
-
-            if not keywords:
-                print(f"⏩ Omitida por falta de keywords para el candidato: {candidato_nombre}")
-                continue
-
-            keyword_list = [k.strip() for k in keywords.split(',')]
-            normalized_noticia = normalize_text(prelim["noticia"])
-            
-            es_relevante = False
-            for keyword in keyword_list:
-                normalized_keyword = normalize_text(keyword)
-                if normalized_keyword in normalized_noticia:
-                    es_relevante = True
-                    break # Found a keyword, no need to check others
-            
-            if not es_relevante:
-                print(f"⏩ Omitida por no contener keywords: {prelim['noticia']}")
-                continue
-
-            if news_exists_in_gnoticias(prelim["id"], candidato_id):
-                print(f"⚠️ Duplicada en gnoticias (omitida): {prelim['noticia']}")
-                continue
-
-            prelim['id_log'] = log_id # Asignar el id de log a la noticia
-            print(f"-> Relevante. Guardando noticia: {prelim['noticia']}")
-            save_news_to_gnoticias(prelim)
-            time.sleep(1)
-
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error de red al obtener noticias: {e}")
-    except Exception as e:
-        print(f"❌ Error inesperado al procesar feed: {e}")
-
-    marcar_candidato_como_procesado(candidato_id, campo="ex")
-
-def main(start_date_str=None, end_date_str=None):
-    """Función principal para procesar todos los candidatos pendientes."""
-    
+def nombre_consulta(candidato_nombre):
+    return " ".join(str(candidato_nombre).split())
 
-    log_id = log_start('ex_gnoticias_diario', 'inicio procesamiento')
-    try:
-        reset_candidatos_news()
-    except Exception as e:
-        print(f"❌ No se pudo resetear 'news' en candidatos: {e}")
+def query_diaria(nombres, ventana="1d"):
+    """Consulta de las noticias recientes (`when:ventana`) para uno o varios nombres (unidos con OR)."""
+    return " OR ".join(f'"{nombre_consulta(nombre)}"' for nombre in nombres) + f" when:{ventana}"
+
+def armar_lotes(candidatos, tamano_lote, matcher):
+    """Agrupa (id, nombre) en lotes de hasta `tamano_lote` candidatos sin pasar de MAX_LARGO_QUERY.
+
+    Los candidatos con una keyword vacía van solos: en un lote se quedarían con las noticias
+    de todos los demás.
+    """
+    lotes = []
+    lote = []
+    for candidato_id, candidato_nombre in candidatos:
+        if tamano_lote <= 1 or matcher.acepta_todo(candidato_id):
+            lotes.append([(candidato_id, candidato_nombre)])
+            continue
+        if lote and (len(lote) >= tamano_lote or len(query_diaria([n for _, n in lote] + [candidato_nombre])) > MAX_LARGO_QUERY):
+            lotes.append(lote)
+            lote = []
+        lote.append((candidato_id, candidato_nombre))
+    if lote:
+        lotes.append(lote)
+    return lotes
+
+def trabajo_lote(lote, log_id=None, planificador=None):
+    """Trabajo del pipeline para las noticias recientes de los candidatos de `lote`.
+
+    Las entradas se reparten entre los candidatos del lote con el matcher de keywords. Si el
+    feed llega cerca del tope de resultados, el lote se parte en dos consultas más chicas.
+    Con `planificador` la ventana cubre desde la última consulta exitosa del lote, que se
+    actualiza en el mismo commit que sus noticias.
+    """
+    candidato_ids = [candidato_id for candidato_id, _ in lote]
+    ventana = planificador.ventana(candidato_ids) if planificador is not None else VENTANA_DEFAULT
+    # Período que cubre `when:`; con él se indexa el feed en gnoticias.archivo
+    fin = planificador.ahora if planificador is not None else datetime.now()
+    periodo = (fin - timedelta(hours=horas_ventana(ventana)), fin)
+
+    def al_terminar(trabajo, writer):
+        if trabajo.dividido:
+            return
+        # Los validadores del feed se guardan en el mismo commit que sus noticias
+        if trabajo.error is None:
+            registrar_feed(writer, trabajo.respuesta)
+            if planificador is not None:
+                planificador.registrar(writer, candidato_ids)
+        # Commit de las noticias del lote junto con las marcas ex=1
+        writer.marcar_procesados(candidato_ids, campo="ex")
+
+    def dividir(trabajo, n_entradas):
+        if len(lote) < 2 or n_entradas < LIMITE_ITEMS_FEED * UMBRAL_BISECCION:
+            return None
+        mitad = len(lote) // 2
+        print(f"✂️ {n_entradas} entradas para {len(lote)} candidatos, partiendo el lote en {mitad} y {len(lote) - mitad}")
+        return [trabajo_lote(lote[:mitad], log_id, planificador), trabajo_lote(lote[mitad:], log_id, planificador)]
+
+    candidato_id, candidato_nombre = lote[0]
+    if len(lote) > 1:
+        candidato_nombre = ", ".join(nombre for _, nombre in lote)
+    return Trabajo(url_busqueda(query_diaria([nombre for _, nombre in lote], ventana)), candidato_id, candidato_nombre,
+                   candidatos=candidato_ids, log_id=log_id, ventana=periodo, al_terminar=al_terminar, dividir=dividir)
+
+def trabajo_diario(candidato_id, candidato_nombre, log_id=None):
+    """Trabajo del pipeline para las noticias del último día de un candidato."""
+    return trabajo_lote([(candidato_id, candidato_nombre)], log_id)
 
+def fetch_news_for_candidate(candidato_id, candidato_nombre, start_date, end_date, id_tema=None, keywords=None, log_id=None, writer=None, matcher=None, atribucion_cruzada=False):
+    """Obtiene noticias de un solo candidato, las analiza y las guarda en la tabla gnoticias."""
+    if writer is None:
+        with GnoticiasWriter() as writer:
+            return fetch_news_for_candidate(candidato_id, candidato_nombre, start_date, end_date, id_tema, keywords, log_id, writer, matcher, atribucion_cruzada)
+    if matcher is None:
+        matcher = MatcherKeywords({candidato_id: keywords})
+    Pipeline(writer, matcher, atribucion_cruzada=atribucion_cruzada).ejecutar([trabajo_diario(candidato_id, candidato_nombre, log_id)])
+
+def obtener_candidatos_pendientes():
+    """Retorna los candidatos con `ex` pendiente y tema asignado, ordenados por id."""
+    with get_db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT c.id_candidato, c.nombre, c.id_tema, c.keywords
+                FROM candidatos c LEFT JOIN candidatos_estado e ON e.id_candidato = c.id_candidato
+                WHERE e.ex IS NOT 1 AND c.id_tema IS NOT NULL ORDER BY c.id_candidato ASC
+            """)
+            return [tuple(row) for row in cur.fetchall()]
+        except Exception as e:
+            print(f"❌ Error inesperado al obtener candidatos: {e}")
+            return []
+
+def lotes_de_cola(cola, candidatos, tamano_lote, matcher, concurrencia):
+    """Genera lotes de los candidatos que `cola` va reclamando; cada reclamo alcanza para `concurrencia` consultas.
+
+    Solo se consultan los candidatos de `candidatos` (los que se leyeron y planificaron al
+    arrancar); si aparece otro, su lease se libera al cerrar la cola.
+    """
+    nombres = {row[0]: row[1] for row in candidatos}
     while True:
-        with get_db_connection() as conn:
-            cur = conn.cursor()
-            try:
-                cur.execute("SELECT id_candidato, nombre, id_tema, keywords FROM candidatos WHERE ex IS NOT 1 AND id_tema IS NOT NULL ORDER BY id_candidato ASC LIMIT 1")
-                row = cur.fetchone()
-            except Exception as e:
-                print(f"❌ Error inesperado al obtener candidato: {e}")
-                row = None
-
-        if not row:
-            print("✅ No hay más candidatos por procesar. Proceso finalizado.")
-            break
-
-        candidato_id, candidato_nombre, id_tema, keywords = row
-        print(f"✅ Procesando: {candidato_nombre} (ID {candidato_id})")
+        reclamados = cola.reclamar(max(1, tamano_lote) * max(1, concurrencia))
+        if not reclamados:
+            return
+        yield from armar_lotes([(row[0], nombres[row[0]]) for row in reclamados if row[0] in nombres], tamano_lote, matcher)
+
+def main(start_date_str=None, end_date_str=None, concurrencia=CONCURRENCIA_DEFAULT, reanudar=False, atribucion_cruzada=False,
+         candidatos_por_lote=CANDIDATOS_POR_LOTE_DEFAULT, shards=SHARDS_DEFAULT, planificar=PLANIFICAR_DEFAULT, cola=COLA_DEFAULT,
+         archivar=ARCHIVAR_DEFAULT):
+    """Función principal para procesar todos los candidatos pendientes.
+
+    Todos los candidatos pasan por un mismo Pipeline; `concurrencia` es la cantidad de feeds
+    que se descargan en paralelo. Cada candidato se marca con ex=1 apenas se escriben sus
+    noticias, así que con `reanudar=True` (sin reset) una ejecución interrumpida continúa solo
+    con los candidatos que quedaron pendientes. Las keywords de todos los candidatos se
+    compilan una sola vez en un MatcherKeywords compartido.
+
+    Con `candidatos_por_lote` > 1 se consultan varios candidatos en una sola búsqueda
+    "A" OR "B" OR ... y cada entrada se atribuye a los candidatos cuyas keywords menciona.
+    En ese modo los candidatos sin keywords se marcan sin consultar (no podrían recibir noticias).
+    Con `shards` las noticias van al shard del mes (ver gnoticias.shards).
+    Con `planificar` solo se consultan los candidatos que tocan según su tasa de noticias y
+    cada consulta usa la ventana `when:` desde su última consulta (ver gnoticias.planificador);
+    los demás se marcan sin consultar.
+    Con `cola` los lotes se arman a medida que se reclaman candidatos con lease, así varios
+    procesos pueden trabajar sobre la misma base: uno arranca normalmente (resetea `ex`) y los
+    demás con `reanudar=True`. Los candidatos de un proceso caído se reclaman al vencer su lease.
+    Con `archivar` cada feed descargado queda en gnoticias.archivo para reprocesarlo sin red.
+    """
+    asegurar_esquema()
+    log_id = log_start('ex_gnoticias_diario', 'inicio procesamiento')
+    cache_urls.reiniciar_estadisticas()
+    estadisticas_http.reiniciar()
+    ritmo_feeds.reiniciar_estadisticas()
+    ritmo_decoder.reiniciar_estadisticas()
+    metricas.reiniciar()
+    asegurar_tabla_feeds()
+    if archivar:
+        asegurar_tabla_archivo()
+    if not reanudar:
+        try:
+            reset_candidatos_news()
+        except Exception as e:
+            print(f"❌ No se pudo resetear 'news' en candidatos: {e}")
+
+    candidatos = obtener_candidatos_pendientes()
+    print(f"ℹ️ {len(candidatos)} candidatos pendientes (concurrencia={concurrencia}).")
+
+    matcher = MatcherKeywords({row[0]: row[3] for row in candidatos})
+    planificador = None
+    no_tocan = []
+    if planificar:
+        planificador = Planificador().cargar([row[0] for row in candidatos])
+        candidatos, omitidos = planificador.planificar(candidatos)
+        no_tocan = [row[0] for row in omitidos]
+    if candidatos_por_lote > 1 and not atribucion_cruzada:
+        sin_keywords = [row[0] for row in candidatos if not matcher.tiene_keywords(row[0])]
+        candidatos = [row for row in candidatos if matcher.tiene_keywords(row[0])]
+    else:
+        sin_keywords = []
+    if not cola:
+        lotes = armar_lotes([(row[0], row[1]) for row in candidatos], candidatos_por_lote, matcher)
+        print(f"ℹ️ {len(lotes)} consultas para {len(candidatos)} candidatos (lote={candidatos_por_lote}).")
+    cola_candidatos = None
+    with GnoticiasWriter(shards=shards) as writer:
+        if sin_keywords:
+            print(f"⏩ {len(sin_keywords)} candidatos sin keywords se marcan sin consultar.")
+            writer.marcar_procesados(sin_keywords, campo="ex")
+        if no_tocan:
+            print(f"⏸️ {len(no_tocan)} candidatos no tocan en esta ejecución según el planificador.")
+            writer.marcar_procesados(no_tocan, campo="ex")
+        writer.cargar_indice([row[0] for row in candidatos])
+        pipeline = Pipeline(writer, matcher, atribucion_cruzada=atribucion_cruzada, workers_fetch=concurrencia, archivar=archivar)
         try:
-            fetch_news_for_candidate(candidato_id, candidato_nombre, None, None, id_tema=id_tema, keywords=keywords, log_id=log_id)
+            if cola:
+                # Se reclama más trabajo solo cuando se libera lugar en el pipeline
+                with ColaCandidatos() as cola_candidatos:
+                    lotes = lotes_de_cola(cola_candidatos, candidatos, candidatos_por_lote, matcher, concurrencia)
+                    pipeline.ejecutar((trabajo_lote(lote, log_id, planificador) for lote in lotes), max_en_vuelo=2 * max(1, concurrencia))
+            else:
+                pipeline.ejecutar(trabajo_lote(lote, log_id, planificador) for lote in lotes)
         except Exception as e:
-            print(f"❌ Error procesando candidato {candidato_id}: {e}")
+            print(f"❌ Error inesperado en el pipeline diario: {e}")
             log_error_update(log_id, e)
 
-    log_end(log_id, estado='finished', mensaje='Proceso diario completado.')
+    print("✅ No hay más candidatos por procesar. Proceso finalizado.")
+    print(f"ℹ️ {cache_urls.resumen()}")
+    print(f"ℹ️ {estadisticas_http.resumen()}")
+    print(f"ℹ️ {ritmo_feeds.resumen()} | {ritmo_decoder.resumen()}")
+    print(f"ℹ️ Etapas: {metricas.resumen()}")
+    if planificador is not None:
+        print(f"ℹ️ {planificador.resumen()}")
+    if cola_candidatos is not None:
+        print(f"ℹ️ {cola_candidatos.resumen()}")
+    metricas.guardar(log_id)
+    log_end(log_id, estado='finished', mensaje=f'Proceso diario completado. {cache_urls.resumen()} {estadisticas_http.resumen()}')
+    # ANALYZE/VACUUM según su calendario, antes de que el workflow suba las bases; con shards
+    # la base principal se mantiene al compactar
+    mantenimiento(ruta_estado())
+    if not shards:
+        mantenimiento()
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Obtener y analizar noticias de Google News para candidatos.")
+    parser.add_argument("--concurrencia", type=int, default=CONCURRENCIA_DEFAULT, help="Número de feeds descargados en paralelo.")
+    parser.add_argument("--reanudar", action="store_true", help="No resetear 'ex': continuar solo con los candidatos pendientes.")
+    parser.add_argument("--atribucion-cruzada", action="store_true", help="Guardar cada noticia también para los otros candidatos que menciona.")
+    parser.add_argument("--lote", type=int, default=CANDIDATOS_POR_LOTE_DEFAULT, help="Candidatos combinados por consulta (OR).")
+    parser.add_argument("--shards", action="store_true", default=SHARDS_DEFAULT, help="Escribir las noticias en el shard mensual.")
+    parser.add_argument("--planificar", action="store_true", default=PLANIFICAR_DEFAULT,
+                        help="Consultar solo los candidatos que tocan, con la ventana when: desde su última consulta.")
+    parser.add_argument("--cola", action="store_true", default=COLA_DEFAULT,
+                        help="Reclamar candidatos con lease para repartirlos entre varios procesos (los adicionales con --reanudar).")
+    parser.add_argument("--archivar", action="store_true", default=ARCHIVAR_DEFAULT, help="Guardar los feeds descargados en el archivo comprimido.")
     args = parser.parse_args()
-    main()
+    main(concurrencia=args.concurrencia, reanudar=args.reanudar, atribucion_cruzada=args.atribucion_cruzada, candidatos_por_lote=args.lote,
+         shards=args.shards, planificar=args.planificar, cola=args.cola, archivar=args.archivar)
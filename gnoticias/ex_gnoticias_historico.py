@@ -1,17 +1,9 @@
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import chain
 
-import re
-import unicodedata
-from difflib import SequenceMatcher
-import sqlite3
-import feedparser
-import hashlib
-import time
-import urllib.parse
-from datetime import datetime, timedelta, timezone
-from googlenewsdecoder import gnewsdecoder
-import requests
-
-# Para manejo incremental
+# Formato antiguo de progreso (antes de `backfill_progreso`)
 def get_last_processed_date(candidato_id):
     """Consulta en el log la última fecha procesada para el candidato."""
     with get_db_connection() as conn:
@@ -30,185 +22,259 @@ def get_last_processed_date(candidato_id):
                     return datetime.strptime(part.split('=')[1], "%Y-%m-%d")
     return None
 
-def set_last_processed_date(log_id, candidato_id, last_date):
-    """Actualiza el mensaje del log con la última fecha procesada para el candidato."""
-    from gnoticias.db_gnoticias import get_db_connection
-    with get_db_connection() as conn:
-        cur = conn.cursor()
-        mensaje = f"candidato_id={candidato_id};ultima_fecha={last_date.strftime('%Y-%m-%d')}"
-        cur.execute("UPDATE log_ejecucion SET mensaje = ? WHERE id = ?", (mensaje, log_id))
-        conn.commit()
-
 # Funciones de DB
 from gnoticias.db_gnoticias import (
+    GnoticiasWriter,
+    asegurar_esquema,
     get_db_connection,
-    news_exists_in_gnoticias,
-    save_news_to_gnoticias,
-    marcar_candidato_como_procesado,
+    mantenimiento,
+    ruta_estado,
 )
-from gnoticias.db_log_ejecucion import log_start, log_end, log_error_update, log_error_new
+from gnoticias.archivo import asegurar_tabla_archivo
+from gnoticias.cache_urls import cache_urls
+from gnoticias.db_backfill import asegurar_tabla_progreso, rangos_pendientes, registrar_dias, sembrar_desde_log, tiene_progreso
+from gnoticias.http_feeds import url_busqueda
+from gnoticias.keywords import MatcherKeywords
+from gnoticias.metricas import metricas
+from gnoticias.pipeline import LIMITE_ITEMS_FEED, UMBRAL_BISECCION, Pipeline, Trabajo
+from gnoticias.ritmo import ritmo_decoder, ritmo_feeds
+from gnoticias.db_log_ejecucion import log_start, log_end, log_error_update
 
 STOPWORDS_APELLIDO = {"de", "del", "la", "las", "los", "y", "san", "santa"}
 
-def similarity(a, b):
-    return SequenceMatcher(None, a, b).ratio() * 100
-
-def normalize_text(text):
-    if not text:
-        return ""
-    text = unicodedata.normalize('NFD', text.lower()).encode('ascii', 'ignore').decode('utf-8')
-    text = re.sub(r'[^a-z0-9ñ\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-# Zona horaria de Colombia
-COL_TZ = timezone(timedelta(hours=-5))
-
-def normalize_to_colombia_time(fecha_dt):
-    # Si fecha_dt NO tiene tzinfo, asumimos que viene en UTC (caso Google News)
-    if fecha_dt.tzinfo is None:
-        fecha_dt = fecha_dt.replace(tzinfo=timezone.utc)
-    # Convertimos a UTC-5
-    return fecha_dt.astimezone(COL_TZ)
-
-def process_feed_entry(entry, candidato_id, fecha_dt):
-    titulo = entry.get("title", "")
-    if " - " in titulo:
-        parts = titulo.rsplit(" - ", 1)
-        noticia = parts[0].strip()
-        medio = parts[1].strip()
-    else:
-        noticia = titulo.strip()
-        medio = "Desconocido"
-
-    # Normalizar timezone
-    fecha_local = normalize_to_colombia_time(fecha_dt)
-
-    google_news_url = entry.get("link", "")
-    link = gnewsdecoder(google_news_url).get("decoded_url", google_news_url) if google_news_url else ""
-    if not link:
-        return None
+# Tamaño inicial (días) de las ventanas en modo adaptativo
+VENTANA_INICIAL_DIAS = 30
+
+def construir_url_historico(safe_name, desde, hasta):
+    """URL de Google News para las noticias publicadas entre `desde` y `hasta` (ambos incluidos)."""
+    query = f'"{safe_name}" after:{desde.strftime("%Y-%m-%d")} before:{(hasta + timedelta(days=1)).strftime("%Y-%m-%d")}'
+    return url_busqueda(query)
+
+class ProgresoHistorico:
+    """Solicitudes y días cubiertos de un candidato mientras sus trabajos pasan por el pipeline."""
+    def __init__(self, candidato_id, log_id=None):
+        self.candidato_id = candidato_id
+        self.log_id = log_id
+        self.solicitudes = 0
+        self.dias = 0
+        self._lock = threading.Lock()
+
+    def al_terminar(self, trabajo, writer):
+        """Cierra un día o ventana: checkpoint y commit, salvo que haya fallado o se haya partido."""
+        desde, hasta = trabajo.ventana
+        with self._lock:
+            if trabajo.respuesta is not None:
+                self.solicitudes += 1
+        if trabajo.error is not None or trabajo.dividido:
+            return
+        # Un commit por día o ventana consultada, con el checkpoint de todos sus días
+        registrar_dias(writer, self.candidato_id, desde, hasta, self.log_id)
+        writer.flush()
+        with self._lock:
+            self.dias += (hasta - desde).days + 1
 
-    entry_id = entry.get("id", google_news_url)
-    id_corto = hashlib.md5(entry_id.encode("utf-8")).hexdigest()
-
-    return {
-        "candidato_id": candidato_id,
-        "id": id_corto,
-        "noticia": noticia,
-        "medio": medio,
-        "fecha": fecha_local,   # <-- fecha final en Colombia
-        "source_href": entry.source.get("href", "") if hasattr(entry, "source") else "",
-        "ano": fecha_local.year,
-        "mes": fecha_local.month,
-        "dia": fecha_local.day,
-        "hora": fecha_local.hour,
-        "minuto": fecha_local.minute,
-        "dia_sem": fecha_local.weekday(),
-        "dia_ano": fecha_local.timetuple().tm_yday,
-        "link": link,
-        "id_largo": entry_id,
-    }
-
-def fetch_news_for_candidate_historico(candidato_id, candidato_nombre, keywords, start_date, end_date, log_id=None):
+def trabajos_diarios(candidato_id, candidato_nombre, start_date, end_date, progreso):
+    """Una consulta por día calendario (modo original); los días más expuestos a bloqueos pesan más."""
     safe_name = " ".join(str(candidato_nombre).split())
     current_date = start_date
     while current_date <= end_date:
-        query = f'"{safe_name}" after:{current_date.strftime("%Y-%m-%d")} before:{(current_date + timedelta(days=1)).strftime("%Y-%m-%d")}'
-        url = "https://news.google.com/rss/search?" + urllib.parse.urlencode({"q": query, "hl": "es-419", "gl": "CO", "ceid": "CO:es-419"})
-        print(f"\n📅 {current_date.strftime('%Y-%m-%d')} | URL: {url}")
-        try:
-            feed = feedparser.parse(url)
-            if feed.bozo:
-                print(f"⚠️ Error al parsear el feed: {feed.bozo_exception}")
-                # Si el error es de XML mal formado, sleep 15s y continuar
-                if 'not well-formed' in str(feed.bozo_exception):
-                    print("⏸️ Pausa de 15 segundos por error de formato en el feed")
-                    time.sleep(15)
-                    current_date += timedelta(days=1)
-                    continue
-            for entry in feed.entries:
-                prelim = process_feed_entry(entry, candidato_id, current_date)
-                if not prelim:
-                    continue
-                if not keywords:
-                    print(f"⏩ Omitida por falta de keywords para el candidato: {candidato_nombre}")
-                    continue
-                keyword_list = [k.strip() for k in keywords.split(',')]
-                normalized_noticia = normalize_text(prelim["noticia"])
-                es_relevante = False
-                for keyword in keyword_list:
-                    normalized_keyword = normalize_text(keyword)
-                    if normalized_keyword in normalized_noticia:
-                        es_relevante = True
-                        break
-                if not es_relevante:
-                    print(f"⏩ Omitida por no contener keywords: {prelim['noticia']}")
-                    continue
-                if news_exists_in_gnoticias(prelim["id"], candidato_id):
-                    print(f"⚠️ Duplicada en gnoticias (omitida): {prelim['noticia']}")
-                    continue
-                prelim['id_log'] = log_id
-                print(f"-> Relevante. Guardando noticia: {prelim['noticia']}")
-                save_news_to_gnoticias(prelim)
-                time.sleep(1)
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Error de red al obtener noticias: {e}")
-        except Exception as e:
-            print(f"❌ Error inesperado al procesar feed: {e}")
-        # Sleep de 2 segundos entre días
-        time.sleep(2)
-        # Sleep de 3 segundos si es domingo (fin de semana)
-        if current_date.weekday() == 6:
-            print("⏸️ Pausa extra de 3 segundos por fin de semana")
-            time.sleep(3)
-        # Sleep de 15 segundos al cambiar de mes
         next_date = current_date + timedelta(days=1)
+        # Fichas de ritmo_feeds: a la tasa inicial (0.5/s) equivalen a las antiguas pausas de
+        # 2 s entre días, 3 s más los domingos y 15 s más al cambiar de mes
+        peso = 1
+        if current_date.weekday() == 6:
+            peso += 1.5
         if next_date.month != current_date.month:
-            print("⏸️ Pausa de 15 segundos por cambio de mes")
-            time.sleep(15)
+            peso += 7.5
+        yield Trabajo(
+            construir_url_historico(safe_name, current_date, current_date), candidato_id, candidato_nombre,
+            etiqueta=current_date.strftime('%Y-%m-%d'), log_id=progreso.log_id, fecha_consulta=current_date,
+            ventana=(current_date, current_date), condicional=False, omitir_mal_formado=True, peso=peso,
+            al_terminar=progreso.al_terminar,
+        )
         current_date = next_date
 
+def trabajo_ventana(candidato_id, candidato_nombre, desde, hasta, progreso):
+    """Consulta de una ventana [desde, hasta] que se parte en dos si llega cerca del tope del feed."""
+    safe_name = " ".join(str(candidato_nombre).split())
+
+    def dividir(trabajo, n_entradas):
+        if n_entradas < LIMITE_ITEMS_FEED * UMBRAL_BISECCION or hasta <= desde:
+            return None
+        # Probablemente truncado: partir la ventana en dos y consultar cada mitad
+        mitad = desde + timedelta(days=(hasta - desde).days // 2)
+        print(f"✂️ {n_entradas} entradas, partiendo ventana en {desde.date()}–{mitad.date()} y {(mitad + timedelta(days=1)).date()}–{hasta.date()}")
+        return [
+            trabajo_ventana(candidato_id, candidato_nombre, desde, mitad, progreso),
+            trabajo_ventana(candidato_id, candidato_nombre, mitad + timedelta(days=1), hasta, progreso),
+        ]
+
+    return Trabajo(
+        construir_url_historico(safe_name, desde, hasta), candidato_id, candidato_nombre,
+        etiqueta=f"{desde.strftime('%Y-%m-%d')} → {hasta.strftime('%Y-%m-%d')}", log_id=progreso.log_id,
+        fecha_consulta=desde, usar_fecha_entrada=True, ventana=(desde, hasta), condicional=False,
+        omitir_mal_formado=True, al_terminar=progreso.al_terminar, dividir=dividir,
+    )
 
-# ==== CONFIGURACIÓN MANUAL ====
+def trabajos_adaptativos(candidato_id, candidato_nombre, start_date, end_date, progreso, ventana_dias):
+    """Ventanas amplias de `ventana_dias`; las que llegan al tope se bisecan dentro del pipeline."""
+    desde = start_date
+    while desde <= end_date:
+        hasta = min(desde + timedelta(days=ventana_dias - 1), end_date)
+        yield trabajo_ventana(candidato_id, candidato_nombre, desde, hasta, progreso)
+        desde = hasta + timedelta(days=1)
+
+def trabajos_historico(candidato_id, candidato_nombre, start_date, end_date, progreso, ventana_adaptativa=False, ventana_dias=None):
+    """Trabajos del pipeline para el histórico de un candidato entre `start_date` y `end_date`."""
+    if ventana_adaptativa:
+        return trabajos_adaptativos(candidato_id, candidato_nombre, start_date, end_date, progreso, ventana_dias or VENTANA_INICIAL_DIAS)
+    return trabajos_diarios(candidato_id, candidato_nombre, start_date, end_date, progreso)
+
+def fetch_news_for_candidate_historico(candidato_id, candidato_nombre, keywords, start_date, end_date, log_id=None, writer=None, matcher=None, atribucion_cruzada=False, ventana_adaptativa=False, ventana_dias=None):
+    """Descarga el histórico de un candidato entre `start_date` y `end_date`.
+
+    Por defecto hace una consulta por día. Con `ventana_adaptativa` consulta ventanas de
+    `ventana_dias` y solo las parte en dos cuando el feed se acerca al tope de resultados
+    de Google News. Retorna (solicitudes, dias_cubiertos).
+    """
+    if writer is None:
+        with GnoticiasWriter(podar=False) as writer:
+            return fetch_news_for_candidate_historico(candidato_id, candidato_nombre, keywords, start_date, end_date, log_id, writer, matcher, atribucion_cruzada, ventana_adaptativa, ventana_dias)
+    if matcher is None:
+        matcher = MatcherKeywords({candidato_id: keywords})
+    asegurar_tabla_progreso()
+    progreso = ProgresoHistorico(candidato_id, log_id)
+    Pipeline(writer, matcher, atribucion_cruzada=atribucion_cruzada).ejecutar(
+        trabajos_historico(candidato_id, candidato_nombre, start_date, end_date, progreso, ventana_adaptativa, ventana_dias)
+    )
+    print(f"ℹ️ Candidato {candidato_id}: {progreso.solicitudes} solicitudes para {progreso.dias} días.")
+    return progreso.solicitudes, progreso.dias
+
+
+# ==== CONFIGURACIÓN POR DEFECTO (se puede sobrescribir por CLI) ====
 # IDs de candidatos a procesar
 CANDIDATOS_IDS = [76,77]  # <-- Edita aquí los IDs deseados
 # Fechas de inicio y fin (YYYY-MM-DD)
 START_DATE = "2025-01-01"    # <-- Edita aquí la fecha de inicio
 END_DATE = "2025-11-23"      # <-- Edita aquí la fecha de fin
+# Consultar ventanas amplias que se parten solo si llegan al tope del feed
+VENTANA_ADAPTATIVA = False   # <-- True para activar el modo adaptativo
+# Días pendientes procesados como máximo por candidato en cada ejecución (aprox 5 meses)
+MAX_DIAS_POR_EJECUCION = 153
+# Feeds descargados en paralelo
+WORKERS_DEFAULT = 1
+# Escribir las noticias nuevas en el shard mensual en vez de la base principal
+SHARDS_DEFAULT = False
+
+# Guardar cada feed descargado en el archivo comprimido (ver gnoticias.archivo)
+ARCHIVAR_DEFAULT = False
+
+def preparar_candidato(candidato_id, candidato_nombre, start_date, end_date, max_dias=MAX_DIAS_POR_EJECUCION):
+    """Rangos sin checkpoint de un candidato dentro de [start_date, end_date] y el log de su ejecución.
+
+    Retorna (rangos, progreso), o None si el histórico del candidato ya está completo.
+    """
+    # Compatibilidad con el progreso guardado en log_ejecucion por versiones anteriores
+    if not tiene_progreso(candidato_id):
+        last_date = get_last_processed_date(candidato_id)
+        if last_date:
+            sembrar_desde_log(candidato_id, start_date, last_date)
+    rangos = rangos_pendientes(candidato_id, start_date, end_date, max_dias=max_dias)
+    if not rangos:
+        print(f"✅ Histórico completo: {candidato_nombre} (ID {candidato_id}) del {start_date.date()} al {end_date.date()}")
+        return None
+    print(f"✅ Procesando histórico: {candidato_nombre} (ID {candidato_id}) del {rangos[0][0].date()} al {rangos[-1][1].date()} ({len(rangos)} rangos)")
+    log_id = log_start('ex_gnoticias_historico', f'candidato_id={candidato_id};ultima_fecha={rangos[0][0].date() - timedelta(days=1)}')
+    return rangos, ProgresoHistorico(candidato_id, log_id)
+
+def intercalar(grupos):
+    """Recorre los iteradores de `grupos` por turnos (uno de cada uno) hasta agotarlos todos.
+
+    Así los trabajos de todos los candidatos entran al pipeline repartidos desde el principio,
+    en vez de encolar un candidato completo antes de empezar el siguiente.
+    """
+    activos = deque(iter(grupo) for grupo in grupos)
+    while activos:
+        grupo = activos.popleft()
+        try:
+            trabajo = next(grupo)
+        except StopIteration:
+            continue
+        activos.append(grupo)
+        yield trabajo
 
-def main():
-    end_date = datetime.strptime(END_DATE, "%Y-%m-%d")
+def main(candidato_ids=None, start_date_str=None, end_date_str=None, workers=WORKERS_DEFAULT, max_dias=MAX_DIAS_POR_EJECUCION,
+         ventana_adaptativa=VENTANA_ADAPTATIVA, ventana_dias=None, atribucion_cruzada=False, shards=SHARDS_DEFAULT, archivar=ARCHIVAR_DEFAULT):
+    """Backfill de varios candidatos sobre un mismo Pipeline, con `workers` descargas en paralelo y checkpoints diarios."""
+    candidato_ids = list(candidato_ids or CANDIDATOS_IDS)
+    start_date = datetime.strptime(start_date_str or START_DATE, "%Y-%m-%d")
+    end_date = datetime.strptime(end_date_str or END_DATE, "%Y-%m-%d")
+    cache_urls.reiniciar_estadisticas()
+    ritmo_feeds.reiniciar_estadisticas()
+    ritmo_decoder.reiniciar_estadisticas()
+    metricas.reiniciar()
+    preparados = []
     try:
+        asegurar_esquema()
+        asegurar_tabla_progreso()
+        if archivar:
+            asegurar_tabla_archivo()
         with get_db_connection() as conn:
-            cur = conn.cursor()
-            for candidato_id in CANDIDATOS_IDS:
-                cur.execute("SELECT nombre, keywords FROM candidatos WHERE id_candidato = ?", (candidato_id,))
-                row = cur.fetchone()
-                if not row:
-                    print(f"❌ Candidato con id {candidato_id} no encontrado.")
-                    continue
-                candidato_nombre, keywords = row
-                # Buscar última fecha procesada
-                last_date = get_last_processed_date(candidato_id)
-                if last_date:
-                    start_date = last_date + timedelta(days=1)
-                else:
-                    start_date = datetime.strptime(START_DATE, "%Y-%m-%d")
-                # Limitar a 5 meses (aprox 153 días)
-                max_end = start_date + timedelta(days=152)
-                real_end = min(max_end, end_date)
-                print(f"✅ Procesando histórico: {candidato_nombre} (ID {candidato_id}) del {start_date.date()} al {real_end.date()}")
-                log_id = log_start('ex_gnoticias_historico', f'candidato_id={candidato_id};ultima_fecha={start_date.date() - timedelta(days=1)}')
-                try:
-                    fetch_news_for_candidate_historico(candidato_id, candidato_nombre, keywords, start_date, real_end, log_id=log_id)
-                    set_last_processed_date(log_id, candidato_id, real_end)
-                except Exception as e:
-                    print(f"❌ Error inesperado en el procesamiento histórico: {e}")
-                    log_error_update(log_id, e)
-                log_end(log_id, estado='finished', mensaje=f'candidato_id={candidato_id};ultima_fecha={real_end.date()}')
+            marcas = ",".join("?" * len(candidato_ids))
+            cur = conn.execute(f"SELECT id_candidato, nombre, keywords FROM candidatos WHERE id_candidato IN ({marcas})", candidato_ids)
+            filas = {r[0]: (r[1], r[2]) for r in cur.fetchall()}
+        trabajos = []
+        for candidato_id in candidato_ids:
+            if candidato_id not in filas:
+                print(f"❌ Candidato con id {candidato_id} no encontrado.")
+                continue
+            candidato_nombre = filas[candidato_id][0]
+            preparado = preparar_candidato(candidato_id, candidato_nombre, start_date, end_date, max_dias)
+            if preparado is None:
+                continue
+            rangos, progreso = preparado
+            preparados.append((candidato_id, rangos, progreso))
+            # Los rangos de un candidato van en orden; los candidatos se intercalan en el pipeline
+            trabajos.append(chain.from_iterable([
+                trabajos_historico(candidato_id, candidato_nombre, desde, hasta, progreso, ventana_adaptativa, ventana_dias)
+                for desde, hasta in rangos
+            ]))
+        # Keywords compiladas una vez para todos los candidatos del histórico
+        matcher = MatcherKeywords({cid: kw for cid, (_, kw) in filas.items()})
+        with GnoticiasWriter(shards=shards, podar=False) as writer:
+            writer.cargar_indice(list(filas))
+            pipeline = Pipeline(writer, matcher, atribucion_cruzada=atribucion_cruzada, workers_fetch=workers, archivar=archivar)
+            pipeline.ejecutar(intercalar(trabajos))
     except Exception as e:
         print(f"❌ Error inesperado en el procesamiento histórico: {e}")
+        for _, _, progreso in preparados:
+            log_error_update(progreso.log_id, e)
+        preparados = []
+    for candidato_id, rangos, progreso in preparados:
+        print(f"ℹ️ Candidato {candidato_id}: {progreso.solicitudes} solicitudes para {progreso.dias} días.")
+        metricas.guardar(progreso.log_id, candidato_id)
+        log_end(progreso.log_id, estado='finished', mensaje=f'candidato_id={candidato_id};ultima_fecha={rangos[-1][1].date()};solicitudes={progreso.solicitudes};dias={progreso.dias}')
+    print(f"ℹ️ {cache_urls.resumen()}")
+    print(f"ℹ️ {ritmo_feeds.resumen()} | {ritmo_decoder.resumen()}")
+    print(f"ℹ️ Etapas (sin candidato): {metricas.resumen()}")
+    mantenimiento(ruta_estado())
+    if not shards:
+        mantenimiento()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Carga histórica de noticias de Google News por candidato.")
+    parser.add_argument("--candidatos", type=int, nargs="+", default=CANDIDATOS_IDS, help="IDs de candidatos a procesar.")
+    parser.add_argument("--desde", default=START_DATE, help="Fecha de inicio (YYYY-MM-DD).")
+    parser.add_argument("--hasta", default=END_DATE, help="Fecha de fin (YYYY-MM-DD).")
+    parser.add_argument("--workers", type=int, default=WORKERS_DEFAULT, help="Feeds descargados en paralelo.")
+    parser.add_argument("--max-dias", type=int, default=MAX_DIAS_POR_EJECUCION, help="Días pendientes por candidato en esta ejecución.")
+    parser.add_argument("--ventana-adaptativa", action="store_true", default=VENTANA_ADAPTATIVA, help="Consultar ventanas amplias y partirlas solo si se llenan.")
+    parser.add_argument("--ventana-dias", type=int, default=VENTANA_INICIAL_DIAS, help="Tamaño inicial de ventana en modo adaptativo.")
+    parser.add_argument("--atribucion-cruzada", action="store_true", help="Guardar cada noticia también para los otros candidatos que menciona.")
+    parser.add_argument("--shards", action="store_true", default=SHARDS_DEFAULT, help="Escribir las noticias en el shard mensual.")
+    parser.add_argument("--archivar", action="store_true", default=ARCHIVAR_DEFAULT, help="Guardar los feeds descargados en el archivo comprimido.")
+    args = parser.parse_args()
+    main(args.candidatos, args.desde, args.hasta, workers=args.workers, max_dias=args.max_dias, ventana_adaptativa=args.ventana_adaptativa,
+         ventana_dias=args.ventana_dias, atribucion_cruzada=args.atribucion_cruzada, shards=args.shards,
+         archivar=args.archivar)
@@ -0,0 +1,172 @@
+import hashlib
+import re
+import threading
+import urllib.parse
+from datetime import datetime
+
+import feedparser
+import requests
+from requests.adapters import HTTPAdapter
+
+from gnoticias.db_gnoticias import get_db_connection
+from gnoticias import rss
+from gnoticias.metricas import metricas
+from gnoticias.ritmo import ritmo_feeds
+
+# Endpoint de búsqueda RSS de Google News (el benchmark lo apunta a un servidor local)
+URL_BUSQUEDA_RSS = "https://news.google.com/rss/search"
+
+# Conexiones keep-alive que se mantienen abiertas hacia news.google.com
+TAMANO_POOL = 32
+# Segundos máximos por solicitud de feed
+TIMEOUT_SEGUNDOS = 30
+USER_AGENT = "Mozilla/5.0 (compatible; gnoticias/1.0)"
+
+# Parser de los feeds: "iterparse" (gnoticias.rss, con respaldo en feedparser) o "feedparser"
+PARSER_DEFAULT = "iterparse"
+PARSERS = {"iterparse": rss.parsear, "feedparser": feedparser.parse}
+
+# Respuestas con las que Google News indica que se está consultando demasiado rápido
+ESTADOS_LIMITE = (429, 503)
+
+# Google News cambia <lastBuildDate> en cada respuesta; se ignora al calcular el hash
+_RE_LAST_BUILD = re.compile(rb"<lastBuildDate>.*?</lastBuildDate>", re.S)
+
+SQL_CREAR_FEED_CACHE = """
+    CREATE TABLE IF NOT EXISTS estado.feed_cache (
+        url TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        hash_contenido TEXT,
+        fecha TEXT
+    )
+"""
+
+
+def _crear_sesion():
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=TAMANO_POOL)
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    sesion.headers["User-Agent"] = USER_AGENT
+    return sesion
+
+
+# Sesión compartida por todos los hilos de la ejecución
+sesion = _crear_sesion()
+
+
+class RespuestaFeed:
+    """Resultado de descargar un feed. `feed` queda en None hasta `parsear_feed` y cuando `sin_cambios` es True."""
+    def __init__(self, url, contenido=None, sin_cambios=False, etag=None, last_modified=None, hash_contenido=None):
+        self.url = url
+        self.contenido = contenido
+        self.feed = None
+        self.sin_cambios = sin_cambios
+        self.etag = etag
+        self.last_modified = last_modified
+        self.hash_contenido = hash_contenido
+
+
+class EstadisticasHttp:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.solicitudes = 0
+        self.no_modificados = 0
+        self.hash_repetido = 0
+        self.bytes = 0
+
+    def sumar(self, **valores):
+        with self._lock:
+            for nombre, valor in valores.items():
+                setattr(self, nombre, getattr(self, nombre) + valor)
+
+    def resumen(self):
+        return (f"http solicitudes={self.solicitudes};no_modificados={self.no_modificados};"
+                f"hash_repetido={self.hash_repetido};bytes={self.bytes}")
+
+
+estadisticas = EstadisticasHttp()
+
+
+def url_busqueda(query):
+    """URL del feed RSS de Google News (Colombia, español) para `query`."""
+    return f"{URL_BUSQUEDA_RSS}?" + urllib.parse.urlencode({"q": query, "hl": "es-419", "gl": "CO", "ceid": "CO:es-419"})
+
+
+def asegurar_tabla_feeds():
+    """Crea la tabla `feed_cache` si no existe."""
+    with get_db_connection() as conn:
+        conn.execute(SQL_CREAR_FEED_CACHE)
+        conn.commit()
+
+
+def _validadores(url):
+    try:
+        with get_db_connection() as conn:
+            return conn.execute("SELECT etag, last_modified, hash_contenido FROM feed_cache WHERE url = ?", (url,)).fetchone()
+    except Exception as e:
+        print(f"❌ Error al leer feed_cache para {url}: {e}")
+        return None
+
+
+def descargar_feed(url, condicional=True, peso=1):
+    """Descarga un feed con la sesión compartida, sin parsearlo.
+
+    Antes de la solicitud se reservan `peso` fichas de `ritmo_feeds`; un 429/503 lo penaliza
+    (respetando Retry-After) y una respuesta limpia le permite acelerar.
+
+    Con `condicional` envía If-None-Match / If-Modified-Since según lo guardado en
+    `feed_cache` y compara el hash del contenido; si el feed no cambió desde la última
+    vez que se procesó, retorna con `sin_cambios=True`. Los errores HTTP se lanzan como
+    `requests.exceptions.RequestException`.
+    """
+    guardado = _validadores(url) if condicional else None
+    headers = {}
+    if guardado:
+        if guardado["etag"]:
+            headers["If-None-Match"] = guardado["etag"]
+        if guardado["last_modified"]:
+            headers["If-Modified-Since"] = guardado["last_modified"]
+
+    ritmo_feeds.esperar(peso)
+    with metricas.etapa("fetch"):
+        respuesta = sesion.get(url, headers=headers, timeout=TIMEOUT_SEGUNDOS)
+    estadisticas.sumar(solicitudes=1, bytes=len(respuesta.content))
+    if respuesta.status_code in ESTADOS_LIMITE:
+        ritmo_feeds.penalizar(f"HTTP {respuesta.status_code}", respuesta.headers.get("Retry-After"))
+    elif respuesta.status_code < 400:
+        ritmo_feeds.exito()
+    if respuesta.status_code == 304:
+        estadisticas.sumar(no_modificados=1)
+        return RespuestaFeed(url, sin_cambios=True, etag=guardado["etag"], last_modified=guardado["last_modified"],
+                             hash_contenido=guardado["hash_contenido"])
+    respuesta.raise_for_status()
+
+    contenido = respuesta.content
+    hash_contenido = hashlib.sha1(_RE_LAST_BUILD.sub(b"", contenido)).hexdigest()
+    etag = respuesta.headers.get("ETag")
+    last_modified = respuesta.headers.get("Last-Modified")
+    if guardado and guardado["hash_contenido"] == hash_contenido:
+        estadisticas.sumar(hash_repetido=1)
+        return RespuestaFeed(url, sin_cambios=True, etag=etag, last_modified=last_modified, hash_contenido=hash_contenido)
+    return RespuestaFeed(url, contenido=contenido, etag=etag, last_modified=last_modified, hash_contenido=hash_contenido)
+
+
+def parsear_feed(respuesta, parser=None):
+    """Parsea el contenido descargado con `parser` (por defecto PARSER_DEFAULT) y lo deja en `respuesta.feed`."""
+    with metricas.etapa("parse"):
+        respuesta.feed = PARSERS[parser or PARSER_DEFAULT](respuesta.contenido)
+    metricas.contar("entradas", len(respuesta.feed.entries))
+    return respuesta.feed
+
+
+def registrar_feed(writer, respuesta):
+    """Encola en el writer los validadores del feed para que se guarden junto con sus noticias."""
+    writer.agregar_sentencia(
+        "INSERT OR REPLACE INTO feed_cache (url, etag, last_modified, hash_contenido, fecha) VALUES (?, ?, ?, ?, ?)",
+        (respuesta.url, respuesta.etag, respuesta.last_modified, respuesta.hash_contenido, datetime.now().isoformat()),
+    )
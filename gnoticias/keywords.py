@@ -0,0 +1,84 @@
+import re
+import unicodedata
+from collections import deque
+
+
+def normalize_text(text):
+    """Normaliza el texto: minúsculas, sin tildes, puntuación como espacios."""
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFD', text.lower()).encode('ascii', 'ignore').decode('utf-8')
+    text = re.sub(r'[^a-z0-9ñ\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+class MatcherKeywords:
+    """Autómata Aho-Corasick con las keywords normalizadas de todos los candidatos.
+
+    Se construye una vez por ejecución; `candidatos_en()` recorre un titular normalizado
+    una sola vez y retorna todos los candidatos cuyas keywords aparecen como subcadena
+    (la misma regla que `normalized_keyword in normalized_noticia`).
+    """
+    def __init__(self, keywords_por_candidato):
+        self._goto = [{}]
+        self._fallo = [0]
+        self._salida = [set()]
+        # Una keyword vacía (p. ej. coma final en el CSV) coincide con cualquier titular
+        self._siempre = set()
+        self.candidatos = set()
+        for candidato_id, keywords in keywords_por_candidato.items():
+            for keyword in (keywords or "").split(','):
+                self._agregar(normalize_text(keyword.strip()), candidato_id, keywords)
+        self._construir_fallos()
+
+    def _agregar(self, keyword, candidato_id, keywords):
+        if not keywords:
+            return
+        self.candidatos.add(candidato_id)
+        if not keyword:
+            self._siempre.add(candidato_id)
+            return
+        estado = 0
+        for caracter in keyword:
+            siguiente = self._goto[estado].get(caracter)
+            if siguiente is None:
+                siguiente = len(self._goto)
+                self._goto[estado][caracter] = siguiente
+                self._goto.append({})
+                self._fallo.append(0)
+                self._salida.append(set())
+            estado = siguiente
+        self._salida[estado].add(candidato_id)
+
+    def _construir_fallos(self):
+        cola = deque(self._goto[0].values())
+        while cola:
+            estado = cola.popleft()
+            for caracter, siguiente in self._goto[estado].items():
+                cola.append(siguiente)
+                fallo = self._fallo[estado]
+                while fallo and caracter not in self._goto[fallo]:
+                    fallo = self._fallo[fallo]
+                self._fallo[siguiente] = self._goto[fallo].get(caracter, 0)
+                self._salida[siguiente] |= self._salida[self._fallo[siguiente]]
+
+    def candidatos_en(self, texto_normalizado):
+        """Retorna el conjunto de candidatos con al menos una keyword en el texto."""
+        encontrados = set(self._siempre)
+        estado = 0
+        for caracter in texto_normalizado:
+            while estado and caracter not in self._goto[estado]:
+                estado = self._fallo[estado]
+            estado = self._goto[estado].get(caracter, 0)
+            if self._salida[estado]:
+                encontrados |= self._salida[estado]
+        return encontrados
+
+    def tiene_keywords(self, candidato_id):
+        """True si el candidato tiene al menos una keyword configurada."""
+        return candidato_id in self.candidatos
+
+    def acepta_todo(self, candidato_id):
+        """True si el candidato tiene una keyword vacía y por lo tanto coincide con cualquier titular."""
+        return candidato_id in self._siempre
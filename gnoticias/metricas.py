@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+SQL_CREAR_METRICAS = """
+    CREATE TABLE IF NOT EXISTS estado.metricas_ejecucion (
+        id_log TEXT NOT NULL,
+        id_candidato INTEGER,
+        etapa TEXT NOT NULL,
+        segundos REAL NOT NULL,
+        llamadas INTEGER NOT NULL,
+        fecha TEXT
+    )
+"""
+SQL_INDICE_METRICAS = "CREATE INDEX IF NOT EXISTS estado.idx_metricas_log ON metricas_ejecucion (id_log)"
+
+# Ejecuciones recientes que conservan el detalle por candidato (una semana a 4 ejecuciones diarias);
+# las anteriores quedan con una fila por etapa
+EJECUCIONES_DETALLE = 28
+# Días que se conservan los totales por etapa
+DIAS_METRICAS = 180
+
+
+class Metricas:
+    """Tiempos y contadores por etapa, agregados por candidato.
+
+    El candidato en curso se fija por hilo con `candidato()`, así las etapas medidas dentro
+    de http_feeds, cache_urls o el writer quedan atribuidas sin pasar el id por parámetro:
+
+        with metricas.candidato(candidato_id):
+            with metricas.etapa("fetch"):
+                ...
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._datos = defaultdict(lambda: [0.0, 0])
+
+    def reiniciar(self):
+        with self._lock:
+            self._datos.clear()
+
+    @contextmanager
+    def candidato(self, candidato_id):
+        anterior = getattr(self._local, "candidato_id", None)
+        self._local.candidato_id = candidato_id
+        try:
+            yield
+        finally:
+            self._local.candidato_id = anterior
+
+    def _sumar(self, nombre, segundos, llamadas):
+        clave = (getattr(self._local, "candidato_id", None), nombre)
+        with self._lock:
+            acumulado = self._datos[clave]
+            acumulado[0] += segundos
+            acumulado[1] += llamadas
+
+    @contextmanager
+    def etapa(self, nombre):
+        """Mide el tiempo del bloque y lo suma a la etapa `nombre` del candidato en curso."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._sumar(nombre, time.perf_counter() - inicio, 1)
+
+    def contar(self, nombre, cantidad=1):
+        """Suma `cantidad` al contador `nombre` del candidato en curso."""
+        self._sumar(nombre, 0.0, cantidad)
+
+    def resumen(self):
+        """Totales por etapa de lo acumulado hasta ahora."""
+        totales = defaultdict(lambda: [0.0, 0])
+        with self._lock:
+            for (_, nombre), (segundos, llamadas) in self._datos.items():
+                totales[nombre][0] += segundos
+                totales[nombre][1] += llamadas
+        return " ".join(f"{nombre}={segundos:.2f}s/{llamadas}" for nombre, (segundos, llamadas) in sorted(totales.items()))
+
+    def guardar(self, log_id, candidato_id=None):
+        """Persiste lo acumulado en `metricas_ejecucion` ligado a `log_id` y lo descarta de memoria.
+
+        Con `candidato_id` solo se guardan (y descartan) las métricas de ese candidato.
+        """
+        from gnoticias.db_gnoticias import get_db_connection
+        with self._lock:
+            claves = [c for c in self._datos if candidato_id is None or c[0] == candidato_id]
+            filas = [(log_id, c[0], c[1], self._datos[c][0], self._datos[c][1], datetime.now().isoformat()) for c in claves]
+            for clave in claves:
+                del self._datos[clave]
+        if not filas:
+            return
+        try:
+            with get_db_connection() as conn:
+                conn.execute(SQL_CREAR_METRICAS)
+                conn.execute(SQL_INDICE_METRICAS)
+                conn.executemany(
+                    "INSERT INTO metricas_ejecucion (id_log, id_candidato, etapa, segundos, llamadas, fecha) VALUES (?, ?, ?, ?, ?, ?)", filas
+                )
+                conn.commit()
+        except Exception as e:
+            print(f"❌ Error al guardar métricas de la ejecución {log_id}: {e}")
+
+
+# Instancia compartida por todos los módulos
+metricas = Metricas()
+
+
+def podar(conn, ejecuciones_detalle=EJECUCIONES_DETALLE, dias=DIAS_METRICAS):
+    """Retención de `metricas_ejecucion` en `conn` (la base de estado abierta directamente).
+
+    Fuera de las `ejecuciones_detalle` más recientes, las filas por candidato de cada ejecución
+    se reemplazan por una fila por etapa (id_candidato NULL); las de más de `dias` se borran.
+    Retorna la cantidad de filas eliminadas.
+    """
+    antes = conn.execute("SELECT COUNT(*) FROM metricas_ejecucion").fetchone()[0]
+    conn.execute("DELETE FROM metricas_ejecucion WHERE fecha < ?", ((datetime.now() - timedelta(days=dias)).isoformat(),))
+    viejas = [fila[0] for fila in conn.execute("""
+        SELECT id_log FROM metricas_ejecucion GROUP BY id_log
+        HAVING COUNT(id_candidato) > 0 AND id_log NOT IN (
+            SELECT id_log FROM metricas_ejecucion GROUP BY id_log ORDER BY MAX(fecha) DESC LIMIT ?
+        )
+    """, (ejecuciones_detalle,))]
+    for id_log in viejas:
+        totales = conn.execute(
+            "SELECT id_log, NULL, etapa, SUM(segundos), SUM(llamadas), MAX(fecha) FROM metricas_ejecucion WHERE id_log = ? GROUP BY etapa",
+            (id_log,),
+        ).fetchall()
+        conn.execute("DELETE FROM metricas_ejecucion WHERE id_log = ?", (id_log,))
+        conn.executemany(
+            "INSERT INTO metricas_ejecucion (id_log, id_candidato, etapa, segundos, llamadas, fecha) VALUES (?, ?, ?, ?, ?, ?)", totales
+        )
+    return antes - conn.execute("SELECT COUNT(*) FROM metricas_ejecucion").fetchone()[0]
+
+
+def reporte(ejecuciones=10, top=10):
+    """Imprime las etapas y candidatos más lentos de las últimas `ejecuciones` registradas."""
+    from gnoticias.db_gnoticias import get_db_connection
+    with get_db_connection() as conn:
+        logs = [row[0] for row in conn.execute(
+            "SELECT id FROM log_ejecucion WHERE id IN (SELECT DISTINCT id_log FROM metricas_ejecucion) ORDER BY fecha_inicio DESC LIMIT ?",
+            (ejecuciones,),
+        )]
+        if not logs:
+            print("ℹ️ No hay métricas registradas.")
+            return
+        marcas = ",".join("?" * len(logs))
+        print(f"📊 Etapas ({len(logs)} ejecuciones):")
+        for etapa, segundos, llamadas in conn.execute(f"""
+            SELECT etapa, SUM(segundos), SUM(llamadas) FROM metricas_ejecucion
+            WHERE id_log IN ({marcas}) GROUP BY etapa ORDER BY SUM(segundos) DESC, SUM(llamadas) DESC
+        """, logs):
+            promedio = f"{segundos / llamadas * 1000:.1f} ms" if segundos and llamadas else "-"
+            print(f"  {etapa:<12} {segundos:>10.2f} s  {llamadas:>9} llamadas  {promedio:>10}/llamada")
+        print(f"🐢 Candidatos más lentos (top {top}):")
+        for id_candidato, nombre, segundos, etapa in conn.execute(f"""
+            SELECT m.id_candidato, c.nombre, SUM(m.segundos),
+                   (SELECT etapa FROM metricas_ejecucion m2 WHERE m2.id_candidato = m.id_candidato AND m2.id_log IN ({marcas})
+                    GROUP BY etapa ORDER BY SUM(segundos) DESC LIMIT 1)
+            FROM metricas_ejecucion m LEFT JOIN candidatos c ON c.id_candidato = m.id_candidato
+            WHERE m.id_log IN ({marcas}) AND m.id_candidato IS NOT NULL
+            GROUP BY m.id_candidato ORDER BY SUM(m.segundos) DESC LIMIT ?
+        """, logs + logs + [top]):
+            print(f"  {id_candidato:>6} {str(nombre):<30} {segundos:>8.2f} s  (etapa principal: {etapa})")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Reporte de etapas y candidatos más lentos.")
+    parser.add_argument("--ejecuciones", type=int, default=10, help="Cantidad de ejecuciones recientes a considerar.")
+    parser.add_argument("--top", type=int, default=10, help="Cantidad de candidatos a mostrar.")
+    args = parser.parse_args()
+    reporte(args.ejecuciones, args.top)
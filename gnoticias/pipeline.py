@@ -0,0 +1,363 @@
+"""Pipeline por etapas compartido por los extractores diario e histórico.
+
+    fetch → parse → filtro → decode → dedupe → escritura
+
+Cada etapa corre en sus propios hilos y se comunica con la siguiente por una cola acotada,
+así la decodificación (red) se solapa con el parseo y con las escrituras en SQLite. La unidad
+que viaja por las colas es un `Trabajo` (una consulta RSS); todos los trabajos llegan a la
+etapa de escritura, incluso los que fallan, y ahí se ejecuta su `al_terminar`.
+"""
+import hashlib
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from gnoticias import archivo
+from gnoticias.cache_urls import cache_urls
+from gnoticias.http_feeds import descargar_feed, parsear_feed
+from gnoticias.keywords import normalize_text
+from gnoticias.metricas import metricas
+from gnoticias.ritmo import ritmo_feeds
+
+# Zona horaria de Colombia
+COL_TZ = timezone(timedelta(hours=-5))
+
+# Trabajos en espera entre dos etapas (backpressure)
+TAMANO_COLA = 8
+WORKERS_FETCH_DEFAULT = 1
+WORKERS_DECODE_DEFAULT = 4
+# Trabajos en el pipeline a la vez cuando `ejecutar` no recibe `max_en_vuelo`; la entrada no
+# tiene tope propio porque las etapas también agregan trabajos (al dividir) y no deben bloquearse
+MAX_EN_VUELO_DEFAULT = 64
+
+# Máximo de entradas que Google News devuelve por consulta RSS
+LIMITE_ITEMS_FEED = 100
+# Fracción del tope a partir de la cual se asume que el feed quedó truncado
+UMBRAL_BISECCION = 0.9
+
+_FIN = object()
+
+
+def normalize_to_colombia_time(fecha_dt):
+    # Si fecha_dt NO tiene tzinfo, asumimos que viene en UTC (caso Google News)
+    if fecha_dt.tzinfo is None:
+        fecha_dt = fecha_dt.replace(tzinfo=timezone.utc)
+    # Convertimos a UTC-5
+    return fecha_dt.astimezone(COL_TZ)
+
+
+def fecha_publicacion(entry, fecha_defecto=None):
+    """Fecha de publicación de la entrada; si no la trae se usa `fecha_defecto`."""
+    published_parsed = entry.get("published_parsed")
+    if published_parsed:
+        try:
+            return datetime(*published_parsed[:6])
+        except Exception as e:
+            print(f"⚠️ Error al parsear fecha de entrada '{entry.get('title', '')}': {e}")
+    return fecha_defecto
+
+
+def process_feed_entry(entry, candidato_id, fecha_dt):
+    """Arma el dict preliminar de una entrada (sin decodificar la URL de Google News)."""
+    titulo = entry.get("title", "")
+    if " - " in titulo:
+        parts = titulo.rsplit(" - ", 1)
+        noticia = parts[0].strip()
+        medio = parts[1].strip()
+    else:
+        noticia = titulo.strip()
+        medio = "Desconocido"
+
+    # Normalizar timezone
+    fecha_local = normalize_to_colombia_time(fecha_dt)
+
+    # La URL de Google News se decodifica después del filtro de keywords y duplicados
+    google_news_url = entry.get("link", "")
+    if not google_news_url:
+        return None
+
+    entry_id = entry.get("id", google_news_url)
+    id_corto = hashlib.md5(entry_id.encode("utf-8")).hexdigest()
+
+    return {
+        "candidato_id": candidato_id,
+        "id": id_corto,
+        "noticia": noticia,
+        "medio": medio,
+        "fecha": fecha_local,   # <-- fecha final en Colombia
+        "source_href": entry.source.get("href", "") if hasattr(entry, "source") else "",
+        "ano": fecha_local.year,
+        "mes": fecha_local.month,
+        "dia": fecha_local.day,
+        "hora": fecha_local.hour,
+        "minuto": fecha_local.minute,
+        "dia_sem": fecha_local.weekday(),
+        "dia_ano": fecha_local.timetuple().tm_yday,
+        "link_google": google_news_url,
+        "id_largo": entry_id,
+    }
+
+
+class Trabajo:
+    """Una consulta RSS y lo que el pipeline necesita para procesarla.
+
+    - `candidatos`: ids a los que se atribuyen las noticias (por defecto solo `candidato_id`).
+    - `fecha_consulta`: None usa la fecha de publicación de cada entrada (modo diario); una fecha
+      la usa para todas (modo histórico por día), salvo que `usar_fecha_entrada` sea True.
+    - `al_terminar(trabajo, writer)`: se llama en la etapa de escritura, después de sus noticias.
+    - `dividir(trabajo, n_entradas)`: puede retornar trabajos nuevos que reemplazan a este.
+    - `peso`: fichas de `ritmo_feeds` que consume la consulta (1 = una solicitud normal).
+    - `archivado`: hash de un feed de `gnoticias.archivo`; se lee del disco en vez de descargarse.
+    """
+    def __init__(self, url, candidato_id, candidato_nombre=None, candidatos=None, etiqueta="hoy", log_id=None,
+                 fecha_consulta=None, usar_fecha_entrada=False, ventana=None, condicional=True, omitir_mal_formado=False,
+                 peso=1, al_terminar=None, dividir=None, archivado=None):
+        self.url = url
+        self.candidato_id = candidato_id
+        self.candidato_nombre = candidato_nombre
+        self.candidatos = set(candidatos) if candidatos else {candidato_id}
+        self.etiqueta = etiqueta
+        self.log_id = log_id
+        self.fecha_consulta = fecha_consulta
+        self.usar_fecha_entrada = usar_fecha_entrada
+        self.ventana = ventana
+        self.condicional = condicional
+        self.omitir_mal_formado = omitir_mal_formado
+        self.peso = peso
+        self.al_terminar = al_terminar
+        self.dividir = dividir
+        self.archivado = archivado
+        self.respuesta = None
+        self.entradas = []
+        self.noticias = []
+        self.error = None
+        self.dividido = False
+
+
+class _Etapa:
+    """Hilos que consumen trabajos de `entrada`, aplican `funcion` y los pasan a `salida`."""
+    def __init__(self, nombre, funcion, entrada, salida, workers):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.entrada = entrada
+        self.salida = salida
+        self.siguiente = None
+        self.funcion_final = None
+        self._vivos = workers
+        self._lock = threading.Lock()
+        self.hilos = [threading.Thread(target=self._correr, name=f"gnoticias-{nombre}-{i}", daemon=True) for i in range(workers)]
+
+    def _correr(self):
+        while True:
+            trabajo = self.entrada.get()
+            if trabajo is _FIN:
+                break
+            if trabajo.error is None and not trabajo.dividido:
+                try:
+                    with metricas.candidato(trabajo.candidato_id):
+                        self.funcion(trabajo)
+                except requests.exceptions.RequestException as e:
+                    print(f"❌ Error de red al obtener noticias: {e}")
+                    trabajo.error = e
+                except Exception as e:
+                    print(f"❌ Error inesperado al procesar feed ({self.nombre}): {e}")
+                    trabajo.error = e
+            if self.salida is not None:
+                self.salida.put(trabajo)
+            else:
+                self.funcion_final(trabajo)
+        with self._lock:
+            self._vivos -= 1
+            ultimo = self._vivos == 0
+        if ultimo and self.siguiente is not None:
+            for _ in self.siguiente.hilos:
+                self.salida.put(_FIN)
+
+
+class Pipeline:
+    """Pipeline de extracción sobre un `GnoticiasWriter` y un `MatcherKeywords` compartidos."""
+    def __init__(self, writer, matcher, atribucion_cruzada=False, workers_fetch=WORKERS_FETCH_DEFAULT,
+                 workers_decode=WORKERS_DECODE_DEFAULT, tamano_cola=TAMANO_COLA, archivar=False, resolver=None):
+        self.writer = writer
+        self.matcher = matcher
+        self.atribucion_cruzada = atribucion_cruzada
+        # Guardar cada feed descargado (y las URLs decodificadas de sus noticias) en gnoticias.archivo
+        self.archivar = archivar
+        # resolver(id_gnoticia, url_google, writer) -> URL de la noticia ("" para descartarla)
+        self.resolver = resolver or cache_urls.resolver
+        self._entrada = queue.Queue()
+        colas = [queue.Queue(maxsize=tamano_cola) for _ in range(5)]
+        self.etapas = [
+            _Etapa("fetch", self._fetch, self._entrada, colas[0], max(1, workers_fetch)),
+            _Etapa("parse", self._parse, colas[0], colas[1], 1),
+            _Etapa("filtro", self._filtrar, colas[1], colas[2], 1),
+            _Etapa("decode", self._decodificar, colas[2], colas[3], max(1, workers_decode)),
+            _Etapa("dedupe", self._deduplicar, colas[3], colas[4], 1),
+            _Etapa("escritura", self._escribir, colas[4], None, 1),
+        ]
+        for etapa, siguiente in zip(self.etapas, self.etapas[1:]):
+            etapa.siguiente = siguiente
+        self.etapas[-1].funcion_final = self._terminar
+        self._lock = threading.Lock()
+        self._libre = threading.Condition(self._lock)
+        self._activos = 0
+        self._cargados = False
+        self._cerrado = False
+
+    # ---- control ----
+    def agregar(self, trabajo):
+        """Agrega un trabajo a la entrada; se puede llamar desde cualquier etapa."""
+        with self._lock:
+            self._activos += 1
+        self._entrada.put(trabajo)
+
+    def _verificar_fin(self):
+        with self._lock:
+            if not self._cargados or self._activos or self._cerrado:
+                return
+            self._cerrado = True
+        for _ in self.etapas[0].hilos:
+            self._entrada.put(_FIN)
+
+    def ejecutar(self, trabajos, max_en_vuelo=None):
+        """Procesa todos los `trabajos` (y los que se agreguen al dividir) y retorna al terminar.
+
+        El siguiente trabajo se pide a `trabajos` recién cuando hay menos de `max_en_vuelo`
+        (por defecto MAX_EN_VUELO_DEFAULT) en el pipeline, así un generador largo no se
+        consume de entrada y uno que reclama candidatos de la cola reclama a medida que avanza.
+        Si `trabajos` falla, los trabajos en vuelo terminan antes de propagar el error.
+        """
+        for etapa in self.etapas:
+            for hilo in etapa.hilos:
+                hilo.start()
+        limite = max_en_vuelo or MAX_EN_VUELO_DEFAULT
+        trabajos = iter(trabajos)
+        try:
+            while True:
+                with self._libre:
+                    self._libre.wait_for(lambda: self._activos < limite)
+                trabajo = next(trabajos, None)
+                if trabajo is None:
+                    break
+                self.agregar(trabajo)
+        finally:
+            with self._lock:
+                self._cargados = True
+            self._verificar_fin()
+            for etapa in self.etapas:
+                for hilo in etapa.hilos:
+                    hilo.join()
+            cache_urls.cerrar()
+
+    # ---- etapas ----
+    def _fetch(self, trabajo):
+        if trabajo.archivado is not None:
+            print(f"\n📦 {trabajo.etiqueta} | URL: {trabajo.url}")
+            trabajo.respuesta = archivo.leer(trabajo.url, trabajo.archivado)
+            return
+        print(f"\n📅 {trabajo.etiqueta} | URL: {trabajo.url}")
+        trabajo.respuesta = descargar_feed(trabajo.url, condicional=trabajo.condicional, peso=trabajo.peso)
+        if self.archivar:
+            archivo.guardar(trabajo)
+
+    def _parse(self, trabajo):
+        if trabajo.respuesta.sin_cambios:
+            print(f"⏩ Feed sin cambios desde la última ejecución, se omite ({trabajo.etiqueta}).")
+            return
+        feed = parsear_feed(trabajo.respuesta)
+        if feed.bozo:
+            print(f"⚠️ Error al parsear el feed: {feed.bozo_exception}")
+            # XML mal formado suele ser una página de bloqueo: se frena el ritmo y se continúa
+            if trabajo.omitir_mal_formado and 'not well-formed' in str(feed.bozo_exception):
+                ritmo_feeds.penalizar("feed mal formado")
+                trabajo.error = feed.bozo_exception
+                return
+        if trabajo.dividir is not None:
+            nuevos = trabajo.dividir(trabajo, len(feed.entries))
+            if nuevos:
+                trabajo.dividido = True
+                for nuevo in nuevos:
+                    self.agregar(nuevo)
+                return
+        trabajo.entradas = feed.entries
+
+    def _filtrar(self, trabajo):
+        con_keywords = any(self.matcher.tiene_keywords(c) for c in trabajo.candidatos)
+        if trabajo.entradas and not con_keywords and not self.atribucion_cruzada:
+            print(f"⏩ Omitidas {len(trabajo.entradas)} entradas por falta de keywords para el candidato: {trabajo.candidato_nombre}")
+            return
+        for entry in trabajo.entradas:
+            if trabajo.fecha_consulta is None:
+                fecha_dt = fecha_publicacion(entry)
+                if fecha_dt is None:
+                    print(f"⚠️ Entrada sin fecha publicada, omitiendo: {entry.get('title', '')}")
+                    continue
+            elif trabajo.usar_fecha_entrada:
+                fecha_dt = fecha_publicacion(entry, trabajo.fecha_consulta)
+            else:
+                fecha_dt = trabajo.fecha_consulta
+            prelim = process_feed_entry(entry, trabajo.candidato_id, fecha_dt)
+            if not prelim:
+                continue
+            with metricas.etapa("keywords"):
+                mencionados = self.matcher.candidatos_en(normalize_text(prelim["noticia"]))
+            destinos = mencionados if self.atribucion_cruzada else mencionados & trabajo.candidatos
+            if not destinos:
+                print(f"⏩ Omitida por no contener keywords: {prelim['noticia']}")
+                continue
+            nuevos = sorted(c for c in destinos if not self.writer.existe(prelim["id"], c))
+            if not nuevos:
+                print(f"⚠️ Duplicada en gnoticias (omitida): {prelim['noticia']}")
+                continue
+            trabajo.noticias.append((prelim, nuevos))
+        trabajo.entradas = []
+
+    def _decodificar(self, trabajo):
+        # Solo las noticias nuevas y relevantes pasan por el decodificador
+        decodificadas, urls = [], []
+        for prelim, nuevos in trabajo.noticias:
+            link_google = prelim.pop("link_google")
+            prelim["link"] = self.resolver(prelim["id"], link_google, self.writer)
+            if prelim["link"]:
+                decodificadas.append((prelim, nuevos))
+                if prelim["link"] != link_google:
+                    urls.append((prelim["id"], prelim["link"]))
+        trabajo.noticias = decodificadas
+        if self.archivar and urls:
+            archivo.guardar_urls(urls)
+
+    def _deduplicar(self, trabajo):
+        # Otro trabajo en vuelo pudo haber guardado la misma noticia mientras esta se decodificaba
+        vigentes = []
+        for prelim, nuevos in trabajo.noticias:
+            nuevos = [c for c in nuevos if not self.writer.existe(prelim["id"], c)]
+            if nuevos:
+                vigentes.append((prelim, nuevos))
+        trabajo.noticias = vigentes
+
+    def _escribir(self, trabajo):
+        for prelim, nuevos in trabajo.noticias:
+            for destino_id in nuevos:
+                if destino_id == trabajo.candidato_id and len(trabajo.candidatos) == 1:
+                    print(f"-> Relevante. Guardando noticia: {prelim['noticia']}")
+                elif destino_id in trabajo.candidatos:
+                    print(f"-> Relevante. Guardando noticia (candidato {destino_id}): {prelim['noticia']}")
+                else:
+                    print(f"-> Relevante también para candidato {destino_id}: {prelim['noticia']}")
+                self.writer.agregar(dict(prelim, candidato_id=destino_id, id_log=trabajo.log_id))
+        trabajo.noticias = []
+
+    def _terminar(self, trabajo):
+        try:
+            if trabajo.al_terminar is not None:
+                with metricas.candidato(trabajo.candidato_id):
+                    trabajo.al_terminar(trabajo, self.writer)
+        except Exception as e:
+            print(f"❌ Error al cerrar el trabajo {trabajo.etiqueta} del candidato {trabajo.candidato_id}: {e}")
+        finally:
+            with self._lock:
+                self._activos -= 1
+                self._libre.notify_all()
+            self._verificar_fin()
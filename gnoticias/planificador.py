@@ -0,0 +1,137 @@
+"""Planificación de las consultas diarias según la actividad de cada candidato.
+
+En vez de consultar a todos los candidatos con `when:1d` en cada ejecución, el planificador
+guarda en `planificacion_candidatos` la hora de la última consulta exitosa de cada uno y su
+tasa reciente de noticias (de `rollup_candidato_dia`, últimos DIAS_TASA días). Con eso:
+
+- decide si el candidato toca en esta ejecución: el intervalo entre consultas es el tiempo
+  en que se esperan NOTICIAS_POR_CONSULTA noticias nuevas, entre INTERVALO_MIN_HORAS e
+  INTERVALO_MAX_HORAS (los candidatos sin cobertura se consultan cada INTERVALO_MAX_HORAS);
+- arma la ventana `when:` más corta que cubre desde la última consulta exitosa (más
+  MARGEN_HORAS, porque Google News indexa con retraso).
+"""
+import math
+from datetime import datetime, timedelta
+
+from gnoticias.db_gnoticias import get_db_connection
+
+# Días hacia atrás con los que se calcula la tasa de noticias
+DIAS_TASA = 14
+# Noticias nuevas que se esperan por consulta (define el intervalo entre consultas)
+NOTICIAS_POR_CONSULTA = 20
+# Límites del intervalo entre consultas de un candidato
+INTERVALO_MIN_HORAS = 0
+INTERVALO_MAX_HORAS = 48
+# Las ejecuciones no caen a horas exactas: un candidato toca si le faltan menos de esto
+TOLERANCIA_HORAS = 2
+# Solapamiento de la ventana con la consulta anterior
+MARGEN_HORAS = 1
+# Ventana de los candidatos sin consulta registrada, y ventana máxima
+VENTANA_DEFAULT = "1d"
+VENTANA_MAX_DIAS = 7
+
+SQL_CREAR_PLANIFICACION = """
+    CREATE TABLE IF NOT EXISTS estado.planificacion_candidatos (
+        id_candidato INTEGER PRIMARY KEY,
+        ultima_consulta TEXT,
+        tasa_diaria REAL,
+        proxima_consulta TEXT
+    )
+"""
+
+
+def asegurar_tabla_planificacion():
+    """Crea la tabla `planificacion_candidatos` si no existe."""
+    with get_db_connection() as conn:
+        conn.execute(SQL_CREAR_PLANIFICACION)
+        conn.commit()
+
+
+def formato_ventana(horas):
+    """Ventana `when:` de Google News que cubre `horas` (en horas hasta un día, luego en días)."""
+    horas = max(1, math.ceil(horas))
+    if horas <= 24:
+        return f"{horas}h"
+    return f"{min(math.ceil(horas / 24), VENTANA_MAX_DIAS)}d"
+
+
+def horas_ventana(ventana):
+    """Horas que cubre una ventana `when:` ("5h", "3d")."""
+    return int(ventana[:-1]) * (24 if ventana.endswith("d") else 1)
+
+
+class Planificador:
+    """Decide qué candidatos se consultan en esta ejecución y con qué ventana `when:`."""
+    def __init__(self, ahora=None):
+        self.ahora = ahora or datetime.now()
+        self.estado = {}
+        self.tasas = {}
+        self.omitidos = 0
+        self.consultados = 0
+
+    def cargar(self, candidato_ids):
+        """Lee la última consulta de cada candidato y calcula su tasa de noticias por día."""
+        from gnoticias.shards import conectar
+
+        asegurar_tabla_planificacion()
+        ids = set(candidato_ids)
+        with get_db_connection() as conn:
+            for candidato_id, ultima in conn.execute("SELECT id_candidato, ultima_consulta FROM planificacion_candidatos"):
+                if candidato_id in ids and ultima:
+                    self.estado[candidato_id] = datetime.fromisoformat(ultima)
+        desde = self.ahora - timedelta(days=DIAS_TASA)
+        with conectar() as conn:
+            filas = conn.execute(
+                "SELECT id_candidato, SUM(noticias) FROM rollup_candidato_dia WHERE (ano, mes, dia) >= (?, ?, ?) GROUP BY id_candidato",
+                (desde.year, desde.month, desde.day),
+            ).fetchall()
+        self.tasas = {candidato_id: total / DIAS_TASA for candidato_id, total in filas if candidato_id in ids}
+        return self
+
+    def intervalo(self, candidato_id):
+        """Horas entre consultas del candidato según su tasa."""
+        tasa = self.tasas.get(candidato_id, 0)
+        if tasa <= 0:
+            return INTERVALO_MAX_HORAS
+        return min(max(24 * NOTICIAS_POR_CONSULTA / tasa, INTERVALO_MIN_HORAS), INTERVALO_MAX_HORAS)
+
+    def toca(self, candidato_id):
+        ultima = self.estado.get(candidato_id)
+        if ultima is None:
+            return True
+        transcurridas = (self.ahora - ultima).total_seconds() / 3600
+        return transcurridas + TOLERANCIA_HORAS >= self.intervalo(candidato_id)
+
+    def ventana(self, candidato_ids):
+        """Ventana `when:` que cubre la última consulta de todos los candidatos de un lote."""
+        ultimas = [self.estado.get(candidato_id) for candidato_id in candidato_ids]
+        if any(ultima is None for ultima in ultimas):
+            return VENTANA_DEFAULT
+        horas = (self.ahora - min(ultimas)).total_seconds() / 3600 + MARGEN_HORAS
+        if horas > VENTANA_MAX_DIAS * 24:
+            print(f"⚠️ Candidatos {candidato_ids}: {horas / 24:.1f} días sin consulta, la ventana se limita a {VENTANA_MAX_DIAS}d.")
+        return formato_ventana(horas)
+
+    def planificar(self, candidatos):
+        """Separa [(id, nombre, ...)] en (a consultar, omitidos); los primeros van ordenados por ventana."""
+        consultar, omitidos = [], []
+        for candidato in candidatos:
+            (consultar if self.toca(candidato[0]) else omitidos).append(candidato)
+        # Candidatos con ventanas parecidas quedan en los mismos lotes
+        consultar.sort(key=lambda candidato: (horas_ventana(self.ventana([candidato[0]])), candidato[0]))
+        self.consultados, self.omitidos = len(consultar), len(omitidos)
+        return consultar, omitidos
+
+    def registrar(self, writer, candidato_ids):
+        """Encola en el writer la consulta exitosa de los candidatos (hora de inicio de la ejecución)."""
+        for candidato_id in candidato_ids:
+            proxima = self.ahora + timedelta(hours=self.intervalo(candidato_id))
+            writer.agregar_sentencia(
+                "INSERT INTO planificacion_candidatos (id_candidato, ultima_consulta, tasa_diaria, proxima_consulta) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (id_candidato) DO UPDATE SET ultima_consulta = excluded.ultima_consulta, "
+                "tasa_diaria = excluded.tasa_diaria, proxima_consulta = excluded.proxima_consulta",
+                (candidato_id, self.ahora.isoformat(), self.tasas.get(candidato_id, 0), proxima.isoformat()),
+            )
+
+    def resumen(self):
+        return f"Planificador: {self.consultados} candidatos consultados, {self.omitidos} omitidos hasta su próxima consulta"
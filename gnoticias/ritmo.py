@@ -0,0 +1,100 @@
+"""Control adaptativo del ritmo de solicitudes a Google News (token bucket con AIMD).
+
+Cada gobernador reparte fichas a `tasa` por segundo entre todos los hilos del proceso (los
+workers de fetch y decode de ambos scripts comparten las instancias de este módulo):
+
+- `esperar(peso)` bloquea hasta que haya `peso` fichas; las consultas "caras" (p. ej. las de
+  cambio de mes del histórico) piden más fichas en vez de dormir una pausa fija;
+- `exito()` sube la tasa en INCREMENTO_TASA (aumento aditivo) hasta `tasa_max`;
+- `penalizar(motivo)` la multiplica por FACTOR_REDUCCION (disminución multiplicativa) y frena
+  a todos los hilos durante ESPERA_PENALIZACION segundos con jitter, o lo que pida el
+  encabezado Retry-After.
+"""
+import random
+import threading
+import time
+
+from gnoticias.metricas import metricas
+
+# Fichas por segundo que se suman tras cada respuesta limpia
+INCREMENTO_TASA = 0.1
+# Factor que se aplica a la tasa ante una señal de bloqueo (429, feed mal formado, decoder)
+FACTOR_REDUCCION = 0.5
+# Segundos de espera tras una penalización (se multiplica por un jitter entre 0.5 y 1.5)
+ESPERA_PENALIZACION = 15
+# Tope de Retry-After que se respeta
+MAX_RETRY_AFTER = 300
+# Fichas acumulables (ráfaga máxima tras un rato sin solicitudes)
+CAPACIDAD = 2
+
+
+class GobernadorRitmo:
+    """Token bucket compartido entre hilos cuya tasa se ajusta con AIMD."""
+    def __init__(self, nombre, tasa_inicial, tasa_min, tasa_max, capacidad=CAPACIDAD):
+        self.nombre = nombre
+        self.tasa_inicial = tasa_inicial
+        self.tasa_min = tasa_min
+        self.tasa_max = tasa_max
+        self.capacidad = capacidad
+        # El benchmark y las pruebas offline lo desactivan
+        self.activo = True
+        self._lock = threading.Lock()
+        self.tasa = tasa_inicial
+        self._fichas = capacidad
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self.reiniciar_estadisticas()
+
+    def reiniciar_estadisticas(self):
+        self.solicitudes = 0
+        self.penalizaciones = 0
+        self.segundos_espera = 0.0
+
+    def _rellenar(self, ahora):
+        self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def esperar(self, peso=1):
+        """Reserva `peso` fichas y duerme lo necesario; la deuda la pagan también los siguientes."""
+        if not self.activo:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            self._rellenar(ahora)
+            self._fichas -= peso
+            espera = max(-self._fichas / self.tasa, self._pausa_hasta - ahora, 0.0)
+            self.solicitudes += 1
+            self.segundos_espera += espera
+        if espera > 0:
+            with metricas.etapa("ritmo"):
+                time.sleep(espera)
+
+    def exito(self):
+        with self._lock:
+            self.tasa = min(self.tasa_max, self.tasa + INCREMENTO_TASA)
+
+    def penalizar(self, motivo, retry_after=None):
+        """Reduce la tasa a la mitad y pausa a todos los hilos (con jitter, o `retry_after` segundos)."""
+        espera = ESPERA_PENALIZACION * random.uniform(0.5, 1.5)
+        if retry_after is not None:
+            try:
+                espera = min(float(retry_after), MAX_RETRY_AFTER)
+            except (TypeError, ValueError):
+                pass
+        with self._lock:
+            self.tasa = max(self.tasa_min, self.tasa * FACTOR_REDUCCION)
+            self.penalizaciones += 1
+            if self.activo:
+                self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + espera)
+            tasa = self.tasa
+        print(f"⏸️ Ritmo {self.nombre}: {motivo}; tasa reducida a {tasa:.2f}/s y pausa de {espera:.0f}s.")
+
+    def resumen(self):
+        return (f"ritmo {self.nombre} solicitudes={self.solicitudes};penalizaciones={self.penalizaciones};"
+                f"espera={self.segundos_espera:.1f}s;tasa={self.tasa:.2f}/s")
+
+
+# Feeds RSS: 0.5/s reproduce la pausa de 2 s entre días del histórico al arrancar
+ritmo_feeds = GobernadorRitmo("feeds", tasa_inicial=0.5, tasa_min=0.05, tasa_max=5)
+# gnewsdecoder también consulta news.google.com (antes: 1 s después de cada noticia guardada)
+ritmo_decoder = GobernadorRitmo("decoder", tasa_inicial=1, tasa_min=0.1, tasa_max=10)
@@ -0,0 +1,173 @@
+"""Conteos agregados de `gnoticias` mantenidos por triggers.
+
+- `rollup_candidato_dia`: noticias por (id_candidato, ano, mes, dia).
+- `rollup_candidato_medio`: noticias por (id_candidato, medio).
+
+Los triggers de INSERT/DELETE/UPDATE sobre `gnoticias` los actualizan en la misma transacción
+que la escritura (writer o compactación de shards). Cada shard
+tiene sus propios rollups, así que la compactación no necesita corregirlos; `conectar()` de
+gnoticias.shards expone vistas con la suma de la base y los shards. Para regenerarlos:
+
+    python -m gnoticias.rollups --reconstruir
+"""
+import sqlite3
+
+SQL_ROLLUPS = (
+    """
+    CREATE TABLE IF NOT EXISTS {esquema}.rollup_candidato_dia (
+        id_candidato INTEGER NOT NULL,
+        ano INTEGER NOT NULL,
+        mes INTEGER NOT NULL,
+        dia INTEGER NOT NULL,
+        noticias INTEGER NOT NULL,
+        PRIMARY KEY (id_candidato, ano, mes, dia)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {esquema}.rollup_candidato_medio (
+        id_candidato INTEGER NOT NULL,
+        medio TEXT NOT NULL,
+        noticias INTEGER NOT NULL,
+        PRIMARY KEY (id_candidato, medio)
+    ) WITHOUT ROWID
+    """,
+    # Filas sin fecha o sin medio se cuentan en el día 0000-00-00 y el medio ''
+    """
+    CREATE TRIGGER IF NOT EXISTS {esquema}.trg_gnoticias_rollup_insert AFTER INSERT ON gnoticias BEGIN
+        INSERT INTO rollup_candidato_dia (id_candidato, ano, mes, dia, noticias)
+        VALUES (NEW.id_candidato, COALESCE(NEW.ano, 0), COALESCE(NEW.mes, 0), COALESCE(NEW.dia, 0), 1)
+        ON CONFLICT (id_candidato, ano, mes, dia) DO UPDATE SET noticias = noticias + 1;
+        INSERT INTO rollup_candidato_medio (id_candidato, medio, noticias)
+        VALUES (NEW.id_candidato, COALESCE(NEW.medio, ''), 1)
+        ON CONFLICT (id_candidato, medio) DO UPDATE SET noticias = noticias + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {esquema}.trg_gnoticias_rollup_delete AFTER DELETE ON gnoticias BEGIN
+        UPDATE rollup_candidato_dia SET noticias = noticias - 1
+        WHERE id_candidato = OLD.id_candidato AND ano = COALESCE(OLD.ano, 0) AND mes = COALESCE(OLD.mes, 0) AND dia = COALESCE(OLD.dia, 0);
+        UPDATE rollup_candidato_medio SET noticias = noticias - 1
+        WHERE id_candidato = OLD.id_candidato AND medio = COALESCE(OLD.medio, '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {esquema}.trg_gnoticias_rollup_update AFTER UPDATE OF id_candidato, medio, fecha ON gnoticias BEGIN
+        UPDATE rollup_candidato_dia SET noticias = noticias - 1
+        WHERE id_candidato = OLD.id_candidato AND ano = COALESCE(OLD.ano, 0) AND mes = COALESCE(OLD.mes, 0) AND dia = COALESCE(OLD.dia, 0);
+        UPDATE rollup_candidato_medio SET noticias = noticias - 1
+        WHERE id_candidato = OLD.id_candidato AND medio = COALESCE(OLD.medio, '');
+        INSERT INTO rollup_candidato_dia (id_candidato, ano, mes, dia, noticias)
+        VALUES (NEW.id_candidato, COALESCE(NEW.ano, 0), COALESCE(NEW.mes, 0), COALESCE(NEW.dia, 0), 1)
+        ON CONFLICT (id_candidato, ano, mes, dia) DO UPDATE SET noticias = noticias + 1;
+        INSERT INTO rollup_candidato_medio (id_candidato, medio, noticias)
+        VALUES (NEW.id_candidato, COALESCE(NEW.medio, ''), 1)
+        ON CONFLICT (id_candidato, medio) DO UPDATE SET noticias = noticias + 1;
+    END
+    """,
+)
+
+# Vistas temporales (base + shards) que crea gnoticias.shards.adjuntar_shards
+VISTAS_ROLLUPS = {
+    "rollup_candidato_dia": ("id_candidato, ano, mes, dia", "id_candidato, ano, mes, dia"),
+    "rollup_candidato_medio": ("id_candidato, medio", "id_candidato, medio"),
+}
+
+
+def crear_rollups(conn, esquema="main"):
+    """Crea las tablas y triggers de rollups en `esquema`; retorna True si las tablas no existían."""
+    existia = conn.execute(
+        f"SELECT 1 FROM {esquema}.sqlite_master WHERE type = 'table' AND name = 'rollup_candidato_dia'"
+    ).fetchone() is not None
+    for sql in SQL_ROLLUPS:
+        conn.execute(sql.format(esquema=esquema))
+    return not existia
+
+
+def recalcular(conn, esquema="main"):
+    """Regenera los rollups de `esquema` desde su tabla `gnoticias` (sin abrir transacción propia)."""
+    conn.execute(f"DELETE FROM {esquema}.rollup_candidato_dia")
+    conn.execute(f"DELETE FROM {esquema}.rollup_candidato_medio")
+    conn.execute(f"""
+        INSERT INTO {esquema}.rollup_candidato_dia (id_candidato, ano, mes, dia, noticias)
+        SELECT id_candidato, COALESCE(ano, 0), COALESCE(mes, 0), COALESCE(dia, 0), COUNT(*)
+        FROM {esquema}.gnoticias GROUP BY 1, 2, 3, 4
+    """)
+    conn.execute(f"""
+        INSERT INTO {esquema}.rollup_candidato_medio (id_candidato, medio, noticias)
+        SELECT id_candidato, COALESCE(medio, ''), COUNT(*) FROM {esquema}.gnoticias GROUP BY 1, 2
+    """)
+
+
+def sql_vista(nombre, esquemas):
+    """CREATE TEMP VIEW `nombre` con la suma de los rollups de todos los `esquemas`."""
+    columnas, grupo = VISTAS_ROLLUPS[nombre]
+    union = " UNION ALL ".join(f"SELECT {columnas}, noticias FROM {esquema}.{nombre}" for esquema in esquemas)
+    return f"CREATE TEMP VIEW {nombre} AS SELECT {columnas}, SUM(noticias) AS noticias FROM ({union}) GROUP BY {grupo}"
+
+
+def reconstruir(db_path=None):
+    """Regenera desde cero los rollups de la base principal y de cada shard."""
+    import gnoticias.db_gnoticias as db_gnoticias
+    from gnoticias.shards import listar_shards
+
+    ruta = db_path or db_gnoticias.DB_PATH
+    db_gnoticias.asegurar_esquema(ruta)
+    for archivo in [ruta] + listar_shards(ruta):
+        conn = sqlite3.connect(archivo, timeout=30)
+        try:
+            with conn:
+                crear_rollups(conn)
+                recalcular(conn)
+            total = conn.execute("SELECT COALESCE(SUM(noticias), 0) FROM rollup_candidato_dia").fetchone()[0]
+            print(f"✅ Rollups reconstruidos en {archivo}: {total} noticias.")
+        finally:
+            conn.close()
+
+
+def noticias_por_dia(candidato_id, desde=None, hasta=None, db_path=None):
+    """[(YYYY-MM-DD, noticias)] del candidato, opcionalmente entre `desde` y `hasta` (datetime/date)."""
+    from gnoticias.shards import conectar
+
+    condiciones, parametros = ["id_candidato = ?"], [candidato_id]
+    if desde is not None:
+        condiciones.append("(ano, mes, dia) >= (?, ?, ?)")
+        parametros += [desde.year, desde.month, desde.day]
+    if hasta is not None:
+        condiciones.append("(ano, mes, dia) <= (?, ?, ?)")
+        parametros += [hasta.year, hasta.month, hasta.day]
+    with conectar(db_path) as conn:
+        filas = conn.execute(
+            f"SELECT ano, mes, dia, noticias FROM rollup_candidato_dia WHERE {' AND '.join(condiciones)} AND noticias > 0 ORDER BY ano, mes, dia",
+            parametros,
+        ).fetchall()
+    return [(f"{ano:04d}-{mes:02d}-{dia:02d}", noticias) for ano, mes, dia, noticias in filas]
+
+
+def noticias_por_medio(candidato_id, top=20, db_path=None):
+    """[(medio, noticias)] del candidato, de mayor a menor."""
+    from gnoticias.shards import conectar
+
+    with conectar(db_path) as conn:
+        filas = conn.execute(
+            "SELECT medio, noticias FROM rollup_candidato_medio WHERE id_candidato = ? AND noticias > 0 ORDER BY noticias DESC LIMIT ?",
+            (candidato_id, top),
+        ).fetchall()
+    return [(medio, noticias) for medio, noticias in filas]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Rollups de noticias por candidato/día y candidato/medio.")
+    parser.add_argument("--reconstruir", action="store_true", help="Regenerar los rollups desde gnoticias.")
+    parser.add_argument("--candidato", type=int, help="Mostrar los conteos de este candidato.")
+    parser.add_argument("--top", type=int, default=20, help="Medios a mostrar con --candidato.")
+    args = parser.parse_args()
+    if args.reconstruir:
+        reconstruir()
+    if args.candidato is not None:
+        print(f"📅 Noticias por día del candidato {args.candidato}:")
+        for fecha, noticias in noticias_por_dia(args.candidato):
+            print(f"  {fecha}  {noticias:>6}")
+        print(f"📰 Medios del candidato {args.candidato}:")
+        for medio, noticias in noticias_por_medio(args.candidato, args.top):
+            print(f"  {medio:<40} {noticias:>6}")
@@ -0,0 +1,87 @@
+"""Parser liviano para los feeds RSS de Google News.
+
+Recorre el XML con `xml.etree.ElementTree.iterparse` y de cada `<item>` guarda solo lo que
+usa el pipeline (title, link, guid, pubDate y source) en objetos con `__slots__`, liberando
+cada item apenas se procesa. Las entradas responden a `entry.get(...)` y `entry.source` igual
+que las de feedparser. Si el contenido no es un RSS 2.0 bien formado se usa `feedparser.parse`,
+así los feeds raros o las páginas de bloqueo se siguen reportando con `bozo`.
+"""
+import io
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+
+import feedparser
+
+
+class EntradaRss:
+    """Entrada de un feed; los campos que el item no trae quedan sin asignar (como en feedparser)."""
+    __slots__ = ("title", "link", "id", "published", "source", "_published_parsed")
+
+    def get(self, clave, defecto=None):
+        if clave == "published_parsed":
+            return self.published_parsed
+        return getattr(self, clave, defecto) if clave in self.__slots__ else defecto
+
+    @property
+    def published_parsed(self):
+        """pubDate como `time.struct_time` en UTC (se calcula al pedirla), o None."""
+        try:
+            return self._published_parsed
+        except AttributeError:
+            pass
+        resultado = None
+        try:
+            resultado = parsedate_to_datetime(self.published).utctimetuple()
+        except (AttributeError, TypeError, ValueError, IndexError):
+            pass
+        self._published_parsed = resultado
+        return resultado
+
+
+class FeedRss:
+    __slots__ = ("entries", "bozo", "bozo_exception")
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.bozo = False
+        self.bozo_exception = None
+
+
+def _texto(elemento):
+    return (elemento.text or "").strip()
+
+
+def parsear(contenido):
+    """Parsea un RSS de Google News; ante cualquier sorpresa delega en `feedparser.parse`."""
+    entradas = []
+    try:
+        eventos = ET.iterparse(io.BytesIO(contenido), events=("start", "end"))
+        _, raiz = next(eventos)
+        if raiz.tag != "rss":
+            return feedparser.parse(contenido)
+        canal = raiz
+        for evento, elemento in eventos:
+            if evento == "start":
+                if elemento.tag == "channel":
+                    canal = elemento
+                continue
+            if elemento.tag != "item":
+                continue
+            entrada = EntradaRss()
+            for hijo in elemento:
+                if hijo.tag == "title":
+                    entrada.title = _texto(hijo)
+                elif hijo.tag == "link":
+                    entrada.link = _texto(hijo)
+                elif hijo.tag == "guid":
+                    entrada.id = _texto(hijo)
+                elif hijo.tag == "pubDate":
+                    entrada.published = _texto(hijo)
+                elif hijo.tag == "source":
+                    entrada.source = {"href": hijo.get("url", ""), "title": _texto(hijo)}
+            entradas.append(entrada)
+            # Los items ya leídos no se acumulan en el árbol
+            canal.clear()
+    except (ET.ParseError, StopIteration):
+        return feedparser.parse(contenido)
+    return FeedRss(entradas)
@@ -0,0 +1,201 @@
+"""Almacenamiento de `gnoticias` en shards mensuales (modo `--shards`).
+
+En este modo el escritor inserta las noticias nuevas en un archivo chico por mes,
+`data/shards/gnoticias_YYYY-MM.db`, en vez de la tabla `gnoticias` de la base principal;
+así cada ejecución de los workflows cambia un blob pequeño y no todo `gnoticias.db`.
+Las marcas de candidatos, logs y cachés van en la base de estado (ver db_gnoticias.ruta_estado),
+así que con shards la base principal solo cambia al compactar.
+
+Para leer, `conectar()` adjunta los shards y crea una vista temporal `gnoticias` que une la
+base con los shards, de modo que las consultas de siempre ven una sola tabla lógica. Leer no
+modifica ningún archivo: el esquema de los shards lo actualiza `migrar_shards()` (desde
+db_gnoticias.migrar). Si hay más shards de los que SQLite deja adjuntar, los más antiguos se
+unen en una base en memoria para esa conexión. `compactar()` mueve a la base los shards de
+meses anteriores:
+
+    python -m gnoticias.shards --compactar
+"""
+import glob
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+import gnoticias.db_gnoticias as db_gnoticias
+from gnoticias.busqueda import crear_fts, indexar
+from gnoticias.db_gnoticias import COLUMNAS_FECHA_GENERADAS, COLUMNAS_GNOTICIAS, asegurar_esquema, reconstruir_gnoticias, sql_crear_gnoticias
+from gnoticias.rollups import VISTAS_ROLLUPS, crear_rollups, recalcular, sql_vista
+
+# Carpeta de los shards, relativa a la carpeta de la base principal
+DIRECTORIO_SHARDS = "shards"
+# SQLite admite 10 bases adjuntas por conexión; una es la base de estado
+MAX_SHARDS_ADJUNTOS = 9
+# Base en memoria donde se unen los shards que no caben, y esquema para copiarlos
+ESQUEMA_RESTO = "resto"
+ESQUEMA_COPIA = "copia"
+
+_COLUMNAS = ", ".join([columna for columna, _ in COLUMNAS_GNOTICIAS] + list(COLUMNAS_FECHA_GENERADAS))
+
+
+def directorio_shards(db_path=None):
+    return os.path.join(os.path.dirname(db_path or db_gnoticias.DB_PATH), DIRECTORIO_SHARDS)
+
+
+def ruta_shard(db_path=None, fecha=None):
+    """Ruta del shard del mes de `fecha` (por defecto, el mes en curso)."""
+    return os.path.join(directorio_shards(db_path), f"gnoticias_{(fecha or datetime.now()).strftime('%Y-%m')}.db")
+
+
+def listar_shards(db_path=None):
+    return sorted(glob.glob(os.path.join(directorio_shards(db_path), "gnoticias_*.db")))
+
+
+def migrar_shard(conn, esquema="main"):
+    """Lleva la tabla `gnoticias` de `esquema` (un shard) al esquema actual, con sus rollups e
+    índice de búsqueda (sin abrir transacción propia)."""
+    conn.execute(sql_crear_gnoticias(f"{esquema}.gnoticias"))
+    # Shards creados antes de `id_fila` (sus triggers se recrean abajo)
+    reconstruir_gnoticias(conn, esquema)
+    # Shards creados antes de que se agregara alguna columna
+    existentes = {fila[1] for fila in conn.execute(f"PRAGMA {esquema}.table_xinfo(gnoticias)")}
+    for columna, tipo in COLUMNAS_GNOTICIAS:
+        if columna not in existentes:
+            conn.execute(f"ALTER TABLE {esquema}.gnoticias ADD COLUMN {columna} {tipo}")
+    # Cada shard lleva sus propios rollups e índice de búsqueda, mantenidos por sus triggers
+    if crear_rollups(conn, esquema):
+        recalcular(conn, esquema)
+    if crear_fts(conn, esquema):
+        indexar(conn, esquema)
+
+
+def migrar_shards(db_path=None):
+    """Aplica `migrar_shard` a cada shard de la base `db_path`."""
+    for ruta in listar_shards(db_path):
+        conn = sqlite3.connect(ruta, timeout=30)
+        try:
+            with conn:
+                migrar_shard(conn)
+        finally:
+            conn.close()
+
+
+def _unir_en_memoria(conn, rutas):
+    """Adjunta una base en memoria `resto` con las noticias (y sus rollups e índice) de `rutas`."""
+    conn.execute(f"ATTACH DATABASE ':memory:' AS {ESQUEMA_RESTO}")
+    # Cada paso cierra su transacción: no se puede adjuntar ni separar bases dentro de una
+    with conn:
+        migrar_shard(conn, ESQUEMA_RESTO)
+    columnas = ", ".join(columna for columna, _ in COLUMNAS_GNOTICIAS)
+    for ruta in rutas:
+        conn.execute(f"ATTACH DATABASE ? AS {ESQUEMA_COPIA}", (ruta,))
+        try:
+            # `id_fila` se renumera: los de shards distintos pueden repetirse
+            with conn:
+                conn.execute(f"INSERT OR IGNORE INTO {ESQUEMA_RESTO}.gnoticias ({columnas}) SELECT {columnas} FROM {ESQUEMA_COPIA}.gnoticias")
+        finally:
+            conn.execute(f"DETACH DATABASE {ESQUEMA_COPIA}")
+
+
+def adjuntar_shards(conn, db_path=None, escritura=False):
+    """Adjunta los shards a `conn` y crea las vistas temporales `gnoticias` y de rollups (base + shards).
+
+    Con `escritura` el shard del mes en curso se crea si falta y queda adjunto como `delta`;
+    es el único archivo que se modifica. Retorna la ruta de ese shard, o None.
+    """
+    rutas = listar_shards(db_path)
+    actual = None
+    if escritura:
+        actual = ruta_shard(db_path)
+        os.makedirs(os.path.dirname(actual), exist_ok=True)
+        if actual not in rutas:
+            rutas.append(actual)
+    consultas = [f"SELECT {_COLUMNAS} FROM main.gnoticias"]
+    esquemas = ["main"]
+    if len(rutas) > MAX_SHARDS_ADJUNTOS:
+        # Los más antiguos se unen en uno; el del mes en curso siempre queda adjunto
+        antiguos, rutas = rutas[:-(MAX_SHARDS_ADJUNTOS - 1)], rutas[-(MAX_SHARDS_ADJUNTOS - 1):]
+        print(f"⚠️ {len(antiguos)} shards unidos en memoria (máximo {MAX_SHARDS_ADJUNTOS} adjuntos); ejecute `python -m gnoticias.shards --compactar`.")
+        _unir_en_memoria(conn, antiguos)
+        consultas.append(f"SELECT {_COLUMNAS} FROM {ESQUEMA_RESTO}.gnoticias")
+        esquemas.append(ESQUEMA_RESTO)
+    for i, ruta in enumerate(rutas):
+        esquema = "delta" if ruta == actual else f"shard{i}"
+        conn.execute(f"ATTACH DATABASE ? AS {esquema}", (ruta,))
+        if esquema == "delta":
+            with conn:
+                migrar_shard(conn, esquema)
+        consultas.append(f"SELECT {_COLUMNAS} FROM {esquema}.gnoticias")
+        esquemas.append(esquema)
+    conn.execute("DROP VIEW IF EXISTS temp.gnoticias")
+    conn.execute("CREATE TEMP VIEW gnoticias AS " + " UNION ALL ".join(consultas))
+    for nombre in VISTAS_ROLLUPS:
+        conn.execute(f"DROP VIEW IF EXISTS temp.{nombre}")
+        conn.execute(sql_vista(nombre, esquemas))
+    return actual
+
+
+@contextmanager
+def conectar(db_path=None):
+    """Conexión de lectura donde `gnoticias` es la unión de la base principal y todos los shards."""
+    conn = sqlite3.connect(db_path or db_gnoticias.DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        db_gnoticias.adjuntar_estado(conn, db_path)
+        adjuntar_shards(conn, db_path)
+        yield conn
+    finally:
+        conn.close()
+
+
+def compactar(db_path=None, incluir_actual=False):
+    """Mueve a la base principal las noticias de los shards y borra los archivos ya integrados.
+
+    El shard del mes en curso se conserva (sigue recibiendo escrituras) salvo con `incluir_actual`.
+    Si integró algún shard, corre también el mantenimiento de la base principal (que los
+    extractores omiten con shards). Retorna la cantidad de filas nuevas en la base.
+    """
+    ruta = db_path or db_gnoticias.DB_PATH
+    asegurar_esquema(ruta)
+    actual = ruta_shard(ruta)
+    columnas = ", ".join(columna for columna, _ in COLUMNAS_GNOTICIAS)
+    total = 0
+    compactados = 0
+    conn = sqlite3.connect(ruta, timeout=30)
+    try:
+        for ruta_shard_i in listar_shards(ruta):
+            if ruta_shard_i == actual and not incluir_actual:
+                continue
+            conn.execute("ATTACH DATABASE ? AS compactar", (ruta_shard_i,))
+            try:
+                with conn:
+                    # rowcount no incluye las filas que escriben los triggers de rollups
+                    nuevas = conn.execute(f"INSERT OR IGNORE INTO main.gnoticias ({columnas}) SELECT {columnas} FROM compactar.gnoticias").rowcount
+            finally:
+                conn.execute("DETACH DATABASE compactar")
+            os.remove(ruta_shard_i)
+            total += nuevas
+            compactados += 1
+            print(f"✅ Shard {os.path.basename(ruta_shard_i)} compactado: {nuevas} filas nuevas en la base.")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    if compactados:
+        db_gnoticias.mantenimiento(ruta)
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Shards mensuales de gnoticias.")
+    parser.add_argument("--compactar", action="store_true", help="Integrar a la base los shards de meses anteriores.")
+    parser.add_argument("--incluir-actual", action="store_true", help="Con --compactar, integrar también el shard del mes en curso.")
+    args = parser.parse_args()
+    if args.compactar:
+        compactar(incluir_actual=args.incluir_actual)
+    for ruta in listar_shards():
+        conn = sqlite3.connect(ruta)
+        try:
+            filas = conn.execute("SELECT COUNT(*) FROM gnoticias").fetchone()[0]
+        finally:
+            conn.close()
+        print(f"ℹ️ {os.path.basename(ruta)}: {filas} noticias, {os.path.getsize(ruta) / 1024:.1f} KB")
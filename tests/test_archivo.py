@@ -0,0 +1,103 @@
+import io
+import os
+import tarfile
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from gnoticias import archivo, db_gnoticias
+from gnoticias.cache_urls import cache_urls
+from gnoticias.http_feeds import RespuestaFeed
+
+
+def archivar(contenido, hash_contenido, candidatos, dia):
+    """Archiva un feed como lo hace el pipeline con `--archivar`."""
+    trabajo = SimpleNamespace(
+        respuesta=RespuestaFeed(f"https://news.google.com/rss/search?q={hash_contenido}", contenido=contenido, hash_contenido=hash_contenido),
+        ventana=(datetime(2025, 10, dia), datetime(2025, 10, dia)), fecha_consulta=None, usar_fecha_entrada=True, candidatos=set(candidatos),
+    )
+    archivo.guardar(trabajo)
+
+
+@pytest.fixture
+def ejecucion(tmp_path, monkeypatch):
+    """Cambia a una carpeta de datos nueva (como un runner de Actions) y retorna su db_path."""
+    def cambiar(nombre):
+        db_path = str(tmp_path / nombre / "gnoticias.db")
+        monkeypatch.setattr(db_gnoticias, "DB_PATH", db_path)
+        archivo.asegurar_tabla_archivo()
+        return db_path
+    return cambiar
+
+
+@pytest.fixture
+def sin_decoder(monkeypatch):
+    """Falla si algo intenta decodificar una URL por la red."""
+    def resolver(*args, **kwargs):
+        raise AssertionError("no debería decodificar")
+    monkeypatch.setattr(cache_urls, "resolver", resolver)
+    yield
+    cache_urls.cerrar()
+
+
+def test_paquetes_de_varias_ejecuciones_se_combinan(ejecucion, tmp_path):
+    ejecucion("diario")
+    archivar(b"<rss>a</rss>", "aa11", [1, 2], 6)
+    archivar(b"<rss>b</rss>", "bb22", [1], 7)
+    assert archivo.empaquetar(str(tmp_path / "diario.tar")) == 2
+    ejecucion("historico")
+    archivar(b"<rss>b</rss>", "bb22", [3], 7)
+    archivar(b"<rss>c</rss>", "cc33", [3], 1)
+    assert archivo.empaquetar(str(tmp_path / "historico.tar")) == 2
+
+    ejecucion("replay")
+    paquetes = [str(tmp_path / "diario.tar"), str(tmp_path / "historico.tar")]
+    assert archivo.importar(paquetes) == 3
+    feeds = archivo.feeds_archivados()
+    assert [(f[0], f[5]) for f in feeds] == [("cc33", [3]), ("aa11", [1, 2]), ("bb22", [1, 3])]
+    assert archivo.leer(feeds[0][1], "cc33").contenido == b"<rss>c</rss>"
+    # Importar de nuevo no agrega nada
+    assert archivo.importar(paquetes) == 0
+    assert len(archivo.feeds_archivados()) == 3
+
+
+def test_sin_feeds_no_crea_paquete(ejecucion, tmp_path):
+    ejecucion("vacio")
+    assert archivo.empaquetar(str(tmp_path / "vacio.tar")) == 0
+    assert not os.path.exists(tmp_path / "vacio.tar")
+
+
+def test_importar_ignora_rutas_ajenas(ejecucion, tmp_path):
+    ruta = str(tmp_path / "raro.tar")
+    with tarfile.open(ruta, "w") as paquete:
+        for nombre in ("../fuera.xml.gz", "aa/bb11.xml.gz", "/etc/x.xml.gz"):
+            miembro = tarfile.TarInfo(nombre)
+            miembro.size = 3
+            paquete.addfile(miembro, io.BytesIO(b"xyz"))
+    db_path = ejecucion("replay")
+    assert archivo.importar([ruta]) == 0
+    assert sorted(os.listdir(os.path.dirname(db_path))) == ["archivo_feeds"]
+    assert os.listdir(archivo.directorio_archivo()) == [archivo.NOMBRE_INDICE]
+
+
+def test_urls_decodificadas_viajan_en_el_paquete(ejecucion, tmp_path):
+    ejecucion("diario")
+    archivar(b"<rss>a</rss>", "aa11", [1], 6)
+    archivo.guardar_urls([("n1", "https://medio.co/n1")])
+    archivo.empaquetar(str(tmp_path / "diario.tar"))
+
+    ejecucion("replay")
+    archivo.importar([str(tmp_path / "diario.tar")])
+    assert archivo.url_archivada("n1") == "https://medio.co/n1"
+    assert archivo.url_archivada("n2") is None
+
+
+@pytest.mark.parametrize("sin_red, esperado", [("google", "https://news.google.com/n2"), ("omitir", "")])
+def test_reprocesar_sin_red_no_decodifica(ejecucion, sin_decoder, sin_red, esperado):
+    ejecucion("replay")
+    archivo.guardar_urls([("n1", "https://medio.co/n1")])
+    resolver = archivo.ResolverArchivo(sin_red)
+    assert resolver("n1", "https://news.google.com/n1") == "https://medio.co/n1"
+    assert resolver("n2", "https://news.google.com/n2") == esperado
+    assert (resolver.archivadas, resolver.sin_resolver) == (1, 1)
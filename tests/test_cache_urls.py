@@ -0,0 +1,47 @@
+import sqlite3
+import threading
+
+import pytest
+
+from gnoticias import db_gnoticias
+from gnoticias.cache_urls import CacheUrls
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_gnoticias, "DB_PATH", str(tmp_path / "gnoticias.db"))
+    cache = CacheUrls()
+    yield cache
+    cache.cerrar()
+
+
+def cerrada(conn):
+    try:
+        conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+def test_cerrar_cierra_las_conexiones_de_todos_los_hilos(cache):
+    cache.guardar("a", "https://medio.co/a")
+    hilos = [threading.Thread(target=cache.obtener, args=("x",)) for _ in range(3)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    conexiones = list(cache._conexiones)
+    assert len(conexiones) == 4
+    cache.cerrar()
+    assert cache._conexiones == [] and all(cerrada(conn) for conn in conexiones)
+    # Se reabren al volver a usarlas
+    cache.limpiar()
+    assert cache.obtener("a") == "https://medio.co/a"
+
+
+def test_cambio_de_base_cierra_la_conexion_anterior(cache, tmp_path, monkeypatch):
+    cache.obtener("x")
+    anterior = cache._local.conn
+    monkeypatch.setattr(db_gnoticias, "DB_PATH", str(tmp_path / "otra.db"))
+    cache.obtener("x")
+    assert cerrada(anterior) and cache._conexiones == [cache._local.conn]
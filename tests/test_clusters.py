@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+from gnoticias.clusters import SQL_INSERT_LSH, AgrupadorHistorias, similitud_tokens, texto_comparable
+
+
+@pytest.fixture
+def agrupador():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("ATTACH DATABASE ':memory:' AS estado")
+    conn.execute("CREATE TABLE gnoticias (id_gnoticia TEXT, noticia TEXT)")
+    yield AgrupadorHistorias(conn)
+    conn.close()
+
+
+def guardar(agrupador, noticias):
+    """Asigna cluster a [(id, titular, fecha)] y guarda las bandas como lo hace el escritor."""
+    clusters = {}
+    for id_gnoticia, noticia, fecha in noticias:
+        clusters[id_gnoticia] = agrupador.asignar(id_gnoticia, noticia, fecha)
+        agrupador.conn.execute("INSERT INTO gnoticias VALUES (?, ?)", (id_gnoticia, noticia))
+    agrupador.conn.executemany(SQL_INSERT_LSH, agrupador.filas_pendientes())
+    return clusters
+
+
+def test_titulares_de_plantilla_quedan_separados(agrupador):
+    noticias = [(f"g{i}", f"Titular {i} sobre Candidato Bench 00001 en campaña", "2025-10-06 10:00:00-05:00")
+                for i in range(150)]
+    clusters = guardar(agrupador, noticias)
+    assert len(set(clusters.values())) == 150
+    assert agrupador.agrupadas == 0
+
+
+def test_historias_distintas_del_mismo_candidato_quedan_separadas(agrupador):
+    temas = ["reforma tributaria", "reforma pensional", "paz total", "crisis de salud", "viaje a Bruselas", "consulta popular"]
+    noticias = [(f"g{i}", f"Petro anuncia {tema} en Bogotá", "2025-10-06") for i, tema in enumerate(temas)]
+    clusters = guardar(agrupador, noticias)
+    assert len(set(clusters.values())) == len(temas)
+
+
+def test_misma_historia_en_varios_medios_se_agrupa(agrupador):
+    noticias = [
+        ("a", "Petro anuncia reforma tributaria para 2026", "2025-10-06"),
+        ("b", "Petro anuncia reforma tributaria para 2026", "2025-10-06"),
+        ("c", "Petro anuncia la reforma tributaria para 2026", "2025-10-07"),
+    ]
+    clusters = guardar(agrupador, noticias)
+    assert set(clusters.values()) == {"a"}
+
+
+def test_solo_se_comparan_fechas_cercanas(agrupador):
+    guardar(agrupador, [("a", "Petro anuncia reforma tributaria para 2026", "2025-10-01")])
+    clusters = guardar(agrupador, [
+        ("b", "Petro anuncia reforma tributaria para 2026", "2025-10-03"),
+        ("c", "Petro anuncia reforma tributaria para 2026", "2025-10-20"),
+    ])
+    assert clusters == {"b": "a", "c": "c"}
+
+
+def test_similitud_ignora_palabras_vacias():
+    a = texto_comparable("Petro anuncia la reforma")
+    b = texto_comparable("Petro anuncia reforma")
+    assert similitud_tokens(a, b) == 100
+    assert similitud_tokens(a, texto_comparable("Petro viaja a Bruselas")) < 50
+
+
+def test_titular_con_guion_se_compara_completo(agrupador):
+    # El medio ya se separó en el pipeline: el " - " que queda es parte del titular
+    assert texto_comparable("Gustavo Petro - viaje a Bruselas con ministros") == "gustavo petro viaje a bruselas con ministros"
+    clusters = guardar(agrupador, [
+        ("a", "Gustavo Petro - Encuesta Invamer: sube aprobación", "2025-10-06"),
+        ("b", "Gustavo Petro - viaje a Bruselas con ministros", "2025-10-06"),
+    ])
+    assert clusters == {"a": "a", "b": "b"}
@@ -0,0 +1,64 @@
+from gnoticias.keywords import MatcherKeywords, normalize_text
+
+KEYWORDS = {
+    1: "Petro, Gustavo Petro",
+    2: "Vicky Dávila,Dávila",
+    3: "Petrolera, Ecopetrol",
+    4: "Fajardo,",
+    5: "",
+    6: None,
+}
+
+TITULARES = [
+    "Gustavo Petro anuncia reforma tributaria",
+    "Vicky Dávila lidera encuesta; Petro responde",
+    "Ecopetrol reporta utilidades récord",
+    "La petrolera estatal y el gobierno Petro",
+    "Sergio Fajardo se reúne con Dávila",
+    "Resultados del fútbol colombiano",
+    "PETRÓLEO sube 3 % en Londres",
+    "",
+]
+
+
+def regla_anterior(keywords, noticia):
+    """Regla de las versiones anteriores: alguna keyword normalizada es subcadena del titular."""
+    if not keywords:
+        return False
+    normalizada = normalize_text(noticia)
+    return any(normalize_text(keyword.strip()) in normalizada for keyword in keywords.split(','))
+
+
+def test_coincide_con_la_regla_anterior():
+    matcher = MatcherKeywords(KEYWORDS)
+    for noticia in TITULARES:
+        esperados = {cid for cid, keywords in KEYWORDS.items() if regla_anterior(keywords, noticia)}
+        assert matcher.candidatos_en(normalize_text(noticia)) == esperados, noticia
+
+
+def test_subcadenas_sin_limite_de_palabra():
+    matcher = MatcherKeywords({1: "Petro"})
+    assert matcher.candidatos_en(normalize_text("Ecopetrol y la petrolera")) == {1}
+    assert matcher.candidatos_en(normalize_text("Pétro")) == {1}
+    assert matcher.candidatos_en(normalize_text("Pet ro")) == set()
+
+
+def test_keyword_vacia_coincide_siempre():
+    matcher = MatcherKeywords({4: "Fajardo,", 7: "Claudia López"})
+    assert matcher.acepta_todo(4) and not matcher.acepta_todo(7)
+    assert matcher.candidatos_en("") == {4}
+    assert matcher.candidatos_en(normalize_text("Claudia López en Bogotá")) == {4, 7}
+
+
+def test_candidatos_sin_keywords_no_coinciden():
+    matcher = MatcherKeywords({5: "", 6: None})
+    assert not matcher.tiene_keywords(5) and not matcher.tiene_keywords(6)
+    assert matcher.candidatos_en(normalize_text("Cualquier titular")) == set()
+
+
+def test_keywords_compartidas_atribuyen_a_cada_candidato():
+    # "Petro" es keyword de 1 y subcadena de las keywords de 3; "petro" aparece también dentro de "gustavo petro"
+    matcher = MatcherKeywords({1: "Petro,Gustavo Petro", 2: "Gustavo Petro", 3: "Petrolera"})
+    assert matcher.candidatos_en(normalize_text("Gustavo Petro en Cali")) == {1, 2}
+    assert matcher.candidatos_en(normalize_text("Petro en Cali")) == {1}
+    assert matcher.candidatos_en(normalize_text("La petrolera estatal")) == {1, 3}
@@ -0,0 +1,48 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from gnoticias.db_gnoticias import mantenimiento
+from gnoticias.metricas import SQL_CREAR_METRICAS, podar
+
+
+@pytest.fixture
+def estado(tmp_path):
+    """Base de estado con 5 ejecuciones recientes (2 candidatos x 2 etapas + 1 fila sin candidato) y una muy vieja."""
+    ruta = str(tmp_path / "gnoticias_estado.db")
+    conn = sqlite3.connect(ruta)
+    conn.execute("ATTACH DATABASE ? AS estado", (ruta,))
+    conn.execute(SQL_CREAR_METRICAS)
+    ahora = datetime.now()
+    filas = []
+    for n, dias in enumerate([400, 4, 3, 2, 1, 0]):
+        fecha = (ahora - timedelta(days=dias)).isoformat()
+        filas += [(f"log{n}", candidato, etapa, 1.5, 2, fecha) for candidato in (1, 2) for etapa in ("fetch", "decode")]
+        filas.append((f"log{n}", None, "fetch", 0.5, 1, fecha))
+    conn.executemany("INSERT INTO metricas_ejecucion VALUES (?, ?, ?, ?, ?, ?)", filas)
+    conn.commit()
+    conn.close()
+    return ruta
+
+
+def test_podar_agrega_las_ejecuciones_viejas(estado):
+    conn = sqlite3.connect(estado)
+    with conn:
+        assert podar(conn, ejecuciones_detalle=2, dias=180) == 5 + 3 * 3
+    filas = conn.execute("SELECT id_log, id_candidato, etapa, segundos, llamadas FROM metricas_ejecucion ORDER BY 1, 3, 2").fetchall()
+    # log0 vencido; log1..log3 con un total por etapa; log4 y log5 con el detalle
+    assert [f for f in filas if f[0] == "log1"] == [("log1", None, "decode", 3.0, 4), ("log1", None, "fetch", 3.5, 5)]
+    assert not any(f[0] == "log0" for f in filas)
+    assert len([f for f in filas if f[0] in ("log4", "log5")]) == 10
+    # Podar de nuevo no cambia nada
+    with conn:
+        assert podar(conn, ejecuciones_detalle=2, dias=180) == 0
+    conn.close()
+
+
+def test_mantenimiento_poda_la_base_de_estado(estado):
+    mantenimiento(estado)
+    conn = sqlite3.connect(estado)
+    assert conn.execute("SELECT COUNT(DISTINCT id_log) FROM metricas_ejecucion").fetchone()[0] == 5
+    conn.close()
@@ -0,0 +1,80 @@
+import hashlib
+import sqlite3
+
+import pytest
+
+from gnoticias import db_gnoticias
+from gnoticias.db_gnoticias import MIGRACIONES, migrar, ruta_estado
+
+# Esquema de las bases creadas antes de las migraciones: fechas en columnas normales, marcas
+# de ejecución en `candidatos` y `log_ejecucion` en la base principal
+SQL_BASE = """
+CREATE TABLE candidatos (id_candidato INTEGER PRIMARY KEY, nombre TEXT, id_tema INTEGER, keywords TEXT, ex INTEGER, his INTEGER);
+CREATE TABLE gnoticias (id_candidato INTEGER, id_gnoticia TEXT, noticia TEXT, medio TEXT, fecha TEXT, source_href TEXT, link TEXT,
+    ano INTEGER, mes INTEGER, dia INTEGER, hora INTEGER, minuto INTEGER, dia_sem INTEGER, dia_ano INTEGER,
+    id_original TEXT, id_log TEXT, sentimiento REAL, PRIMARY KEY (id_gnoticia, id_candidato));
+CREATE TABLE log_ejecucion (id TEXT PRIMARY KEY, proceso TEXT, estado TEXT, mensaje TEXT, fecha_inicio TEXT, fecha_fin TEXT);
+"""
+
+CANDIDATOS = [(1, "Gustavo Petro", 1, "Petro", 1, None), (2, "Vicky Dávila", 1, "Dávila", None, 1), (3, "Sin marcas", None, "x", None, None)]
+
+# (id_candidato, id_gnoticia, noticia, fecha, sentimiento); las fechas guardadas eran las de Colombia
+NOTICIAS = [(1 + i % 2, f"g{i}", f"Titular {i}", f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00-05:00", i / 10)
+            for i in range(40)]
+
+
+def archivos(db_path):
+    """Hash del contenido de la base principal y de la de estado."""
+    return [hashlib.sha1(open(ruta, "rb").read()).hexdigest() for ruta in (db_path, ruta_estado(str(db_path)))]
+
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    db_path = tmp_path / "gnoticias.db"
+    monkeypatch.setattr(db_gnoticias, "DB_PATH", str(db_path))
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SQL_BASE)
+    conn.executemany("INSERT INTO candidatos VALUES (?, ?, ?, ?, ?, ?)", CANDIDATOS)
+    # Las columnas de fecha guardan valores viejos a propósito: después se calculan desde `fecha`
+    conn.executemany(
+        "INSERT INTO gnoticias (id_candidato, id_gnoticia, noticia, medio, fecha, link, ano, mes, dia, sentimiento) "
+        "VALUES (?, ?, ?, 'Medio', ?, 'https://medio.co', 1999, 1, 1, ?)",
+        NOTICIAS,
+    )
+    conn.execute("INSERT INTO log_ejecucion VALUES ('l1', 'ex_gnoticias', 'finished', 'ok', '2025-01-01', '2025-01-01')")
+    conn.commit()
+    conn.close()
+    return str(db_path)
+
+
+def test_migracion_conserva_filas_y_columnas(base):
+    assert migrar(base) == MIGRACIONES[-1][0]
+
+    conn = sqlite3.connect(base)
+    conn.execute("ATTACH DATABASE ? AS estado", (ruta_estado(base),))
+    assert conn.execute("SELECT COUNT(*) FROM gnoticias").fetchone()[0] == len(NOTICIAS)
+    columnas = {fila[1] for fila in conn.execute("PRAGMA main.table_xinfo(gnoticias)")}
+    assert {"id_fila", "sentimiento", "id_cluster"} <= columnas
+    filas = {fila[0]: fila[1:] for fila in conn.execute(
+        "SELECT id_gnoticia, id_candidato, noticia, sentimiento, ano, mes, dia, hora, minuto FROM gnoticias")}
+    for cid, gid, noticia, fecha, sentimiento in NOTICIAS:
+        ano, mes, dia, hora, minuto = int(fecha[:4]), int(fecha[5:7]), int(fecha[8:10]), int(fecha[11:13]), int(fecha[14:16])
+        assert filas[gid] == (cid, noticia, sentimiento, ano, mes, dia, hora, minuto)
+    # 2025-10-06 fue lunes (weekday 0), día 279 del año
+    assert conn.execute("SELECT dia_sem, dia_ano FROM gnoticias WHERE id_gnoticia = 'g33'").fetchone() == (0, 279)
+    assert conn.execute("SELECT COUNT(*) FROM gnoticias WHERE id_fila IS NULL").fetchone()[0] == 0
+
+    # Las marcas y el log quedan en la base de estado
+    assert conn.execute("SELECT id_candidato, ex, his FROM estado.candidatos_estado ORDER BY 1").fetchall() == [(1, 1, None), (2, None, 1)]
+    # `candidatos` se llena desde fuera: sus columnas y valores no cambian
+    assert conn.execute("SELECT * FROM main.candidatos ORDER BY 1").fetchall() == CANDIDATOS
+    assert conn.execute("SELECT COUNT(*) FROM estado.log_ejecucion").fetchone()[0] == 1
+    assert conn.execute("SELECT name FROM main.sqlite_master WHERE name = 'log_ejecucion'").fetchone() is None
+    conn.close()
+
+
+def test_segunda_migracion_no_cambia_nada(base):
+    version = migrar(base)
+    antes = archivos(base)
+    assert migrar(base) == version
+    assert archivos(base) == antes
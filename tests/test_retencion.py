@@ -0,0 +1,33 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+from gnoticias.db_gnoticias import DIAS_CACHE_URLS, mantenimiento, migrar, ruta_estado
+
+
+def test_mantenimiento_aplica_la_retencion_del_estado(tmp_path):
+    db_path = str(tmp_path / "gnoticias.db")
+    migrar(db_path)
+    ruta = ruta_estado(db_path)
+    # migrar crea log_ejecucion; las cachés las crean sus módulos al usarlas
+    conn = sqlite3.connect(ruta)
+    conn.execute("CREATE TABLE gnoticias_url_cache (id_gnoticia TEXT PRIMARY KEY, link TEXT NOT NULL, fecha TEXT)")
+    conn.execute("CREATE TABLE feed_cache (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, hash_contenido TEXT, fecha TEXT)")
+    ahora = datetime.now()
+    viejo, reciente = (ahora - timedelta(days=400)).isoformat(), (ahora - timedelta(days=1)).isoformat()
+    conn.executemany("INSERT INTO log_ejecucion (id, proceso, estado, fecha_inicio) VALUES (?, ?, 'finished', ?)", [
+        ("viejo", "ex_gnoticias", viejo), ("reciente", "ex_gnoticias", reciente), ("historico", "ex_gnoticias_historico", viejo),
+    ])
+    conn.executemany("INSERT INTO gnoticias_url_cache VALUES (?, 'https://medio.co', ?)", [
+        ("vencida", (ahora - timedelta(days=DIAS_CACHE_URLS + 1)).isoformat()), ("vigente", reciente),
+    ])
+    conn.executemany("INSERT INTO feed_cache (url, fecha) VALUES (?, ?)", [("https://viejo", viejo), ("https://reciente", reciente)])
+    conn.commit()
+    conn.close()
+
+    mantenimiento(ruta)
+
+    conn = sqlite3.connect(ruta)
+    assert {f[0] for f in conn.execute("SELECT id FROM log_ejecucion")} == {"reciente", "historico"}
+    assert [f[0] for f in conn.execute("SELECT id_gnoticia FROM gnoticias_url_cache")] == ["vigente"]
+    assert [f[0] for f in conn.execute("SELECT url FROM feed_cache")] == ["https://reciente"]
+    conn.close()
@@ -0,0 +1,71 @@
+import feedparser
+import pytest
+
+from gnoticias import rss
+
+ITEM_COMPLETO = """
+<item>
+  <title>Petro anuncia reforma &amp; consulta: &#8220;no daremos marcha atrás&#8221; - El Tiempo</title>
+  <link>https://news.google.com/rss/articles/CBMiW2h0dHBzOi8vd3d3LmVsdGllbXBvLmNvbS9w?oc=5</link>
+  <guid isPermaLink="false">CBMiW2h0dHBzOi8vd3d3LmVsdGllbXBvLmNvbS9w</guid>
+  <pubDate>Mon, 06 Oct 2025 15:04:05 GMT</pubDate>
+  <description>&lt;a href="https://news.google.com/rss/articles/CBMi"&gt;Petro anuncia&lt;/a&gt;</description>
+  <source url="https://www.eltiempo.com">El Tiempo</source>
+</item>"""
+
+ITEM_SIN_GUID_NI_FECHA = """
+<item>
+  <title><![CDATA[Vicky Dávila <en> Medellín - Semana]]></title>
+  <link>https://news.google.com/rss/articles/CBMiSemana?oc=5</link>
+  <source url="https://www.semana.com">Semana</source>
+</item>"""
+
+
+def feed(*items):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/"><channel>'
+        "<title>\"Gustavo Petro\" - Google Noticias</title><link>https://news.google.com/search?q=petro</link>"
+        + "".join(items) + "</channel></rss>"
+    ).encode("utf-8")
+
+
+def campos(entrada):
+    """Lo que el pipeline lee de cada entrada."""
+    source = entrada.source if hasattr(entrada, "source") else {}
+    return {
+        "title": entrada.get("title", ""),
+        "link": entrada.get("link", ""),
+        "id": entrada.get("id", entrada.get("link", "")),
+        "published_parsed": entrada.get("published_parsed"),
+        "source_href": source.get("href", ""),
+        "source_title": source.get("title", ""),
+    }
+
+
+@pytest.mark.parametrize("items", [(ITEM_COMPLETO,), (ITEM_SIN_GUID_NI_FECHA,), (ITEM_COMPLETO, ITEM_SIN_GUID_NI_FECHA)])
+def test_campos_iguales_a_feedparser(items):
+    contenido = feed(*items)
+    propio, referencia = rss.parsear(contenido), feedparser.parse(contenido)
+    assert isinstance(propio, rss.FeedRss) and not propio.bozo
+    assert [campos(e) for e in propio.entries] == [campos(e) for e in referencia.entries]
+
+
+def test_entidades_y_campos_faltantes():
+    completa, incompleta = rss.parsear(feed(ITEM_COMPLETO, ITEM_SIN_GUID_NI_FECHA)).entries
+    assert completa.title == "Petro anuncia reforma & consulta: “no daremos marcha atrás” - El Tiempo"
+    assert tuple(completa.published_parsed)[:6] == (2025, 10, 6, 15, 4, 5)
+    assert incompleta.title == "Vicky Dávila <en> Medellín - Semana"
+    assert incompleta.get("id") is None and incompleta.get("published_parsed") is None
+    assert not hasattr(incompleta, "published")
+
+
+@pytest.mark.parametrize("contenido, bozo", [
+    (feed(ITEM_COMPLETO)[:-40], True),
+    (b"<html><body>Our systems have detected unusual traffic</body></html>", False),
+    (b"", False),
+])
+def test_contenido_invalido_delega_en_feedparser(contenido, bozo):
+    resultado = rss.parsear(contenido)
+    assert not isinstance(resultado, rss.FeedRss)
+    assert bool(resultado.bozo) is bozo
@@ -0,0 +1,62 @@
+import hashlib
+import os
+import sqlite3
+
+import pytest
+
+from gnoticias import busqueda, rollups, shards
+from gnoticias.db_gnoticias import GnoticiasWriter, migrar
+
+MESES = [f"2024-{mes:02d}" for mes in range(1, 13)]
+
+
+def huella(ruta):
+    with open(ruta, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@pytest.fixture
+def base(tmp_path):
+    """Base principal con 12 shards mensuales (más de los que se pueden adjuntar), uno con el esquema viejo."""
+    db_path = str(tmp_path / "gnoticias.db")
+    os.makedirs(shards.directorio_shards(db_path))
+    for i, mes in enumerate(MESES):
+        conn = sqlite3.connect(os.path.join(shards.directorio_shards(db_path), f"gnoticias_{mes}.db"))
+        if i == 0:
+            # Sin id_fila, columnas de fecha, rollups ni índice de búsqueda
+            conn.execute("CREATE TABLE gnoticias (id_candidato INTEGER NOT NULL, id_gnoticia TEXT NOT NULL, noticia TEXT, medio TEXT, fecha TEXT)")
+        else:
+            shards.migrar_shard(conn)
+        conn.execute("INSERT INTO gnoticias (id_candidato, id_gnoticia, noticia, medio, fecha) VALUES (1, ?, ?, 'El Medio', ?)",
+                     (f"n{i}", f"Titular del mes {mes}", f"{mes}-15T10:00:00"))
+        conn.commit()
+        conn.close()
+    migrar(db_path)
+    return db_path
+
+
+def test_migrar_actualiza_los_shards(base):
+    conn = sqlite3.connect(shards.listar_shards(base)[0])
+    tablas = {fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"rollup_candidato_dia", "gnoticias_fts"} <= tablas
+    assert conn.execute("SELECT ano, mes FROM gnoticias").fetchall() == [(2024, 1)]
+    conn.close()
+
+
+def test_conectar_lee_todos_los_shards_sin_modificarlos(base):
+    antes = {ruta: huella(ruta) for ruta in [base] + shards.listar_shards(base)}
+    with shards.conectar(base) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM gnoticias").fetchone()[0] == len(MESES)
+    assert rollups.noticias_por_medio(1, db_path=base) == [("El Medio", len(MESES))]
+    assert len(rollups.noticias_por_dia(1, db_path=base)) == len(MESES)
+    # Los shards unidos en memoria también se buscan
+    assert [fila["id_gnoticia"] for fila in busqueda.buscar('"2024-01"', db_path=base)] == ["n0"]
+    assert {ruta: huella(ruta) for ruta in antes} == antes
+
+
+def test_escritor_con_demasiados_shards(base):
+    with GnoticiasWriter(base, shards=True, agrupar=False) as writer:
+        assert writer.existe("n0", 1)
+    with shards.conectar(base) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM gnoticias").fetchone()[0] == len(MESES)
+    assert len(shards.listar_shards(base)) == len(MESES) + 1